@@ -0,0 +1,321 @@
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+WATERMARKS_COLLECTION = "analytics_watermarks"
+
+# A refresh holds its view for at most this long; a worker that died
+# mid-refresh releases it when the lease runs out
+REFRESH_LEASE = timedelta(minutes=10)
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+# Documents younger than this are left for the next refresh, so a write
+# committed slightly out of timestamp order is not skipped
+DEFAULT_LAG = timedelta(seconds=5)
+
+BUCKET_FORMATS = {"day": "%Y-%m-%d", "hour": "%Y-%m-%dT%H:00"}
+BUCKET_SIZES = {"day": timedelta(days=1), "hour": timedelta(hours=1)}
+
+# How an additive refresh combines a new partial result with the stored one
+_COMBINE = {"$sum": "$add", "$max": "$max", "$min": "$min"}
+
+
+@dataclass(frozen=True)
+class View:
+    """A summary collection maintained from one source collection.
+
+    Rows are grouped by a time bucket of bucket_field (if any) plus the
+    dimension fields. For an append-only source each refresh adds the
+    totals of documents newer than the watermark to the stored rows. When
+    documents change after insert, watermark_field is their update time and
+    every bucket touched since the watermark is recomputed and replaced.
+    """
+    name: str
+    source: str
+    accumulators: Dict[str, dict]
+    bucket_field: Optional[str] = None
+    bucket: Optional[str] = None
+    dimensions: Dict[str, str] = field(default_factory=dict)
+    match: Dict[str, Any] = field(default_factory=dict)
+    watermark_field: Optional[str] = None
+    append_only: bool = True
+
+    @property
+    def collection(self) -> str:
+        return f"mv_{self.name}"
+
+    @property
+    def time_field(self) -> str:
+        return self.watermark_field or self.bucket_field
+
+
+def _count_if(status: str) -> dict:
+    return {"$sum": {"$cond": [{"$eq": ["$status", status]}, 1, 0]}}
+
+
+VIEWS = {view.name: view for view in [
+    View(
+        name="registrations_daily",
+        source="users",
+        bucket_field="created_at",
+        bucket="day",
+        dimensions={"role": "$role"},
+        accumulators={"count": {"$sum": 1}}
+    ),
+    View(
+        name="approval_backlog",
+        source="users",
+        bucket_field="created_at",
+        bucket="day",
+        match={"role": "student"},
+        watermark_field="updated_at",
+        append_only=False,
+        accumulators={
+            "pending": _count_if("pending"),
+            "approved": _count_if("approved"),
+            "rejected": _count_if("rejected"),
+            "oldest_pending_at": {"$min": {"$cond": [{"$eq": ["$status", "pending"]}, "$created_at", None]}}
+        }
+    ),
+    View(
+        name="enrollments_by_program",
+        source="enrollments",
+        watermark_field="created_at",
+        dimensions={"program_id": "$program_id"},
+        accumulators={"count": {"$sum": 1}, "last_enrolled_at": {"$max": "$created_at"}}
+    ),
+    View(
+        name="heartbeats_hourly",
+        source="status_checks",
+        bucket_field="timestamp",
+        bucket="hour",
+        dimensions={"client_name": "$client_name"},
+        accumulators={"count": {"$sum": 1}}
+    ),
+]}
+
+
+def _group_key(view: View) -> dict:
+    key = {}
+    if view.bucket:
+        key["bucket"] = {"$dateToString": {"format": BUCKET_FORMATS[view.bucket], "date": f"${view.bucket_field}"}}
+    key.update(view.dimensions)
+    return key
+
+
+def _aggregate_stages(view: View, match: dict, refreshed_at: datetime) -> List[dict]:
+    """$match -> $group -> flatten the group key into plain, indexable fields"""
+    key = _group_key(view)
+    return [
+        {"$match": {**view.match, **match}},
+        {"$group": {"_id": key, **view.accumulators}},
+        {"$addFields": {**{name: f"$_id.{name}" for name in key}, "refreshed_at": {"$literal": refreshed_at}}},
+    ]
+
+
+def _merge_stage(view: View, additive: bool, into: Optional[str] = None) -> dict:
+    if not additive:
+        when_matched: Any = "replace"
+    else:
+        when_matched = [{"$set": {
+            **{
+                name: {_COMBINE[next(iter(accumulator))]: [f"${name}", f"$$new.{name}"]}
+                for name, accumulator in view.accumulators.items()
+            },
+            "refreshed_at": "$$new.refreshed_at"
+        }}]
+    into = into or view.collection
+    return {"$merge": {"into": into, "on": "_id", "whenMatched": when_matched, "whenNotMatched": "insert"}}
+
+
+def _window(view: View, after: Optional[datetime], upto: datetime) -> dict:
+    bounds: Dict[str, datetime] = {"$lte": upto}
+    if after is not None:
+        bounds["$gt"] = after
+    return {view.time_field: bounds}
+
+
+def _floor(value: datetime, bucket: str) -> datetime:
+    if bucket == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def _run(db, view: View, pipeline: List[dict]):
+    # $merge returns no documents; exhausting the cursor runs it
+    await db[view.source].aggregate(pipeline).to_list(length=None)
+
+
+def _label(value: datetime, bucket: str) -> str:
+    return value.strftime(BUCKET_FORMATS[bucket])
+
+
+async def _recompute_touched(db, view: View, after: Optional[datetime], upto: datetime, now: datetime):
+    """Replace every bucket holding a document changed in the window"""
+    # No view.match here: a document that stopped matching still changes its bucket
+    touched = await db[view.source].aggregate([
+        {"$match": _window(view, after, upto)},
+        {"$group": {"_id": None, "first": {"$min": f"${view.bucket_field}"}, "last": {"$max": f"${view.bucket_field}"}}},
+    ]).to_list(length=1)
+    if not touched or touched[0]["first"] is None:
+        return
+    start = _floor(touched[0]["first"], view.bucket)
+    end = _floor(touched[0]["last"], view.bucket) + BUCKET_SIZES[view.bucket]
+    match = {view.bucket_field: {"$gte": start, "$lt": end}}
+    await _run(db, view, _aggregate_stages(view, match, now) + [_merge_stage(view, additive=False)])
+    # Rows the recompute did not write belong to buckets (or dimension values) that are now empty
+    await db[view.collection].delete_many({
+        "bucket": {"$gte": _label(start, view.bucket), "$lt": _label(end, view.bucket)},
+        "refreshed_at": {"$lt": now}
+    })
+
+
+async def rebuild(db, view: View, upto: datetime, now: datetime):
+    """Recompute the whole view from its source into a scratch collection, then swap it in.
+
+    Readers keep seeing the previous rows until the rename, which replaces
+    the view in one step.
+    """
+    scratch = f"{view.collection}_rebuild"
+    await db[scratch].drop()
+    if view.bucket:
+        await db[scratch].create_index("bucket")
+    pipeline = _aggregate_stages(view, _window(view, None, upto), now) + [_merge_stage(view, additive=False, into=scratch)]
+    await _run(db, view, pipeline)
+    if scratch in await db.list_collection_names():
+        await db[scratch].rename(view.collection, dropTarget=True)
+    else:
+        # Nothing to aggregate yet
+        await db[view.collection].delete_many({})
+
+
+async def _claim(db, view: View, owner: str, now: datetime) -> Optional[dict]:
+    """Take the view's refresh lease; None while another refresh holds it.
+
+    The watermark is read from the claimed document, so two refreshes can
+    never fold the same window into the view.
+    """
+    try:
+        return await db[WATERMARKS_COLLECTION].find_one_and_update(
+            {"_id": view.name, "$or": [{"owner": None}, {"lease_until": {"$lt": now}}]},
+            {"$set": {"owner": owner, "lease_until": now + REFRESH_LEASE}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        return None
+
+
+async def _release(db, view: View, owner: str, changes: Optional[dict] = None, unset: Optional[dict] = None):
+    update: Dict[str, Any] = {"$set": {**(changes or {}), "owner": None, "lease_until": None}}
+    if unset:
+        update["$unset"] = unset
+    await db[WATERMARKS_COLLECTION].update_one({"_id": view.name, "owner": owner}, update)
+
+
+async def refresh(db, view: View, lag: timedelta = DEFAULT_LAG) -> dict:
+    """Fold documents newer than the view's watermark into the summary collection"""
+    now = datetime.now(timezone.utc)
+    # Stored dates have millisecond precision; refreshed_at is compared against stored rows
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    upto = now - lag
+    owner = f"{WORKER_ID}-{uuid.uuid4().hex[:8]}"
+    state = await _claim(db, view, owner, now)
+    if state is None:
+        return {"view": view.name, "mode": "busy"}
+
+    try:
+        watermark = state.get("watermark")
+        if watermark is not None and watermark.tzinfo is None:
+            # Motor returns naive UTC datetimes
+            watermark = watermark.replace(tzinfo=timezone.utc)
+
+        if watermark is None or state.get("pending_upto") is not None:
+            # First run, or a refresh died between $merge and the watermark
+            # update, so an additive merge may or may not have been applied
+            mode = "rebuild"
+            await db[WATERMARKS_COLLECTION].update_one({"_id": view.name}, {"$set": {"pending_upto": upto}})
+            await rebuild(db, view, upto, now)
+        elif upto <= watermark:
+            await _release(db, view, owner)
+            return {"view": view.name, "mode": "noop", "watermark": watermark}
+        else:
+            mode = "incremental"
+            await db[WATERMARKS_COLLECTION].update_one({"_id": view.name}, {"$set": {"pending_upto": upto}})
+            if view.append_only:
+                pipeline = _aggregate_stages(view, _window(view, watermark, upto), now) + [_merge_stage(view, additive=True)]
+                await _run(db, view, pipeline)
+            else:
+                await _recompute_touched(db, view, watermark, upto, now)
+    except Exception:
+        # pending_upto stays set, so the next refresh rebuilds
+        await _release(db, view, owner)
+        raise
+
+    changes = {"watermark": upto, "refreshed_at": now}
+    if mode == "rebuild":
+        changes["rebuilt_at"] = now
+    await _release(db, view, owner, changes, unset={"pending_upto": ""})
+    return {"view": view.name, "mode": mode, "watermark": upto}
+
+
+async def refresh_all(db, lag: timedelta = DEFAULT_LAG) -> List[dict]:
+    results = []
+    for view in VIEWS.values():
+        try:
+            results.append(await refresh(db, view, lag))
+        except Exception as e:
+            logger.error("Refreshing analytics view %s failed: %s", view.name, e)
+            results.append({"view": view.name, "mode": "failed", "error": str(e)})
+    return results
+
+
+async def ensure_indexes(db):
+    """Indexes on the source time fields the refresh windows scan, and on view read paths"""
+    for view in VIEWS.values():
+        await db[view.source].create_index(view.time_field)
+        if view.bucket:
+            await db[view.collection].create_index("bucket")
+
+
+async def status(db) -> Dict[str, dict]:
+    """Watermark and last refresh of every view"""
+    states = {state["_id"]: state async for state in db[WATERMARKS_COLLECTION].find({})}
+    return {
+        name: {
+            "watermark": states.get(name, {}).get("watermark"),
+            "refreshed_at": states.get(name, {}).get("refreshed_at"),
+            "dimensions": list(view.dimensions),
+            "bucket": view.bucket
+        }
+        for name, view in VIEWS.items()
+    }
+
+
+async def read(
+    db,
+    view: View,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    filters: Optional[Dict[str, str]] = None,
+    limit: int = 500
+) -> List[dict]:
+    """Rows of a view, newest bucket first; since/until compare against bucket labels"""
+    query: Dict[str, Any] = {name: value for name, value in (filters or {}).items() if name in view.dimensions}
+    if view.bucket and (since or until):
+        query["bucket"] = {}
+        if since:
+            query["bucket"]["$gte"] = since
+        if until:
+            query["bucket"]["$lt"] = until
+    sort = [("bucket", -1)] if view.bucket else [(next(iter(view.accumulators)), -1)]
+    return await db[view.collection].find(query, {"_id": 0}).sort(sort).to_list(limit)
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+from logging_config import request_id_var
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "audit_log"
+
+# Fields that change on every write and would only add noise to a diff
+IGNORED_FIELDS = {"_id", "updated_at"}
+
+
+def diff(before: Optional[dict], after: Optional[dict]) -> Dict[str, dict]:
+    """Changed fields as {field: {"from": old, "to": new}}"""
+    before = before or {}
+    after = after or {}
+    changes = {}
+    for field in before.keys() | after.keys():
+        if field in IGNORED_FIELDS:
+            continue
+        old, new = before.get(field), after.get(field)
+        if old != new:
+            changes[field] = {"from": old, "to": new}
+    return changes
+
+
+class AuditLog:
+    """Buffers audit entries in memory and writes them with insert_many.
+
+    record() never touches the database, so a mutation pays no extra round
+    trip. A background task flushes every flush_interval seconds or as soon
+    as max_batch entries are waiting. Entries that cannot be written at
+    shutdown are spooled to a local file and picked up on the next start.
+    """
+
+    def __init__(
+        self,
+        db=None,
+        flush_interval: float = 2.0,
+        max_batch: int = 500,
+        max_buffer: int = 10000,
+        spool_path: Optional[str] = None
+    ):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_buffer = max_buffer
+        self.spool_path = spool_path
+        self.written = 0
+        self.dropped = 0
+        self._buffer: List[dict] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+    def record(
+        self,
+        actor,
+        action: str,
+        entity_type: str,
+        entity_id: str,
+        before: Optional[dict] = None,
+        after: Optional[dict] = None,
+        started: Optional[float] = None
+    ):
+        """Queue one entry; started is a time.perf_counter() value from the start of the mutation"""
+        entry = {
+            "id": str(uuid.uuid4()),
+            "at": datetime.now(timezone.utc),
+            "actor_id": actor.id,
+            "actor_email": actor.email,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "changes": diff(before, after),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2) if started is not None else None,
+            "request_id": request_id_var.get()
+        }
+        self._buffer.append(entry)
+        self._trim()
+        if len(self._buffer) >= self.max_batch:
+            self._wakeup.set()
+
+    def _trim(self):
+        """Database unreachable for a long time: keep the newest max_buffer entries"""
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.dropped += overflow
+
+    async def flush(self) -> int:
+        """Write everything buffered; entries stay buffered if the write fails.
+
+        The buffer is swapped out before the first await, so entries
+        recorded (or dropped by the size cap) during the write never shift
+        the batch being written.
+        """
+        async with self._flush_lock:
+            pending, self._buffer = self._buffer, []
+            written = 0
+            try:
+                while written < len(pending):
+                    batch = pending[written:written + self.max_batch]
+                    try:
+                        await self.db[COLLECTION].insert_many(batch, ordered=False)
+                    except BulkWriteError as e:
+                        # Entries written by an earlier, partly failed attempt come back as duplicates
+                        if e.details.get("writeConcernErrors") or any(
+                            error["code"] != 11000 for error in e.details.get("writeErrors", [])
+                        ):
+                            raise
+                    written += len(batch)
+            finally:
+                # Unwritten entries go back in front of anything recorded meanwhile
+                self._buffer[:0] = pending[written:]
+                self._trim()
+                self.written += written
+            return written
+
+    async def run_forever(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Audit flush failed, %d entries kept for retry: %s", len(self._buffer), e)
+
+    async def close(self):
+        """Final flush at shutdown; falls back to the spool file"""
+        try:
+            await self.flush()
+        except Exception as e:
+            if not self.spool_path:
+                logger.error("Audit flush at shutdown failed, %d entries lost: %s", len(self._buffer), e)
+                return
+            await asyncio.to_thread(self._spool, list(self._buffer))
+            logger.error("Audit flush at shutdown failed, spooled %d entries: %s", len(self._buffer), e)
+            self._buffer.clear()
+
+    def _spool(self, entries: List[dict]):
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json_util.dumps(entry) + "\n")
+
+    def restore_spool(self) -> int:
+        """Re-queue entries spooled by a previous shutdown"""
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return 0
+        with open(self.spool_path, "r", encoding="utf-8") as f:
+            entries = [json_util.loads(line) for line in f if line.strip()]
+        self._buffer[:0] = entries
+        os.remove(self.spool_path)
+        return len(entries)
+
+    def stats(self) -> dict:
+        return {"buffered": len(self._buffer), "written": self.written, "dropped": self.dropped}
+
+
+async def ensure_indexes(db, retention_days: int):
+    """TTL retention plus indexes for the query endpoint's filters"""
+    await db[COLLECTION].create_index("at", expireAfterSeconds=retention_days * 24 * 60 * 60)
+    await db[COLLECTION].create_index([("actor_id", 1), ("at", -1)])
+    await db[COLLECTION].create_index([("entity_type", 1), ("entity_id", 1), ("at", -1)])
+
+
+async def query(
+    db,
+    actor_id: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 100
+) -> List[dict]:
+    """Newest first; each filter is optional"""
+    filters: Dict[str, Any] = {}
+    if actor_id:
+        filters["actor_id"] = actor_id
+    if entity_type:
+        filters["entity_type"] = entity_type
+    if entity_id:
+        filters["entity_id"] = entity_id
+    if since or until:
+        filters["at"] = {}
+        if since:
+            filters["at"]["$gte"] = since
+        if until:
+            filters["at"]["$lt"] = until
+    return await db[COLLECTION].find(filters, {"_id": 0}).sort("at", -1).to_list(limit)
@@ -4,11 +4,19 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-from models import User, TokenData
+from models import AuthPrincipal, TokenData, from_document
 import os
+import tracing
+import users
 
 # Security configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# The one password hashing context; server.py hashes through get_password_hash
+# BCRYPT_ROUNDS only exists so test runs can use cheap hashes
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=int(os.environ.get("BCRYPT_ROUNDS", "12"))
+)
 security = HTTPBearer()
 
 # JWT configuration
@@ -16,10 +24,12 @@ SECRET_KEY = os.environ.get("JWT_SECRET", "your-super-secret-jwt-key-for-ahlulba
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
+@tracing.traced("password.verify")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
 
+@tracing.traced("password.hash")
 def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
@@ -58,17 +68,17 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
 
 async def get_current_user(db, token_data: TokenData = Depends(verify_token)):
     """Get current user from token"""
-    user = await db.users.find_one({"id": token_data.user_id})
+    user = await users.find_by_id(db, token_data.user_id, users.AUTH_PRINCIPAL)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    return User(**user)
+    return from_document(AuthPrincipal, user)
 
 def require_role(allowed_roles: list):
     """Decorator factory for role-based access control"""
-    async def role_checker(db, current_user: User = Depends(get_current_user)):
+    async def role_checker(db, current_user: AuthPrincipal = Depends(get_current_user)):
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -78,7 +88,7 @@ def require_role(allowed_roles: list):
     return role_checker
 
 # Helper functions for specific roles
-async def get_current_admin(db, current_user: User = Depends(get_current_user)):
+async def get_current_admin(db, current_user: AuthPrincipal = Depends(get_current_user)):
     """Ensure current user is admin or super_admin"""
     if current_user.role not in ["admin", "super_admin"]:
         raise HTTPException(
@@ -87,7 +97,7 @@ async def get_current_admin(db, current_user: User = Depends(get_current_user)):
         )
     return current_user
 
-async def get_current_student(db, current_user: User = Depends(get_current_user)):
+async def get_current_student(db, current_user: AuthPrincipal = Depends(get_current_user)):
     """Ensure current user is student"""
     if current_user.role != "student":
         raise HTTPException(
@@ -96,7 +106,7 @@ async def get_current_student(db, current_user: User = Depends(get_current_user)
         )
     return current_user
 
-async def get_approved_user(db, current_user: User = Depends(get_current_user)):
+async def get_approved_user(db, current_user: AuthPrincipal = Depends(get_current_user)):
     """Ensure current user is approved"""
     if current_user.status != "approved":
         raise HTTPException(
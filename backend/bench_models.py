@@ -0,0 +1,97 @@
+"""Micro-benchmarks for building models from database documents.
+
+Compares full pydantic validation with the trusted-document fast path
+(models.from_document) and the per-row StatusCheck list against one
+TypeAdapter pass. The list benchmark includes FastAPI's response_model
+serialization, so it reflects the CPU a /api/status request spends:
+
+    python bench_models.py --rows 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import timeit
+import uuid
+from datetime import datetime, timezone
+from typing import List
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "bench")
+
+from bson import ObjectId
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from starlette.responses import JSONResponse
+
+from models import User, UserResponse, from_document, list_adapter
+from server import StatusCheck
+
+
+def user_document() -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "_id": ObjectId(),
+        "id": str(uuid.uuid4()),
+        "email": "student@example.com",
+        "name": "Student",
+        "age": 21,
+        "phone": "+1000000000",
+        "role": "student",
+        "status": "approved",
+        "hashed_password": "$2b$12$" + "x" * 53,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def status_documents(rows: int) -> List[dict]:
+    return [
+        {"_id": ObjectId(), "id": str(uuid.uuid4()), "client_name": f"client-{i}", "timestamp": datetime.now(timezone.utc)}
+        for i in range(rows)
+    ]
+
+
+def time_per_call(func, number: int) -> float:
+    """Best of 5 runs, in microseconds per call"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main(rows: int, number: int):
+
+    doc = user_document()
+    docs = status_documents(rows)
+    response_field = create_response_field(name="Response_get_status_checks", type_=List[StatusCheck])
+    adapter = list_adapter(StatusCheck)
+    loop = asyncio.new_event_loop()
+
+    def status_validated():
+        models = [StatusCheck(**d) for d in docs]
+        content = loop.run_until_complete(serialize_response(field=response_field, response_content=models))
+        return JSONResponse(content).body
+
+    def status_adapter():
+        return adapter.dump_json(adapter.validate_python(docs))
+
+    results = {
+        "User(**doc)": time_per_call(lambda: User(**doc), number * 100),
+        "from_document(User, doc)": time_per_call(lambda: from_document(User, doc), number * 100),
+        "UserResponse(**doc)": time_per_call(lambda: UserResponse(**doc), number * 100),
+        "from_document(UserResponse, doc)": time_per_call(lambda: from_document(UserResponse, doc), number * 100),
+        f"status list, per-row models + response_model ({rows} rows)": time_per_call(status_validated, number),
+        f"status list, TypeAdapter validate + dump_json ({rows} rows)": time_per_call(status_adapter, number),
+    }
+    assert json.loads(status_validated()) == json.loads(status_adapter()), "fast path must produce the same JSON"
+    loop.close()
+
+    width = max(len(name) for name in results)
+    for name, micros in results.items():
+        print(f"{name:<{width}}  {micros:10.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+    main(args.rows, args.number)
@@ -0,0 +1,214 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def compute_etag(value: Any) -> str:
+    """Stable content hash of a JSON-serializable value"""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class _LeaderCancelled(Exception):
+    """The caller running a shared call was cancelled before it finished"""
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one in-flight execution.
+
+    Every caller that asks for a key while a call for it is running awaits
+    the same future, so N concurrent misses cost one database query. If
+    the caller running the call is cancelled (e.g. its client went away),
+    the waiters are not: one of them takes over and runs the call again.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                return await self._lead(key, func)
+            self.coalesced += 1
+            try:
+                # Shield so one cancelled waiter doesn't cancel the shared call
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue
+
+    async def _lead(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            # Only this caller was cancelled; hand the call to a waiter
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't log a warning
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+
+@dataclass
+class Snapshot:
+    value: Any
+    version: int
+    etag: str
+    loaded_at: float
+    degraded: bool = False  # Last good copy served because the database is unavailable
+
+
+class SnapshotCache:
+    """Versioned in-memory snapshots of small, read-mostly collections.
+
+    Writes in this process call invalidate(); the TTL bounds how stale a
+    snapshot can get when another worker did the write. Loads are
+    single-flight, and a snapshot past its TTL but inside stale_ttl is
+    served immediately while one background refresh replaces it.
+
+    Loads go through an optional circuit breaker. When a load fails, the
+    last good snapshot (kept in memory and optionally in a SnapshotStore)
+    is served with degraded=True instead of raising.
+    """
+
+    def __init__(self, ttl: float = 30.0, stale_ttl: float = 300.0, breaker=None, store=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.breaker = breaker
+        self.store = store
+        self._entries: Dict[str, Snapshot] = {}
+        self._last_good: Dict[str, Snapshot] = {}
+        self._versions: Dict[str, int] = {}
+        self._generations: Dict[str, int] = {}
+        self._flights = SingleFlight()
+        self._background: Set[asyncio.Task] = set()
+        # Names with a background refresh scheduled or running
+        self._refreshing: Set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.degraded_served = 0
+
+    def peek(self, name: str) -> Optional[Snapshot]:
+        """Current snapshot, fresh or not, without loading"""
+        return self._entries.get(name)
+
+    def is_fresh(self, snapshot: Snapshot) -> bool:
+        return time.monotonic() - snapshot.loaded_at < self.ttl
+
+    def is_servable_stale(self, snapshot: Snapshot) -> bool:
+        return time.monotonic() - snapshot.loaded_at < self.stale_ttl
+
+    async def get(self, name: str, loader: Callable[[], Awaitable[Any]]) -> Snapshot:
+        """Return a snapshot, reloading it with loader() when needed"""
+        snapshot = self._entries.get(name)
+        if snapshot is not None:
+            if self.is_fresh(snapshot):
+                self.hits += 1
+                return snapshot
+            if self.is_servable_stale(snapshot):
+                self.stale_served += 1
+                self._refresh_in_background(name, loader)
+                return snapshot
+        self.misses += 1
+        try:
+            return await self.load(name, loader)
+        except Exception as e:
+            fallback = self._last_good.get(name)
+            if fallback is None:
+                raise
+            self.degraded_served += 1
+            logger.warning("Serving last good %s snapshot: %s", name, e)
+            return replace(fallback, degraded=True)
+
+    def restore(self):
+        """Seed last good snapshots from the persistent store"""
+        if self.store is None:
+            return
+        for name, saved in self.store.load().items():
+            self._versions[name] = max(self._versions.get(name, 0), saved.get("version", 0))
+            self._last_good[name] = Snapshot(
+                value=saved["value"], version=saved.get("version", 0), etag=saved["etag"], loaded_at=0.0
+            )
+
+    async def load(self, name: str, loader: Callable[[], Awaitable[Any]]) -> Snapshot:
+        """Reload a snapshot; concurrent loads of the same name share one query"""
+        generation = self._generations.get(name, 0)
+        return await self._flights.do((name, generation), lambda: self._load(name, loader, generation))
+
+    async def _load(self, name: str, loader: Callable[[], Awaitable[Any]], generation: int) -> Snapshot:
+        value = await (self.breaker.call(loader) if self.breaker is not None else loader())
+        etag = compute_etag(value)
+        previous = self._entries.get(name)
+        if previous is not None and previous.etag == etag:
+            version = previous.version
+        else:
+            version = self._versions.get(name, 0) + 1
+            self._versions[name] = version
+        snapshot = Snapshot(value=value, version=version, etag=etag, loaded_at=time.monotonic())
+        # A load that raced with invalidate() may have read pre-write data; don't keep it
+        if self._generations.get(name, 0) == generation:
+            self._entries[name] = snapshot
+            self._last_good[name] = snapshot
+            if self.store is not None:
+                await self.store.save(name, value, etag, version)
+        return snapshot
+
+    def _refresh_in_background(self, name: str, loader: Callable[[], Awaitable[Any]]):
+        if name in self._refreshing or self._flights.in_flight((name, self._generations.get(name, 0))):
+            return
+        self._refreshing.add(name)
+
+        async def refresh():
+            try:
+                await self.load(name, loader)
+            except Exception as e:
+                logger.error("Background refresh of %s failed: %s", name, e)
+            finally:
+                self._refreshing.discard(name)
+
+        task = asyncio.create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def invalidate(self, name: str):
+        """Drop a snapshot so the next read reloads it"""
+        self._generations[name] = self._generations.get(name, 0) + 1
+        self._entries.pop(name, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_served": self.stale_served,
+            "coalesced": self._flights.coalesced,
+            "degraded_served": self.degraded_served
+        }
+
+
+# Shared snapshot cache for public reads
+read_cache = SnapshotCache()
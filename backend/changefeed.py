@@ -0,0 +1,215 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Collections published on the feed, and the field clients know each document by
+WATCHED_KEYS = {
+    "content_items": "key",
+    "program_tabs": "id",
+    "stat_tabs": "id",
+    "design_tokens": "hash",
+}
+
+# Epoch of a feed following the change stream: cluster time versions mean
+# the same thing on every worker
+CHANGE_STREAM_EPOCH = "cluster"
+
+
+def _serialize(doc: Optional[dict]) -> Optional[dict]:
+    if doc is None:
+        return None
+    return {
+        k: (v.isoformat() if isinstance(v, datetime) else v)
+        for k, v in doc.items()
+        if k != "_id"
+    }
+
+
+class ChangeFeed:
+    """Versioned stream of small deltas for CMS collections.
+
+    Every change gets the next version number and is fanned out to all
+    subscribers. A short history lets a reconnecting client catch up from
+    its last seen version; clients too far behind are told to resync.
+
+    Changes come from a Mongo change stream when the deployment supports
+    one (so edits made by any worker are seen), otherwise from publish()
+    calls in the handlers of this process.
+
+    In-process versions only mean something to the worker (and process
+    lifetime) that assigned them, so every delta carries the feed's epoch:
+    a random id while publishing in-process, CHANGE_STREAM_EPOCH while
+    following the change stream. A client resuming with another epoch's
+    version is told to resync.
+    """
+
+    def __init__(self, history: int = 500, subscriber_queue: int = 100):
+        self.version = 0
+        self.history: Deque[dict] = deque(maxlen=history)
+        self.subscriber_queue = subscriber_queue
+        self.source = "in_process"
+        self.epoch = uuid.uuid4().hex[:12]
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._listeners: List[Callable[[dict], Any]] = []
+        # Change stream delete events only carry _id; remember the public key
+        # of every (collection, _id)
+        self._keys: Dict[Tuple[str, Any], str] = {}
+        # Version of the newest delta that has fallen out of history
+        self._evicted = 0
+
+    def add_listener(self, listener: Callable[[dict], Any]):
+        """Call listener(delta) for every change, e.g. to invalidate caches"""
+        self._listeners.append(listener)
+
+    def _emit(self, collection: str, op: str, key: str, doc: Optional[dict], version: Optional[int] = None) -> dict:
+        self.version = version if version is not None and version > self.version else self.version + 1
+        delta = {"epoch": self.epoch, "version": self.version, "collection": collection, "op": op, "key": key, "doc": _serialize(doc)}
+        if len(self.history) == self.history.maxlen:
+            self._evicted = self.history[0]["version"]
+        self.history.append(delta)
+        for listener in self._listeners:
+            try:
+                listener(delta)
+            except Exception as e:
+                logger.error("Change feed listener failed: %s", e)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(delta)
+            except asyncio.QueueFull:
+                # Slow consumer: drop its backlog and ask it to refetch
+                self._reset_queue(queue)
+        return delta
+
+    def _reset_queue(self, queue: asyncio.Queue):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"epoch": self.epoch, "version": self.version, "op": "resync"})
+
+    def publish(self, collection: str, op: str, doc: Optional[dict] = None, key: Optional[str] = None):
+        """Record a local write; ignored while a change stream is the source"""
+        if self.source == "change_stream":
+            return
+        if key is None:
+            key = doc[WATCHED_KEYS[collection]]
+        self._emit(collection, op, key, doc if op == "upsert" else None)
+
+    def resync(self):
+        """Tell every subscriber to refetch, e.g. after a bulk import"""
+        for queue in list(self._subscribers):
+            self._reset_queue(queue)
+
+    def since(self, version: int, epoch: Optional[str]) -> Optional[List[dict]]:
+        """Deltas after version, or None if the client must refetch everything.
+
+        That happens when the version is from another epoch (a restarted
+        worker, or another worker's in-process feed), the deltas have left
+        history, or the version is from the future.
+        """
+        if epoch != self.epoch:
+            return None
+        if version == self.version:
+            return []
+        if version > self.version or version < self._evicted:
+            return None
+        return [delta for delta in self.history if delta["version"] > version]
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.subscriber_queue)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    async def watch(self, db, retry_seconds: float = 5.0):
+        """Feed from a change stream; falls back to in-process publishing if unsupported"""
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": list(WATCHED_KEYS)},
+            "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+        }}]
+        while True:
+            try:
+                for collection, key_field in WATCHED_KEYS.items():
+                    async for doc in db[collection].find({}, {"_id": 1, key_field: 1}):
+                        self._keys[(collection, doc["_id"])] = doc.get(key_field)
+                async with db.watch(pipeline, full_document="updateLookup") as stream:
+                    if self.source != "change_stream":
+                        logger.info("Change feed following a Mongo change stream")
+                    self._set_source("change_stream")
+                    async for change in stream:
+                        self._apply_change(change)
+            except asyncio.CancelledError:
+                raise
+            except (OperationFailure, NotImplementedError, AttributeError) as e:
+                # Standalone servers (and test doubles) have no change streams
+                logger.info("Change streams unavailable, using in-process change feed: %s", e)
+                self._set_source("in_process")
+                return
+            except PyMongoError as e:
+                logger.warning("Change stream interrupted, retrying in %ss: %s", retry_seconds, e)
+                self._set_source("in_process")
+                await asyncio.sleep(retry_seconds)
+
+    def _set_source(self, source: str):
+        if source == self.source:
+            return
+        self.source = source
+        # Versions from the other source can't be resumed from
+        self.epoch = CHANGE_STREAM_EPOCH if source == "change_stream" else uuid.uuid4().hex[:12]
+
+    def _apply_change(self, change: dict):
+        collection = change["ns"]["coll"]
+        object_id = change["documentKey"]["_id"]
+        # Cluster time orders changes the same way on every worker, so a client
+        # can resume from its last version after reconnecting to another pod
+        cluster_time = change.get("clusterTime")
+        version = (cluster_time.time << 32 | cluster_time.inc) if cluster_time is not None else None
+        if change["operationType"] == "delete":
+            key = self._keys.pop((collection, object_id), None)
+            if key is None:
+                return
+            if any(ref[0] == collection and other == key for ref, other in self._keys.items()):
+                # The document was moved to a new _id (see migrations.object_id_copy); it still exists
+                return
+            self._emit(collection, "delete", key, None, version)
+            return
+        doc = change.get("fullDocument")
+        if doc is None:
+            # Deleted again before the lookup ran; its delete event follows
+            return
+        key = doc.get(WATCHED_KEYS[collection])
+        self._keys[(collection, object_id)] = key
+        self._emit(collection, "upsert", key, doc, version)
+
+    def stats(self) -> dict:
+        return {"source": self.source, "epoch": self.epoch, "version": self.version, "subscribers": len(self._subscribers)}
+
+
+def event_id(epoch: str, version: int) -> str:
+    return f"{epoch}.{version}"
+
+
+def parse_event_id(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """(epoch, version) from a Last-Event-ID header, or None if malformed"""
+    epoch, _, version = (value or "").rpartition(".")
+    if not epoch or not version.isdigit():
+        return None
+    return epoch, int(version)
+
+
+def format_event(delta: dict) -> str:
+    """One Server-Sent Events message; the epoch and version make up the event id"""
+    event = "resync" if delta.get("op") == "resync" else "delta"
+    return f"id: {event_id(delta['epoch'], delta['version'])}\nevent: {event}\ndata: {json.dumps(delta, default=str)}\n\n"
+
+
+# Shared by the handlers and the SSE endpoint
+change_feed = ChangeFeed()
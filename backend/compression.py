@@ -0,0 +1,271 @@
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Only text-like payloads are worth compressing
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "text/",
+    "image/svg+xml",
+    "application/x-ndjson",
+)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """Encodings this server can produce, in order of preference"""
+    if brotli is not None:
+        return ("br", "gzip")
+    return ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported encoding from an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress_body(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 5) -> bytes:
+    """Compress a complete body with the given encoding"""
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class PrecompressedCache:
+    """LRU of compressed bodies keyed by encoding and response variant.
+
+    Only cacheable responses come here: shared snapshot responses whose
+    ETag names their content version. The variant is the path, query
+    string and Vary-listed request headers plus that ETag, so two
+    representations of one URL never share an entry even if their ETags
+    collide. Each variant is compressed once and then served from memory
+    for every following request. Per-user responses carry no ETag and
+    are never kept.
+    """
+
+    def __init__(self, max_entries: int = 256, max_body_size: int = 2 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_body_size = max_body_size
+        self._entries: "OrderedDict[Tuple[str, Hashable], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compress(
+        self, variant: Hashable, body: bytes, encoding: str, gzip_level: int, brotli_quality: int
+    ) -> bytes:
+        """variant identifies the response whose body this is (see _CompressionResponder._variant)"""
+        if len(body) > self.max_body_size:
+            return compress_body(body, encoding, gzip_level, brotli_quality)
+
+        key = (encoding, variant)
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compressed
+
+        compressed = compress_body(body, encoding, gzip_level, brotli_quality)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = compressed
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class _StreamCompressor:
+    """Incremental compressor that flushes after every chunk"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """Content-Encoding negotiation for gzip and brotli.
+
+    Complete bodies of cacheable responses go through a shared
+    PrecompressedCache so each content version is compressed once; other
+    bodies, and streaming bodies, are compressed on the fly.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+        cache: Optional[PrecompressedCache] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = cache if cache is not None else precompressed_cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, scope, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, scope: Scope, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.scope = scope
+        self.downstream = send
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.stream: Optional[_StreamCompressor] = None
+
+    def _compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return any(content_type.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+    def _variant(self, headers: Headers) -> Optional[tuple]:
+        """Cache key of a response every client may share, else None"""
+        cache_control = headers.get("cache-control", "").lower()
+        if "private" in cache_control or "no-store" in cache_control:
+            return None
+        etag = headers.get("etag")
+        if etag is None:
+            return None
+        # Accept-Encoding is already covered by the encoding half of the key
+        vary = {name.strip().lower() for name in headers.get("vary", "").split(",") if name.strip()}
+        vary.discard("accept-encoding")
+        if "*" in vary:
+            return None
+        request_headers = Headers(scope=self.scope)
+        return (
+            self.scope["path"],
+            self.scope.get("query_string", b""),
+            tuple((name, request_headers.get(name)) for name in sorted(vary)),
+            etag
+        )
+
+    async def send(self, message: Message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            self.start_message = message
+            self.passthrough = not self._compressible(Headers(raw=message["headers"]))
+            if self.passthrough:
+                await self.downstream(message)
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is not None:
+            chunk = self.stream.compress(body) if body else b""
+            if not more_body:
+                chunk += self.stream.finish()
+            await self.downstream({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            return
+
+        headers = MutableHeaders(raw=self.start_message["headers"])
+
+        if not more_body:
+            # Complete body: serve from the precompressed cache
+            if len(body) < self.middleware.minimum_size:
+                await self.downstream(self.start_message)
+                await self.downstream(message)
+                return
+            variant = self._variant(headers)
+            if variant is None:
+                compressed = compress_body(body, self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            else:
+                compressed = self.middleware.cache.get_or_compress(
+                    variant, body, self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality
+                )
+            headers["Content-Encoding"] = self.encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await self.downstream(self.start_message)
+            await self.downstream({"type": "http.response.body", "body": compressed})
+            return
+
+        # Streaming body: compress chunk by chunk
+        self.stream = _StreamCompressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if "content-length" in headers:
+            del headers["Content-Length"]
+        await self.downstream(self.start_message)
+        await self.downstream({"type": "http.response.body", "body": self.stream.compress(body), "more_body": True})
+
+
+# Shared cache used by the middleware
+precompressed_cache = PrecompressedCache()
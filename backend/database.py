@@ -0,0 +1,69 @@
+import os
+
+import profiling
+import tracing
+
+_client = None
+
+# Database handle installed by use_database(), e.g. an in-memory stand-in in tests
+_override = None
+
+
+def get_client():
+    """The process-wide Motor client, created on first use.
+
+    Importing a module never reads MONGO_URL or opens connection pools;
+    that happens on the first database access, normally in the lifespan.
+    """
+    global _client
+    if _client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        _client = AsyncIOMotorClient(
+            os.environ['MONGO_URL'],
+            serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+            timeoutMS=int(os.environ.get('MONGO_TIMEOUT_MS', '5000')),
+            event_listeners=[profiling.command_timer, tracing.command_listener]
+        )
+    return _client
+
+
+def close_client():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+def use_database(database):
+    """Serve every db access from database (a Motor database or a compatible
+    stand-in) instead of MONGO_URL/DB_NAME; None switches back"""
+    global _override
+    _override = database
+
+
+class LazyDatabase:
+    """Stands in for the Motor database until it is first used.
+
+    db.users, db["users"] and db.client work as on the real database.
+    """
+
+    def __init__(self, name_env: str = 'DB_NAME'):
+        self._name_env = name_env
+        self._database = None
+
+    def _resolve(self):
+        if _override is not None:
+            return _override
+        if self._database is None or self._database.client is not _client:
+            self._database = get_client()[os.environ[self._name_env]]
+        return self._database
+
+    def __getattr__(self, name: str):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name: str):
+        return self._resolve()[name]
+
+
+db = LazyDatabase()
@@ -0,0 +1,180 @@
+import hashlib
+import re
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+COLLECTION = "design_tokens"
+
+# Token groups and the selector each compiles to
+SCOPES = {
+    "base": ":root",
+    "light": '[data-theme="light"]',
+    "dark": '[data-theme="dark"]',
+}
+
+# Compiled bundles are served forever under their content hash
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_NAME = re.compile(r"^[a-z0-9]+(-[a-z0-9]+)*$")
+# Anything that could end the declaration or the rule block
+_UNSAFE_VALUE = re.compile(r"[;{}<>\\]|/\*|\*/")
+
+# First version, matching the variables App.css ships with
+DEFAULT_TOKENS = {
+    "base": {
+        "glass-backdrop-filter": "blur(25px)",
+        "hover-transform": "translateY(-8px)",
+        "hover-transition": "cubic-bezier(0.4, 0, 0.2, 1)",
+    },
+    "light": {
+        "program-border-width": "2px",
+        "stats-bg-color": "#ffffff",
+        "text-primary": "#2C3E50",
+        "card-border-aqua": "#E0F7FA",
+        "card-border-pink": "#FCE4EC",
+        "card-border-orange": "#FFF3E0",
+        "card-border-green": "#E8F5E8",
+        "ds-bg-glass": "rgba(255, 255, 255, 0.85)",
+    },
+    "dark": {
+        "program-border-width": "3px",
+        "stats-bg-color": "rgba(255, 255, 255, 0.06)",
+        "text-primary": "#F8FAFC",
+        "card-border-aqua": "#4A90A4",
+        "card-border-pink": "#B8739B",
+        "card-border-orange": "#CC9966",
+        "card-border-green": "#7AAF7A",
+        "ds-bg-glass": "rgba(255, 255, 255, 0.06)",
+        "hover-shadow": "0 12px 32px rgba(0, 0, 0, 0.4)",
+    },
+}
+
+
+def validate(tokens: dict) -> Dict[str, Dict[str, str]]:
+    """Check scopes, names and values; raises ValueError with the first problem"""
+    if not isinstance(tokens, dict):
+        raise ValueError("tokens must be an object")
+    clean = {}
+    for scope, values in tokens.items():
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown token scope '{scope}' (expected one of {', '.join(SCOPES)})")
+        if not isinstance(values, dict):
+            raise ValueError(f"Tokens for '{scope}' must be an object")
+        clean[scope] = {}
+        for name, value in values.items():
+            if not _NAME.match(name):
+                raise ValueError(f"Invalid token name '{name}'")
+            if not isinstance(value, (str, int, float)) or _UNSAFE_VALUE.search(str(value)):
+                raise ValueError(f"Invalid value for token '{name}'")
+            clean[scope][name] = str(value).strip()
+    return clean
+
+
+def compile_css(tokens: Dict[str, Dict[str, str]]) -> str:
+    """CSS custom properties, one rule per scope, in a stable order"""
+    rules = []
+    for scope, selector in SCOPES.items():
+        values = tokens.get(scope) or {}
+        if not values:
+            continue
+        declarations = "\n".join(f"  --{name}: {values[name]};" for name in sorted(values))
+        rules.append(f"{selector} {{\n{declarations}\n}}")
+    return "\n\n".join(rules) + "\n"
+
+
+def content_hash(css: str) -> str:
+    return hashlib.sha256(css.encode()).hexdigest()[:16]
+
+
+class BundleCache:
+    """Compiled bundles by hash, so each token version is compiled once per worker"""
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._bundles: "OrderedDict[str, dict]" = OrderedDict()
+
+    def add(self, bundle: dict):
+        self._bundles[bundle["hash"]] = bundle
+        self._bundles.move_to_end(bundle["hash"])
+        while len(self._bundles) > self.max_entries:
+            self._bundles.popitem(last=False)
+
+    def get(self, bundle_hash: str) -> Optional[dict]:
+        return self._bundles.get(bundle_hash)
+
+
+bundle_cache = BundleCache()
+
+
+def bundle_for(doc: dict) -> dict:
+    """Compiled bundle for a stored token version"""
+    cached = bundle_cache.get(doc["hash"])
+    if cached is not None:
+        return cached
+    css = compile_css(doc["tokens"])
+    bundle = {"version": doc["version"], "hash": doc["hash"], "css": css}
+    bundle_cache.add(bundle)
+    return bundle
+
+
+async def ensure_indexes(db):
+    await db[COLLECTION].create_index("version", unique=True)
+    await db[COLLECTION].create_index("hash")
+
+
+async def latest(db) -> Optional[dict]:
+    return await db[COLLECTION].find_one({}, {"_id": 0}, sort=[("version", -1)])
+
+
+async def find_by_hash(db, bundle_hash: str) -> Optional[dict]:
+    return await db[COLLECTION].find_one({"hash": bundle_hash}, {"_id": 0})
+
+
+async def _insert(db, version: int, tokens: dict, css: str, updated_by: Optional[str]) -> dict:
+    doc = {
+        "version": version,
+        "hash": content_hash(css),
+        "tokens": tokens,
+        "updated_by": updated_by,
+        "created_at": datetime.now(timezone.utc)
+    }
+    await db[COLLECTION].insert_one(doc)
+    doc.pop("_id", None)
+    bundle_cache.add({"version": version, "hash": doc["hash"], "css": css})
+    return doc
+
+
+async def save(db, tokens: dict, updated_by: Optional[str] = None) -> dict:
+    """Validate, compile and store tokens as the next version"""
+    tokens = validate(tokens)
+    css = compile_css(tokens)
+    while True:
+        current = await latest(db)
+        try:
+            return await _insert(db, (current["version"] + 1) if current else 1, tokens, css, updated_by)
+        except DuplicateKeyError:
+            # Another admin saved concurrently; take the next version number
+            continue
+
+
+async def seed_defaults(db):
+    """Store DEFAULT_TOKENS as version 1 unless some version already exists"""
+    if await latest(db) is not None:
+        return
+    tokens = validate(DEFAULT_TOKENS)
+    try:
+        await _insert(db, 1, tokens, compile_css(tokens), "system")
+    except DuplicateKeyError:
+        pass  # another worker seeded first
+
+
+def manifest(doc: dict) -> dict:
+    """What a client needs to link the stylesheet"""
+    return {
+        "version": doc["version"],
+        "hash": doc["hash"],
+        "href": f"/api/theme/{doc['hash']}.css",
+    }
@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import os
+import smtplib
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+
+import reset_tokens
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "email_jobs"
+SENT_RETENTION = timedelta(days=7)
+# Link emailed to users who request a password reset
+PASSWORD_RESET_URL = os.environ.get("PASSWORD_RESET_URL", "http://localhost:3000/reset-password?token={token}")
+
+
+class SMTPSettings:
+    """SMTP connection settings read from the environment"""
+
+    def __init__(self):
+        self.host = os.environ.get("SMTP_HOST", "localhost")
+        self.port = int(os.environ.get("SMTP_PORT", "1025"))
+        self.username = os.environ.get("SMTP_USERNAME")
+        self.password = os.environ.get("SMTP_PASSWORD")
+        self.use_tls = os.environ.get("SMTP_USE_TLS", "false").lower() == "true"
+        self.sender = os.environ.get("MAIL_FROM", "no-reply@ahlulbaytstudies.org")
+        self.timeout = float(os.environ.get("SMTP_TIMEOUT", "10"))
+
+
+# Message templates: kind -> (subject, body)
+TEMPLATES = {
+    "password_reset": (
+        "Reset your Ahlulbayt Studies password",
+        "Hello {name},\n\n"
+        "We received a request to reset your password. Use the link below within one hour:\n\n"
+        "{reset_url}\n\n"
+        "If you did not request this, you can ignore this email.\n"
+    ),
+    "account_approved": (
+        "Your Ahlulbayt Studies account has been approved",
+        "Hello {name},\n\n"
+        "Your account has been approved. You can now sign in and enroll in programs.\n"
+    ),
+}
+
+
+async def _password_reset_params(db, params: dict) -> Dict[str, Any]:
+    """Issue the reset token only when the mail is sent, so it is never stored in the job"""
+    token = await reset_tokens.issue(db, params["user_id"])
+    return {"reset_url": PASSWORD_RESET_URL.format(token=token)}
+
+
+# Template params that are secrets: kind -> coroutine producing them at send time
+SECRET_PARAMS: Dict[str, Callable[[Any, dict], Awaitable[Dict[str, Any]]]] = {
+    "password_reset": _password_reset_params,
+}
+
+
+async def ensure_indexes(db):
+    """Claim order index plus TTL cleanup of delivered mail"""
+    await db[COLLECTION].create_index([("status", 1), ("next_attempt_at", 1)])
+    await db[COLLECTION].create_index("sent_at", expireAfterSeconds=int(SENT_RETENTION.total_seconds()))
+
+
+async def enqueue(db, kind: str, to: str, max_attempts: int = 5, **params) -> str:
+    """Queue an email for background delivery and return the job id.
+
+    params must not contain secrets; the body is rendered at send time and
+    never stored.
+    """
+    if kind not in TEMPLATES:
+        raise KeyError(f"Unknown email template {kind}")
+    now = datetime.now(timezone.utc)
+    job = {
+        "id": str(uuid.uuid4()),
+        "kind": kind,
+        "to": to,
+        "params": params,
+        "status": "pending",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "next_attempt_at": now,
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "last_error": None,
+        "created_at": now
+    }
+    await db[COLLECTION].insert_one(job)
+    return job["id"]
+
+
+def _connect(settings: SMTPSettings) -> smtplib.SMTP:
+    smtp = smtplib.SMTP(settings.host, settings.port, timeout=settings.timeout)
+    try:
+        if settings.use_tls:
+            smtp.starttls()
+        if settings.username:
+            smtp.login(settings.username, settings.password or "")
+    except Exception:
+        smtp.close()
+        raise
+    return smtp
+
+
+def _disconnect(smtp: smtplib.SMTP):
+    try:
+        smtp.quit()
+    except (OSError, smtplib.SMTPException):
+        smtp.close()
+
+
+class EmailWorker:
+    """Background delivery of queued email.
+
+    Jobs are claimed with a lease, so several workers (in this process or
+    in other pods) never send the same message twice, and a job whose
+    worker died is picked up again once its lease expires. A batch shares
+    one SMTP connection, but each message renews its lease right before it
+    is sent and records its own outcome right after, so a slow batch or a
+    dropped connection never causes a message to be sent twice.
+    """
+
+    def __init__(
+        self,
+        db,
+        settings: Optional[SMTPSettings] = None,
+        batch_size: int = 20,
+        lease_seconds: float = 60.0,
+        poll_interval: float = 5.0,
+        retry_base_seconds: float = 30.0
+    ):
+        self.db = db
+        self.settings = settings or SMTPSettings()
+        self.batch_size = batch_size
+        # One send can take several SMTP round trips, each bounded by the timeout
+        self.lease = timedelta(seconds=max(lease_seconds, self.settings.timeout * 4))
+        self.poll_interval = poll_interval
+        self.retry_base_seconds = retry_base_seconds
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._wakeup = asyncio.Event()
+
+    def notify(self):
+        """Wake the worker after an enqueue instead of waiting for the next poll"""
+        self._wakeup.set()
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        return await self.db[COLLECTION].find_one_and_update(
+            {
+                "status": {"$in": ["pending", "sending"]},
+                "next_attempt_at": {"$lte": now},
+                "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lt": now}}]
+            },
+            {
+                "$set": {"status": "sending", "lease_owner": self.worker_id, "lease_expires_at": now + self.lease},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def renew(self, job: dict) -> bool:
+        """Extend the lease before sending; False if another worker has taken the job over"""
+        result = await self.db[COLLECTION].update_one(
+            {"id": job["id"], "status": "sending", "lease_owner": self.worker_id},
+            {"$set": {"lease_expires_at": datetime.now(timezone.utc) + self.lease}}
+        )
+        return result.matched_count == 1
+
+    async def render(self, job: dict) -> EmailMessage:
+        subject, body = TEMPLATES[job["kind"]]
+        params = dict(job.get("params") or {})
+        if job["kind"] in SECRET_PARAMS:
+            params.update(await SECRET_PARAMS[job["kind"]](self.db, params))
+        message = EmailMessage()
+        message["From"] = self.settings.sender
+        message["To"] = job["to"]
+        message["Subject"] = subject
+        message["X-Job-Id"] = job["id"]
+        message.set_content(body.format(**params))
+        return message
+
+    async def _finish(self, job: dict, error: Optional[str]):
+        now = datetime.now(timezone.utc)
+        if error is None:
+            update = {"status": "sent", "sent_at": now, "last_error": None}
+        elif job["attempts"] >= job["max_attempts"]:
+            update = {"status": "failed", "last_error": error}
+            logger.error("Giving up on email %s to %s: %s", job["id"], job["to"], error)
+        else:
+            delay = self.retry_base_seconds * 2 ** (job["attempts"] - 1)
+            update = {"status": "pending", "last_error": error, "next_attempt_at": now + timedelta(seconds=delay)}
+        update.update({"lease_owner": None, "lease_expires_at": None})
+        await self.db[COLLECTION].update_one({"id": job["id"], "lease_owner": self.worker_id}, {"$set": update})
+
+    async def run_once(self) -> int:
+        """Claim and deliver one batch; returns the number of jobs processed"""
+        jobs = []
+        while len(jobs) < self.batch_size:
+            job = await self.claim()
+            if job is None:
+                break
+            jobs.append(job)
+        if not jobs:
+            return 0
+
+        try:
+            smtp = await asyncio.to_thread(_connect, self.settings)
+        except (OSError, smtplib.SMTPException) as e:
+            for job in jobs:
+                await self._finish(job, str(e))
+            return len(jobs)
+
+        try:
+            for index, job in enumerate(jobs):
+                if not await self.renew(job):
+                    logger.warning("Lease on email %s was lost; leaving it to its new owner", job["id"])
+                    continue
+                try:
+                    message = await self.render(job)
+                    await asyncio.to_thread(smtp.send_message, message)
+                except (OSError, smtplib.SMTPServerDisconnected) as e:
+                    # The connection is gone: this message and the rest are retried, earlier ones stay sent
+                    for unsent in jobs[index:]:
+                        await self._finish(unsent, str(e))
+                    break
+                except smtplib.SMTPException as e:
+                    await self._finish(job, str(e))
+                else:
+                    await self._finish(job, None)
+        finally:
+            await asyncio.to_thread(_disconnect, smtp)
+        return len(jobs)
+
+    async def run_forever(self):
+        while True:
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                logger.error("Email worker error: %s", e)
+                processed = 0
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
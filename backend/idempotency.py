@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "idempotency_keys"
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+# How long a key is remembered; retries after this create a new resource
+RETENTION = timedelta(hours=24)
+
+# A request still "in progress" after this long is assumed to have died with its worker
+IN_PROGRESS_TIMEOUT = timedelta(seconds=60)
+
+# How often a running request renews its claim, well inside IN_PROGRESS_TIMEOUT
+RENEW_INTERVAL = IN_PROGRESS_TIMEOUT / 4
+
+
+class IdempotencyError(Exception):
+    """A key that cannot be honored; carries the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class Outcome(NamedTuple):
+    body: Any
+    replayed: bool
+
+
+def request_hash(payload: Any) -> str:
+    """Stable hash of a request body, independent of key order"""
+    canonical = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+async def ensure_indexes(db):
+    await db[COLLECTION].create_index("created_at", expireAfterSeconds=int(RETENTION.total_seconds()))
+
+
+async def _claim(db, record_id: str, fingerprint: str, owner: str) -> Any:
+    """Reserve the key for owner; returns the stored response if it already completed"""
+    now = datetime.now(timezone.utc)
+    try:
+        await db[COLLECTION].insert_one({
+            "_id": record_id,
+            "request_hash": fingerprint,
+            "state": "in_progress",
+            "owner": owner,
+            "created_at": now,
+            "locked_at": now
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+
+    existing = await db[COLLECTION].find_one({"_id": record_id})
+    if existing is None:
+        # Expired between the insert and the read; try once more
+        return await _claim(db, record_id, fingerprint, owner)
+    if existing["request_hash"] != fingerprint:
+        raise IdempotencyError(422, f"{HEADER} was already used with a different request body")
+    if existing["state"] == "done":
+        return existing
+    # Take over a request whose worker stopped without finishing or releasing it
+    taken = await db[COLLECTION].update_one(
+        {"_id": record_id, "state": "in_progress", "locked_at": {"$lt": now - IN_PROGRESS_TIMEOUT}},
+        {"$set": {"owner": owner, "locked_at": now}}
+    )
+    if taken.modified_count == 0:
+        raise IdempotencyError(409, "A request with this Idempotency-Key is still being processed")
+    return None
+
+
+async def _renew(db, record_id: str, owner: str):
+    """Keep the claim alive while create() runs, so a slow request isn't taken over"""
+    while True:
+        await asyncio.sleep(RENEW_INTERVAL.total_seconds())
+        try:
+            renewed = await db[COLLECTION].update_one(
+                {"_id": record_id, "owner": owner, "state": "in_progress"},
+                {"$set": {"locked_at": datetime.now(timezone.utc)}}
+            )
+        except Exception as e:
+            logger.warning("Could not renew idempotency key %s: %s", record_id, e)
+            continue
+        if renewed.matched_count == 0:
+            logger.warning("Idempotency key %s was taken over while its request was running", record_id)
+            return
+
+
+async def run(db, scope: str, key: str, payload: Any, create: Callable[[], Awaitable[Any]]) -> Outcome:
+    """Run create() at most once per (scope, key).
+
+    The first request stores its response; retries with the same key and
+    body get that response back without running create() again, and
+    retries while it is still running get a 409. The claim is renewed for
+    as long as create() runs. Failed requests release the key so they can
+    be retried.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(400, f"{HEADER} must be 1-{MAX_KEY_LENGTH} characters")
+    record_id = f"{scope}:{key}"
+    fingerprint = request_hash(payload)
+    owner = uuid.uuid4().hex
+
+    stored = await _claim(db, record_id, fingerprint, owner)
+    if stored is not None:
+        return Outcome(stored["response"], True)
+
+    renewal = asyncio.create_task(_renew(db, record_id, owner))
+    try:
+        body = jsonable_encoder(await create())
+    except BaseException:
+        await db[COLLECTION].delete_one({"_id": record_id, "owner": owner, "state": "in_progress"})
+        raise
+    finally:
+        renewal.cancel()
+
+    await db[COLLECTION].update_one(
+        {"_id": record_id, "owner": owner},
+        {"$set": {"state": "done", "response": body, "completed_at": datetime.now(timezone.utc)}}
+    )
+    return Outcome(body, False)
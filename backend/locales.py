@@ -0,0 +1,134 @@
+import json
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from cache import compute_etag
+
+# Locale stored in ContentItem.content; every other locale lives in ContentItem.translations
+DEFAULT_LOCALE = "en"
+SUPPORTED_LOCALES = ("en", "ar")
+RTL_LOCALES = {"ar"}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def normalize_locale(tag: str) -> str:
+    """'AR_sa' -> 'ar-SA'"""
+    parts = tag.strip().replace("_", "-").split("-")
+    return "-".join([parts[0].lower()] + [part.upper() if len(part) == 2 else part for part in parts[1:]])
+
+
+def _truncations(locale: str) -> List[str]:
+    """ar-SA -> ar-SA, ar"""
+    parts = normalize_locale(locale).split("-")
+    return ["-".join(parts[:i]) for i in range(len(parts), 0, -1)]
+
+
+def fallback_chain(locale: str) -> List[str]:
+    """Locales to try in order, e.g. ar-SA -> ar-SA, ar, en"""
+    chain = _truncations(locale)
+    if DEFAULT_LOCALE not in chain:
+        chain.append(DEFAULT_LOCALE)
+    return chain
+
+
+def parse_accept_language(header: Optional[str]) -> List[Tuple[str, float]]:
+    """Language ranges by descending q, ties kept in header order"""
+    ranges = []
+    for position, part in enumerate((header or "").split(",")):
+        tag, _, params = part.strip().partition(";")
+        if not tag:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            ranges.append((position, tag.strip(), q))
+    ranges.sort(key=lambda r: (-r[2], r[0]))
+    return [(tag, q) for _, tag, q in ranges]
+
+
+def negotiate(explicit: Optional[str] = None, accept_language: Optional[str] = None) -> str:
+    """Best supported locale: an explicit ?locale= wins over Accept-Language"""
+    candidates = [explicit] if explicit else [tag for tag, _ in parse_accept_language(accept_language)]
+    for tag in candidates:
+        if tag == "*":
+            return DEFAULT_LOCALE
+        for locale in _truncations(tag):
+            if locale in SUPPORTED_LOCALES:
+                return locale
+    return DEFAULT_LOCALE
+
+
+def resolve(item: dict, locale: str) -> str:
+    """The item's text in locale, following the fallback chain"""
+    translations = item.get("translations") or {}
+    for candidate in fallback_chain(locale):
+        if candidate == DEFAULT_LOCALE:
+            return item["content"]
+        if translations.get(candidate):
+            return translations[candidate]
+    return item["content"]
+
+
+def compile_bundle(items: Dict[str, dict], locale: str) -> dict:
+    """key -> string for one locale, serialized once so it can be served as-is"""
+    strings = {key: resolve(item, locale) for key, item in sorted(items.items())}
+    direction = "rtl" if locale in RTL_LOCALES else "ltr"
+    return {
+        "locale": locale,
+        "direction": direction,
+        # Locales without translations share their strings; the hash must still differ
+        "hash": compute_etag([locale, direction, strings]),
+        "strings": strings,
+        "body": json.dumps(strings, ensure_ascii=False, separators=(",", ":")).encode()
+    }
+
+
+class BundleSet:
+    """Per-locale bundles compiled from one content snapshot.
+
+    Bundles are rebuilt only when the content snapshot's ETag changes, i.e.
+    after a write. Bundles replaced by a rebuild stay servable by hash for a
+    while, so a client holding an older manifest does not get a 404.
+    """
+
+    def __init__(self, keep_previous: int = 8):
+        self.keep_previous = keep_previous
+        self.source_etag: Optional[str] = None
+        self.current: Dict[str, dict] = {}
+        self._by_hash: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+
+    def for_snapshot(self, snapshot) -> Dict[str, dict]:
+        if snapshot.etag != self.source_etag:
+            self.current = {locale: compile_bundle(snapshot.value, locale) for locale in SUPPORTED_LOCALES}
+            self.source_etag = snapshot.etag
+            for bundle in self.current.values():
+                self._by_hash[(bundle["locale"], bundle["hash"])] = bundle
+                self._by_hash.move_to_end((bundle["locale"], bundle["hash"]))
+            while len(self._by_hash) > len(SUPPORTED_LOCALES) * (self.keep_previous + 1):
+                self._by_hash.popitem(last=False)
+        return self.current
+
+    def find(self, locale: str, bundle_hash: str) -> Optional[dict]:
+        return self._by_hash.get((locale, bundle_hash))
+
+
+def manifest(bundle: dict) -> dict:
+    """What a client needs to fetch a locale's bundle"""
+    return {
+        "locale": bundle["locale"],
+        "direction": bundle["direction"],
+        "hash": bundle["hash"],
+        "href": f"/api/i18n/{bundle['locale']}/{bundle['hash']}.json",
+        "available": list(SUPPORTED_LOCALES)
+    }
+
+
+# Shared by the content endpoints
+bundles = BundleSet()
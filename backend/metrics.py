@@ -0,0 +1,153 @@
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Named metrics a stat tab can bind to: metric -> (collection, filter)
+METRICS = {
+    "students": ("users", {"role": "student"}),
+    "approved_students": ("users", {"role": "student", "status": "approved"}),
+    "pending_students": ("users", {"role": "student", "status": "pending"}),
+    "programs": ("program_tabs", {}),
+    "enrollments": ("enrollments", {}),
+}
+
+COUNTERS_COLLECTION = "metric_counters"
+
+# Times reconcile() recounts a metric whose counter keeps moving under it
+RECONCILE_ATTEMPTS = 3
+
+_transactions_supported: Optional[bool] = None
+
+
+def deltas_for(collection: str, doc: dict, sign: int = 1) -> Dict[str, int]:
+    """Counter changes caused by inserting (sign=1) or deleting (sign=-1) doc"""
+    deltas = {}
+    for name, (metric_collection, query) in METRICS.items():
+        if metric_collection != collection:
+            continue
+        if all(doc.get(field) == value for field, value in query.items()):
+            deltas[name] = sign
+    return deltas
+
+
+async def ensure_indexes(db):
+    """One counter document per metric"""
+    await db[COUNTERS_COLLECTION].create_index("name", unique=True)
+
+
+async def transactions_supported(db) -> bool:
+    """Multi-document transactions need a replica set or mongos"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = await db.command("hello")
+            _transactions_supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        except Exception:
+            _transactions_supported = False
+    return _transactions_supported
+
+
+async def apply_deltas(db, deltas: Dict[str, int], session=None):
+    """Increment counters in place"""
+    now = datetime.now(timezone.utc)
+    for name, delta in deltas.items():
+        if delta:
+            await db[COUNTERS_COLLECTION].update_one(
+                {"name": name},
+                {"$inc": {"value": delta}, "$set": {"updated_at": now}},
+                upsert=True,
+                session=session
+            )
+
+
+async def write_with_counters(
+    db,
+    write: Callable[..., Awaitable],
+    deltas: Union[Dict[str, int], Callable[[Any], Dict[str, int]]]
+):
+    """Run write(session) and its counter updates in one transaction when possible.
+
+    deltas may be a callable taking the write result, for writes whose
+    effect is only known afterwards (e.g. a delete that matched nothing).
+    On a standalone server the writes are applied back to back and any
+    drift is repaired by reconcile().
+    """
+    global _transactions_supported
+    if await transactions_supported(db):
+        try:
+            async with await db.client.start_session() as session:
+                async with session.start_transaction():
+                    result = await write(session)
+                    await apply_deltas(db, deltas(result) if callable(deltas) else deltas, session=session)
+                    return result
+        except OperationFailure as e:
+            if e.code != 20:  # IllegalOperation: transactions unavailable
+                raise
+            _transactions_supported = False
+
+    result = await write(None)
+    await apply_deltas(db, deltas(result) if callable(deltas) else deltas)
+    return result
+
+
+async def get_values(db) -> Dict[str, int]:
+    """Current counter values; a single small read"""
+    values = {name: 0 for name in METRICS}
+    async for counter in db[COUNTERS_COLLECTION].find({}, {"_id": 0, "name": 1, "value": 1}):
+        if counter["name"] in values:
+            values[counter["name"]] = counter.get("value", 0)
+    return values
+
+
+async def _reconcile_one(db, name: str, collection: str, query: dict, now: datetime) -> Optional[int]:
+    for _ in range(RECONCILE_ATTEMPTS):
+        # Read the counter before counting: an $inc committed after this read
+        # changes the value, and the conditional write below then misses
+        counter = await db[COUNTERS_COLLECTION].find_one({"name": name}, {"_id": 0, "value": 1})
+        value = await db[collection].count_documents(query)
+        fields = {"value": value, "updated_at": now, "reconciled_at": now}
+        if counter is None:
+            try:
+                await db[COUNTERS_COLLECTION].insert_one({"name": name, **fields})
+                return value
+            except DuplicateKeyError:
+                continue
+        result = await db[COUNTERS_COLLECTION].update_one(
+            {"name": name, "value": counter.get("value")},
+            {"$set": fields}
+        )
+        if result.matched_count:
+            return value
+    logger.warning("Metric %s kept changing during reconcile; leaving it for the next run", name)
+    return None
+
+
+async def reconcile(db) -> Dict[str, int]:
+    """Recount every metric from its source collection and store the result.
+
+    A counter is only overwritten if no write incremented it while it was
+    being recounted, so a concurrent $inc is never lost. Returns the
+    metrics that were stored.
+    """
+    now = datetime.now(timezone.utc)
+    values = {}
+    for name, (collection, query) in METRICS.items():
+        value = await _reconcile_one(db, name, collection, query, now)
+        if value is not None:
+            values[name] = value
+    return values
+
+
+def bind_stat_tabs(tabs: list, values: Dict[str, int]) -> list:
+    """Replace the value of metric-bound stat tabs with the live count"""
+    bound = []
+    for tab in tabs:
+        metric = tab.get("metric")
+        if metric in values:
+            tab = {**tab, "value": str(values[metric])}
+        bound.append(tab)
+    return bound
@@ -0,0 +1,351 @@
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import DeleteOne, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+import metrics
+from models import ProgramTab, StatTab, normalize_email
+
+logger = logging.getLogger(__name__)
+
+STATE_COLLECTION = "schema_migrations"
+
+
+class Migration:
+    """A versioned backfill over one collection.
+
+    query selects the documents that still need the fix, so a document is
+    never rewritten twice and the migration can be re-run safely. transform
+    turns one of them into the write operations that fix it; they must be
+    idempotent, since a batch interrupted halfway is written again. With
+    transactional=True each batch is written in one transaction where the
+    deployment supports it.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        name: str,
+        collection: str,
+        query: Dict[str, Any],
+        transform: Callable[[dict], List[Any]],
+        transactional: bool = False
+    ):
+        self.version = version
+        self.name = name
+        self.collection = collection
+        self.query = query
+        self.transform = transform
+        self.transactional = transactional
+
+
+# BSON comparison order of the _id types we expect. A range query on _id only
+# matches values of the checkpoint's own type, so later types are added explicitly.
+_ID_TYPES = ["number", "string", "object", "binData", "objectId", "bool", "date"]
+
+
+def _id_type(value) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, datetime):
+        return "date"
+    return "binData"
+
+
+def after_checkpoint(checkpoint) -> dict:
+    """_id strictly greater than checkpoint in BSON order; served from the _id index"""
+    later = _ID_TYPES[_ID_TYPES.index(_id_type(checkpoint)) + 1:]
+    return {"$or": [{"_id": {"$gt": checkpoint}}] + [{"_id": {"$type": name}} for name in later]}
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    """ISO strings and naive datetimes as aware UTC datetimes"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def timestamps_as_dates(doc: dict) -> List[Any]:
+    """created_at/updated_at stored as strings or missing become BSON dates"""
+    created = _parse_timestamp(doc.get("created_at"))
+    if created is None:
+        created = doc["_id"].generation_time if isinstance(doc["_id"], ObjectId) else datetime.now(timezone.utc)
+    updated = _parse_timestamp(doc.get("updated_at")) or created
+    return [UpdateOne({"_id": doc["_id"]}, {"$set": {"created_at": created, "updated_at": updated}})]
+
+
+TIMESTAMPS_DRIFTED = {"$or": [
+    {"created_at": {"$not": {"$type": "date"}}},
+    {"updated_at": {"$not": {"$type": "date"}}},
+]}
+
+
+def model_defaults(model) -> Dict[str, Any]:
+    """Plain (non-factory) defaults of a pydantic model"""
+    return {
+        name: field.default
+        for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    }
+
+
+def fill_missing_fields(model) -> Callable[[dict], List[Any]]:
+    """Give documents inserted as raw dicts the fields the model would have written"""
+    defaults = model_defaults(model)
+
+    def transform(doc: dict) -> List[Any]:
+        changes = {name: value for name, value in defaults.items() if name not in doc}
+        if "id" not in doc:
+            changes["id"] = str(uuid.uuid4())
+        if doc.get("image") == "":
+            # Raw inserts stored "" where the model stores None
+            changes["image"] = None
+        return [UpdateOne({"_id": doc["_id"]}, {"$set": changes})] if changes else []
+
+    return transform
+
+
+def fields_missing(model) -> dict:
+    fields = list(model_defaults(model)) + ["id"]
+    query = [{name: {"$exists": False}} for name in fields]
+    if "image" in model.model_fields:
+        query.append({"image": ""})
+    return {"$or": query}
+
+
+def derived_object_id(value: str) -> ObjectId:
+    """The same ObjectId every time for a given string _id"""
+    return ObjectId(hashlib.sha1(value.encode()).digest()[:12])
+
+
+def object_id_copy(doc: dict) -> List[Any]:
+    """Move a document with a string _id to an ObjectId; its public id is unchanged.
+
+    The new _id is derived from the old one and written with an upsert, so
+    re-running after a crash between the two writes overwrites the same
+    copy instead of adding another.
+    """
+    new_id = derived_object_id(doc["_id"])
+    return [ReplaceOne({"_id": new_id}, {**doc, "_id": new_id}, upsert=True), DeleteOne({"_id": doc["_id"]})]
+
+
+def drop_legacy_reset_fields(doc: dict) -> List[Any]:
+    """Reset tokens now live in their own collection; remove the copies older versions kept on users"""
+    return [UpdateOne({"_id": doc["_id"]}, {"$unset": {"password_reset_token": "", "password_reset_expires": ""}})]
+
+
+LEGACY_RESET_FIELDS = {"$or": [
+    {"password_reset_token": {"$exists": True}},
+    {"password_reset_expires": {"$exists": True}},
+]}
+
+
+def normalized_email(doc: dict) -> List[Any]:
+    """Store emails the way registration and login look them up.
+
+    Every user is checked in Python: Mongo's $toLower and regex classes
+    only cover ASCII, so non-ASCII capitals would be missed by a query.
+    Two accounts that collide once normalized fail the migration with a
+    duplicate key error; they have to be merged by hand.
+    """
+    email = normalize_email(doc["email"])
+    return [UpdateOne({"_id": doc["_id"]}, {"$set": {"email": email}})] if email != doc["email"] else []
+
+
+# Applied in version order; never renumber or edit one that has shipped
+MIGRATIONS = [
+    Migration(1, "program_tabs_timestamps_as_dates", "program_tabs", TIMESTAMPS_DRIFTED, timestamps_as_dates),
+    Migration(2, "stat_tabs_timestamps_as_dates", "stat_tabs", TIMESTAMPS_DRIFTED, timestamps_as_dates),
+    Migration(3, "content_items_timestamps_as_dates", "content_items", TIMESTAMPS_DRIFTED, timestamps_as_dates),
+    Migration(4, "users_timestamps_as_dates", "users", TIMESTAMPS_DRIFTED, timestamps_as_dates),
+    Migration(5, "program_tabs_model_fields", "program_tabs", fields_missing(ProgramTab), fill_missing_fields(ProgramTab)),
+    Migration(6, "stat_tabs_model_fields", "stat_tabs", fields_missing(StatTab), fill_missing_fields(StatTab)),
+    Migration(7, "stat_tabs_object_ids", "stat_tabs", {"_id": {"$type": "string"}}, object_id_copy, transactional=True),
+    Migration(8, "users_drop_legacy_reset_fields", "users", LEGACY_RESET_FIELDS, drop_legacy_reset_fields),
+    Migration(9, "users_normalized_emails", "users", {"email": {"$type": "string"}}, normalized_email),
+]
+
+
+class MigrationRunner:
+    """Applies pending migrations in small batches against a live database.
+
+    Each batch reads batch_size matching documents after the checkpoint (by
+    _id), writes their fixes with one bulk_write, and stores the new
+    checkpoint, so a restart resumes where it stopped. After every batch the
+    runner sleeps in proportion to how long the batch took (duty_cycle=0.5
+    means half the time is spent idle) to leave room for live traffic.
+    """
+
+    def __init__(
+        self,
+        db,
+        migrations: List[Migration] = MIGRATIONS,
+        batch_size: int = 200,
+        duty_cycle: float = 0.5,
+        lease_seconds: float = 60.0
+    ):
+        self.db = db
+        self.migrations = sorted(migrations, key=lambda m: m.version)
+        self.batch_size = batch_size
+        self.duty_cycle = duty_cycle
+        self.lease = timedelta(seconds=lease_seconds)
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    async def _claim(self, migration: Migration) -> Optional[dict]:
+        """Lease the migration so only one worker runs it; None if someone else holds it"""
+        now = datetime.now(timezone.utc)
+        try:
+            return await self.db[STATE_COLLECTION].find_one_and_update(
+                {
+                    "_id": migration.version,
+                    "status": {"$ne": "done"},
+                    "$or": [{"lease_owner": self.owner}, {"lease_until": {"$lt": now}}, {"lease_until": None}]
+                },
+                {
+                    "$set": {"name": migration.name, "collection": migration.collection,
+                             "lease_owner": self.owner, "lease_until": now + self.lease, "status": "running"},
+                    "$setOnInsert": {"checkpoint": None, "scanned": 0, "modified": 0, "batches": 0, "started_at": now}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Done, or leased by another worker
+            return None
+
+    async def _run_batch(self, migration: Migration, state: dict) -> bool:
+        """One batch; returns False once nothing is left after the checkpoint"""
+        started = time.perf_counter()
+        query = dict(migration.query)
+        if state.get("checkpoint") is not None:
+            query = {"$and": [migration.query, after_checkpoint(state["checkpoint"])]}
+        docs = await self.db[migration.collection].find(query).sort("_id", 1).limit(self.batch_size).to_list(self.batch_size)
+        if not docs:
+            return False
+
+        writes = [write for doc in docs for write in migration.transform(doc)]
+        modified = 0
+        if writes:
+            result = await self._write(migration, writes)
+            modified = result.modified_count + result.inserted_count + result.upserted_count
+        duration = time.perf_counter() - started
+
+        state["checkpoint"] = docs[-1]["_id"]
+        await self.db[STATE_COLLECTION].update_one(
+            {"_id": migration.version, "lease_owner": self.owner},
+            {
+                "$set": {
+                    "checkpoint": state["checkpoint"],
+                    "lease_until": datetime.now(timezone.utc) + self.lease,
+                    "last_batch_ms": round(duration * 1000, 2),
+                    "updated_at": datetime.now(timezone.utc)
+                },
+                "$inc": {"scanned": len(docs), "modified": modified, "batches": 1}
+            }
+        )
+        await asyncio.sleep(duration * (1 - self.duty_cycle) / self.duty_cycle)
+        return len(docs) == self.batch_size
+
+    async def _write(self, migration: Migration, writes: List[Any]):
+        collection = self.db[migration.collection]
+        if migration.transactional and await metrics.transactions_supported(self.db):
+            async with await self.db.client.start_session() as session:
+                async with session.start_transaction():
+                    return await collection.bulk_write(writes, ordered=True, session=session)
+        return await collection.bulk_write(writes, ordered=True)
+
+    async def run(self, max_seconds: Optional[float] = None) -> List[dict]:
+        """Advance pending migrations in order until done or max_seconds has passed"""
+        deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+        results = []
+        for migration in self.migrations:
+            state = await self._claim(migration)
+            if state is None:
+                continue
+            if state.get("total") is None:
+                # Estimate for progress reporting; taken once per migration
+                total = await self.db[migration.collection].count_documents(migration.query)
+                await self.db[STATE_COLLECTION].update_one({"_id": migration.version}, {"$set": {"total": total}})
+            try:
+                while await self._run_batch(migration, state):
+                    if deadline is not None and time.monotonic() >= deadline:
+                        await self._release(migration, "running")
+                        results.append({"version": migration.version, "name": migration.name, "status": "running"})
+                        return results
+            except Exception as e:
+                logger.error("Migration %s failed at checkpoint %s: %s", migration.name, state.get("checkpoint"), e)
+                await self._release(migration, "failed", error=str(e))
+                results.append({"version": migration.version, "name": migration.name, "status": "failed", "error": str(e)})
+                # Later migrations may depend on this one
+                return results
+            await self._release(migration, "done")
+            logger.info("Migration %s done", migration.name)
+            results.append({"version": migration.version, "name": migration.name, "status": "done"})
+        return results
+
+    async def _release(self, migration: Migration, status: str, error: Optional[str] = None):
+        changes: Dict[str, Any] = {"status": status, "lease_until": None, "error": error}
+        if status == "done":
+            changes["finished_at"] = datetime.now(timezone.utc)
+        await self.db[STATE_COLLECTION].update_one({"_id": migration.version, "lease_owner": self.owner}, {"$set": changes})
+
+
+async def is_done(db, name: str) -> bool:
+    """Whether the named migration has finished on this database"""
+    version = next(migration.version for migration in MIGRATIONS if migration.name == name)
+    state = await db[STATE_COLLECTION].find_one({"_id": version}, {"status": 1})
+    return state is not None and state.get("status") == "done"
+
+
+async def progress(db, migrations: List[Migration] = MIGRATIONS) -> List[dict]:
+    """State of every known migration, with percent done and throughput"""
+    states = {state["_id"]: state async for state in db[STATE_COLLECTION].find({})}
+    rows = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        state = states.get(migration.version, {})
+        total = state.get("total")
+        scanned = state.get("scanned", 0)
+        started_at, updated_at = state.get("started_at"), state.get("finished_at") or state.get("updated_at")
+        elapsed = (updated_at - started_at).total_seconds() if started_at and updated_at else None
+        rows.append({
+            "version": migration.version,
+            "name": migration.name,
+            "collection": migration.collection,
+            "status": state.get("status", "pending"),
+            "scanned": scanned,
+            "modified": state.get("modified", 0),
+            "total": total,
+            "percent": 100.0 if state.get("status") == "done" else (round(scanned / total * 100, 1) if total else None),
+            "docs_per_second": round(scanned / elapsed, 1) if elapsed else None,
+            "batches": state.get("batches", 0),
+            "last_batch_ms": state.get("last_batch_ms"),
+            "checkpoint": str(state["checkpoint"]) if state.get("checkpoint") is not None else None,
+            "error": state.get("error"),
+            "started_at": started_at,
+            "finished_at": state.get("finished_at")
+        })
+    return rows
@@ -1,9 +1,17 @@
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, BeforeValidator, Field, EmailStr, TypeAdapter
+from typing import Annotated, List, Optional, Dict, Any, Type, TypeVar
+from functools import lru_cache
 from datetime import datetime, timezone
 from enum import Enum
 import uuid
 
+def normalize_email(value: Any) -> Any:
+    """Emails are stored and looked up trimmed and lowercased"""
+    return value.strip().lower() if isinstance(value, str) else value
+
+# Email as typed by a user, normalized before validation
+NormalizedEmail = Annotated[EmailStr, BeforeValidator(normalize_email)]
+
 class UserRole(str, Enum):
     SUPER_ADMIN = "super_admin"
     ADMIN = "admin"
@@ -26,17 +34,29 @@ class User(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.utcnow())
     updated_at: datetime = Field(default_factory=lambda: datetime.utcnow())
 
-class UserCreate(BaseModel):
+class AuthPrincipal(BaseModel):
+    """The authenticated user behind a request: User without the password hash"""
+    id: str
     email: EmailStr
     name: str
     age: Optional[int] = None
     phone: Optional[str] = None
     role: UserRole
+    status: UserStatus = UserStatus.PENDING
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class UserCreate(BaseModel):
+    email: NormalizedEmail
+    name: str
+    age: Optional[int] = None
+    phone: Optional[str] = None
+    role: UserRole
     password: str
     admin_code: Optional[str] = None
 
 class UserLogin(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
     password: str
 
 class UserResponse(BaseModel):
@@ -122,7 +142,8 @@ class ContentItem(BaseModel):
     key: str  # Unique identifier for the content (e.g., "hero_title", "enroll_button")
     content_type: ContentType
     title: str  # Human-readable title for admin interface
-    content: str  # The actual text content
+    content: str  # The actual text content, in the default locale
+    translations: Dict[str, str] = Field(default_factory=dict)  # Other locales, e.g. {"ar": "..."}
     description: Optional[str] = None  # Description for admin reference
     context: Optional[Dict[str, Any]] = None  # Additional context (e.g., program_id)
     created_at: datetime = Field(default_factory=lambda: datetime.utcnow())
@@ -134,6 +155,7 @@ class ContentItemCreate(BaseModel):
     content_type: ContentType
     title: str
     content: str
+    translations: Dict[str, str] = Field(default_factory=dict)
     description: Optional[str] = None
     context: Optional[Dict[str, Any]] = None
 
@@ -141,12 +163,16 @@ class ContentItemUpdate(BaseModel):
     content: str
     updated_at: datetime = Field(default_factory=lambda: datetime.utcnow())
 
+class ContentTranslationUpdate(BaseModel):
+    content: str
+
 class ContentItemResponse(BaseModel):
     id: str
     key: str
     content_type: ContentType
     title: str
     content: str
+    translations: Dict[str, str] = Field(default_factory=dict)
     description: Optional[str] = None
     context: Optional[Dict[str, Any]] = None
     updated_at: datetime
@@ -175,6 +201,7 @@ class StatTab(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
     value: str
+    metric: Optional[str] = None  # Named live metric that overrides value (see metrics.METRICS)
     border_color_light: str = "#4A90A4"
     border_color_dark: str = "#B8739B"
     type: str = "informational"  # informational, interactive, warning, success
@@ -184,8 +211,26 @@ class StatTab(BaseModel):
 
 # Password Reset Models
 class PasswordResetRequest(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
 
 class PasswordReset(BaseModel):
     token: str
-    new_password: str
\ No newline at end of file
+    new_password: str
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+def from_document(model: Type[ModelT], doc: dict) -> ModelT:
+    """Build a model from a trusted database document without re-validating it.
+
+    Only for documents this app wrote through validated models: types are
+    taken as stored (enums stay plain strings, which compare equal to the
+    enum members). Unknown keys such as _id are dropped; missing fields
+    get their defaults.
+    """
+    return model.model_construct(**{name: doc[name] for name in model.model_fields if name in doc})
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """Cached TypeAdapter validating/serializing a whole List[model] in one call"""
+    return TypeAdapter(List[model])
@@ -0,0 +1,123 @@
+"""Minimal OTLP/HTTP JSON trace collector that keeps spans in memory.
+
+Stand-in for an OpenTelemetry collector during development and tests:
+
+    python otlp_stub.py --port 4318
+
+Run the backend with TRACING_EXPORTER=otlp and
+OTEL_EXPORTER_OTLP_ENDPOINT=http://localhost:4318 and every exported
+trace is printed as an indented span tree.
+"""
+import argparse
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+
+class LocalCollector:
+    """Accepts POST /v1/traces with OTLP JSON bodies"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 4318, echo: bool = False):
+        self.host = host
+        self.port = port
+        self.echo = echo
+        self.spans: List[dict] = []
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._received = threading.Condition()
+
+    def start(self):
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != "/v1/traces":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                collector._store(payload)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        # Port 0 picks a free port; report the real one
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="otlp-collector").start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def wait_for(self, count: int, timeout: float = 5.0) -> List[dict]:
+        """Block until at least count spans have arrived"""
+        with self._received:
+            if not self._received.wait_for(lambda: len(self.spans) >= count, timeout):
+                raise TimeoutError(f"Only {len(self.spans)} of {count} spans arrived")
+        return self.spans
+
+    def _store(self, payload: dict):
+        spans = [
+            span
+            for resource_spans in payload.get("resourceSpans", [])
+            for scope_spans in resource_spans.get("scopeSpans", [])
+            for span in scope_spans.get("spans", [])
+        ]
+        with self._received:
+            self.spans.extend(spans)
+            self._received.notify_all()
+        if self.echo:
+            print_trees(spans)
+
+
+def print_trees(spans: List[dict]):
+    """Print spans as trees, one per trace, with durations in ms"""
+    children = defaultdict(list)
+    ids = {span["spanId"] for span in spans}
+    for span in sorted(spans, key=lambda s: int(s["startTimeUnixNano"])):
+        parent = span.get("parentSpanId")
+        children[parent if parent in ids else None].append(span)
+
+    def walk(span: dict, depth: int):
+        duration_ms = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+        print(f"{'  ' * depth}{span['name']} {duration_ms:.2f}ms")
+        for child in children.get(span["spanId"], []):
+            walk(child, depth + 1)
+
+    for root in children[None]:
+        print(f"--- trace {root['traceId']}")
+        walk(root, 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    args = parser.parse_args()
+    collector = LocalCollector(args.host, args.port, echo=True).start()
+    print(f"Local OTLP collector listening on {collector.host}:{collector.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        collector.stop()
@@ -0,0 +1,272 @@
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Deque, Optional
+
+from pymongo import monitoring
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# The profile of the request whose context is running; Motor copies the
+# context into its executor threads, so command listeners see it too
+_active_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("active_profile", default=None)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_FLAG = "__profile"
+
+# Frames whose file path contains one of these markers count toward a category
+CATEGORIES = {
+    "pydantic": ("/pydantic/", "/pydantic_core/"),
+    "bcrypt": ("/passlib/", "/bcrypt/"),
+    "mongo": ("/pymongo/", "/motor/", "/bson/"),
+}
+
+
+class RequestProfile:
+    """Samples and Mongo timings collected for one profiled request"""
+
+    def __init__(self, method: str, path: str, interval: float):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.started_at = datetime.now(timezone.utc)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.other_samples = 0
+        self.category_samples: Counter = Counter()
+        self.mongo_commands: Counter = Counter()
+        self.mongo_micros = 0
+        self.duration_ms = 0.0
+        self.status: Optional[int] = None
+
+    def add_sample(self, frames: list):
+        self.samples += 1
+        self.stacks[";".join(frames)] += 1
+        joined = "\n".join(frames)
+        for category, markers in CATEGORIES.items():
+            if any(marker in joined for marker in markers):
+                self.category_samples[category] += 1
+
+    def timings_ms(self) -> dict:
+        """Time per category; Mongo uses measured command durations"""
+        timings = {c: round(n * self.interval * 1000, 2) for c, n in self.category_samples.items()}
+        timings["mongo"] = round(max(self.mongo_micros / 1000, timings.get("mongo", 0.0)), 2)
+        timings.setdefault("pydantic", 0.0)
+        timings.setdefault("bcrypt", 0.0)
+        return timings
+
+    def folded(self) -> str:
+        """Collapsed stacks ("a;b;c count"), readable by flamegraph.pl and speedscope"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "samples": self.samples,
+            # Samples taken while the event loop was running other requests or idle; not in the stacks
+            "samples_excluded": self.other_samples,
+            "sample_interval_ms": self.interval * 1000,
+            "timings_ms": self.timings_ms(),
+            "mongo_commands": dict(self.mongo_commands)
+        }
+
+
+class _StackSampler(threading.Thread):
+    """Periodically captures the stack of the event loop thread.
+
+    The loop thread interleaves every request, so a sample only counts when
+    the profiled request's own frame (marker) is on the stack; samples
+    taken while other tasks run are counted as excluded. Work the request
+    hands to other tasks or threads is not sampled.
+    """
+
+    def __init__(self, target_thread_id: int, profile: RequestProfile, marker):
+        super().__init__(daemon=True, name="request-profiler")
+        self.target_thread_id = target_thread_id
+        self.profile = profile
+        self.marker = marker
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.profile.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            frames = []
+            ours = False
+            while frame is not None:
+                ours = ours or frame is self.marker
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if not ours:
+                self.profile.other_samples += 1
+            elif frames:
+                frames.reverse()
+                self.profile.add_sample(frames)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Adds Mongo command durations to the profile of the request that issued them"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.mongo_micros += event.duration_micros
+            profile.mongo_commands[event.command_name] += 1
+
+
+class RateLimiter:
+    """Sliding window: at most max_calls per period seconds"""
+
+    def __init__(self, max_calls: int, period: float):
+        self.max_calls = max_calls
+        self.period = period
+        self._calls: Deque[float] = deque()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        while self._calls and now - self._calls[0] >= self.period:
+            self._calls.popleft()
+        if len(self._calls) >= self.max_calls:
+            return False
+        self._calls.append(now)
+        return True
+
+
+class ProfileStore:
+    """The most recent profiles, kept in memory for download"""
+
+    def __init__(self, keep: int = 20):
+        self.keep = keep
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+
+    def add(self, profile: RequestProfile):
+        self._profiles[profile.id] = profile
+        while len(self._profiles) > self.keep:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        return self._profiles.get(profile_id)
+
+    def summaries(self) -> list:
+        return [profile.summary() for profile in reversed(self._profiles.values())]
+
+
+class ProfilerMiddleware:
+    """Profiles single requests on demand for admins.
+
+    A request opts in with an "X-Profile: 1" header or "?__profile=1".
+    authorize(authorization_header) decides whether the caller may
+    profile. Only one request is profiled at a time and the rate limiter
+    caps how often; requests that are refused still run normally.
+    Results are summarized in a Server-Timing header and kept in memory
+    for download as folded stacks.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        authorize: Callable[[str], Awaitable[bool]],
+        max_per_minute: int = 6,
+        sample_interval_ms: float = 1.0,
+        store: Optional[ProfileStore] = None
+    ):
+        self.app = app
+        self.authorize = authorize
+        self.limiter = RateLimiter(max_per_minute, 60.0)
+        self.interval = sample_interval_ms / 1000
+        self.store = store if store is not None else profile_store
+        self._lock = asyncio.Lock()
+
+    def _requested(self, scope: Scope) -> bool:
+        if Headers(scope=scope).get(PROFILE_HEADER, "").lower() in ("1", "true"):
+            return True
+        query = scope.get("query_string", b"").decode("latin-1")
+        return any(part in (f"{PROFILE_QUERY_FLAG}=1", f"{PROFILE_QUERY_FLAG}=true") for part in query.split("&"))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        refusal = None
+        if not await self.authorize(Headers(scope=scope).get("authorization", "")):
+            refusal = "forbidden"
+        elif self._lock.locked() or not self.limiter.allow():
+            refusal = "rate-limited"
+
+        if refusal is not None:
+            async def send_refused(message: Message):
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message).append("X-Profile-Status", refusal)
+                await send(message)
+            await self.app(scope, receive, send_refused)
+            return
+
+        async with self._lock:
+            await self._profile(scope, receive, send)
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send):
+        profile = RequestProfile(scope["method"], scope["path"], self.interval)
+        sampler = _StackSampler(threading.get_ident(), profile, sys._getframe())
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                # Headers go out before the body, so report timings up to this point
+                profile.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+                timings = profile.timings_ms()
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Profile-Id", profile.id)
+                headers.append("Server-Timing", ", ".join(
+                    [f"total;dur={profile.duration_ms}"] + [f"{name};dur={ms}" for name, ms in timings.items()]
+                ))
+            await send(message)
+
+        token = _active_profile.set(profile)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            await asyncio.to_thread(sampler.stop)
+            _active_profile.reset(token)
+            profile.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            self.store.add(profile)
+
+
+def profiler_settings() -> dict:
+    """ProfilerMiddleware options from the environment"""
+    return {
+        "max_per_minute": int(os.environ.get("PROFILE_MAX_PER_MINUTE", "6")),
+        "sample_interval_ms": float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", "1")),
+    }
+
+
+# Shared by the Motor client's event listeners and the middleware
+command_timer = MongoCommandTimer()
+profile_store = ProfileStore()
@@ -0,0 +1,50 @@
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+COLLECTION = "password_reset_tokens"
+TOKEN_LIFETIME = timedelta(hours=1)
+
+
+def hash_token(token: str) -> str:
+    """Only the SHA-256 of a reset token is ever stored"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def ensure_indexes(db):
+    """Unique lookup by token hash; Mongo's TTL monitor removes expired tokens"""
+    await db[COLLECTION].create_index("token_hash", unique=True)
+    await db[COLLECTION].create_index("expires_at", expireAfterSeconds=0)
+    await db[COLLECTION].create_index("user_id")
+
+
+async def issue(db, user_id: str) -> str:
+    """Create a reset token for a user, replacing any outstanding one"""
+    token = secrets.token_urlsafe(32)
+    now = datetime.now(timezone.utc)
+    await db[COLLECTION].delete_many({"user_id": user_id})
+    await db[COLLECTION].insert_one({
+        "token_hash": hash_token(token),
+        "user_id": user_id,
+        "created_at": now,
+        "expires_at": now + TOKEN_LIFETIME
+    })
+    return token
+
+
+async def consume(db, token: str) -> Optional[str]:
+    """Atomically redeem a token; returns the user id, or None if invalid or expired"""
+    # The TTL monitor runs about once a minute, so expiry is still checked here
+    record = await db[COLLECTION].find_one_and_delete({
+        "token_hash": hash_token(token),
+        "expires_at": {"$gt": datetime.now(timezone.utc)}
+    })
+    return record["user_id"] if record else None
+
+
+async def purge_expired(db) -> int:
+    """Delete expired tokens without waiting for the TTL monitor"""
+    result = await db[COLLECTION].delete_many({"expires_at": {"$lte": datetime.now(timezone.utc)}})
+    return result.deleted_count
+
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the database while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated database errors or timeouts.
+
+    closed    -> calls go through; failure_threshold consecutive failures open it
+    open      -> calls are rejected immediately for reset_timeout seconds
+    half_open -> one trial call; success closes the breaker, failure reopens it
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0, call_timeout: float = 2.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def _record_success(self):
+        if self.opened_at is not None:
+            logger.info("Circuit %s closed", self.name)
+        self.failures = 0
+        self.opened_at = None
+
+    def _record_failure(self, error: BaseException):
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                self.times_opened += 1
+                logger.error("Circuit %s opened after %d failures: %s", self.name, self.failures, error)
+            self.opened_at = time.monotonic()
+
+    async def call(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            self.rejected += 1
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+
+        trial = state == "half_open"
+        if trial:
+            self._trial_in_flight = True
+        try:
+            result = await asyncio.wait_for(func(), timeout=self.call_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        finally:
+            if trial:
+                self._trial_in_flight = False
+        self._record_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
+
+
+class SnapshotStore:
+    """Persists last-good snapshots to a local JSON file.
+
+    Lets a freshly started worker serve public content even when the
+    database is unreachable from the first request.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data: Dict[str, dict] = {}
+
+    def load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+        except FileNotFoundError:
+            self._data = {}
+        except (OSError, ValueError) as e:
+            logger.error("Could not read snapshot file %s: %s", self.path, e)
+            self._data = {}
+        return self._data
+
+    def _write(self, data: Dict[str, dict]):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=str, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    async def save(self, name: str, value: Any, etag: str, version: int):
+        """Record a snapshot; the file is only rewritten when content changed"""
+        previous = self._data.get(name)
+        if previous is not None and previous.get("etag") == etag:
+            return
+        self._data[name] = {"value": value, "etag": etag, "version": version}
+        try:
+            await asyncio.to_thread(self._write, dict(self._data))
+        except OSError as e:
+            logger.error("Could not write snapshot file %s: %s", self.path, e)
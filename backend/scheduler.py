@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+LEASES_COLLECTION = "scheduler_leases"
+LEADER_LEASE_ID = "maintenance-leader"
+
+
+class Job:
+    """A recurring maintenance task and its timing metrics"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable],
+        interval: float,
+        jitter: float = 0.1,
+        leader_only: bool = True,
+        timeout: Optional[float] = None,
+        run_at_start: bool = False
+    ):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.leader_only = leader_only
+        self.timeout = timeout if timeout is not None else interval
+        self.run_at_start = run_at_start
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_duration: Optional[float] = None
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_run_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    def next_delay(self) -> float:
+        """Interval with +/- jitter so workers don't fire in lockstep"""
+        spread = self.interval * self.jitter
+        return max(0.0, self.interval + random.uniform(-spread, spread))
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "leader_only": self.leader_only,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_duration_ms": round(self.last_duration * 1000, 2) if self.last_duration is not None else None,
+            "avg_duration_ms": round(self.total_duration / self.runs * 1000, 2) if self.runs else None,
+            "max_duration_ms": round(self.max_duration * 1000, 2),
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_error": self.last_error
+        }
+
+
+class Scheduler:
+    """Runs recurring jobs inside the app lifespan.
+
+    Jobs marked leader_only run on exactly one worker across the
+    deployment: the one holding the leader lease document in Mongo.
+    """
+
+    def __init__(self, db, lease_seconds: float = 30.0):
+        self.db = db
+        self.lease = timedelta(seconds=lease_seconds)
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.jobs: Dict[str, Job] = {}
+        self.is_leader = False
+        # Monotonic deadline of the lease as last renewed, measured from before the renewal was sent
+        self._leader_until = 0.0
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(self, name: str, func: Callable[[], Awaitable], interval: float, **options) -> Job:
+        job = Job(name, func, interval, **options)
+        self.jobs[name] = job
+        return job
+
+    async def try_acquire_leadership(self) -> bool:
+        """Take or renew the leader lease; returns whether this worker leads"""
+        now = datetime.now(timezone.utc)
+        requested = time.monotonic()
+        try:
+            await self.db[LEASES_COLLECTION].find_one_and_update(
+                {"_id": LEADER_LEASE_ID, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + self.lease, "renewed_at": now}},
+                upsert=True
+            )
+            self.is_leader = True
+            self._leader_until = requested + self.lease.total_seconds()
+        except DuplicateKeyError:
+            # Someone else holds a live lease
+            self.is_leader = False
+        except Exception as e:
+            logger.error("Scheduler lease error: %s", e)
+            self.is_leader = False
+        return self.is_leader
+
+    def holds_lease(self) -> bool:
+        """Leader with an unexpired lease.
+
+        is_leader alone is only refreshed every lease/3; if renewals stall
+        (a slow or unreachable database), another worker takes over once
+        the lease runs out, and this worker must stop acting as leader.
+        """
+        return self.is_leader and time.monotonic() < self._leader_until
+
+    async def release_leadership(self):
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        try:
+            await self.db[LEASES_COLLECTION].update_one(
+                {"_id": LEADER_LEASE_ID, "owner": self.owner},
+                {"$set": {"expires_at": datetime.now(timezone.utc)}}
+            )
+        except Exception as e:
+            logger.error("Error releasing scheduler lease: %s", e)
+
+    async def _lease_loop(self):
+        while True:
+            await self.try_acquire_leadership()
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+
+    async def run_job(self, job: Job):
+        """Run a job once, recording its timing"""
+        if job.leader_only and not self.holds_lease():
+            job.skipped += 1
+            return
+        started = time.perf_counter()
+        job.last_run_at = datetime.now(timezone.utc)
+        try:
+            await asyncio.wait_for(job.func(), timeout=job.timeout)
+            job.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e) or type(e).__name__
+            logger.error("Scheduled job %s failed: %s", job.name, job.last_error, extra={"job": job.name})
+        finally:
+            duration = time.perf_counter() - started
+            job.runs += 1
+            job.last_duration = duration
+            job.total_duration += duration
+            job.max_duration = max(job.max_duration, duration)
+
+    async def _job_loop(self, job: Job):
+        if job.run_at_start:
+            await self.run_job(job)
+        while True:
+            await asyncio.sleep(job.next_delay())
+            await self.run_job(job)
+
+    async def start(self):
+        await self.try_acquire_leadership()
+        self._tasks.append(asyncio.create_task(self._lease_loop()))
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._job_loop(job)))
+
+    async def stop(self):
+        """Cancel all jobs, wait for them to unwind and hand over leadership"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        await self.release_leadership()
+
+    def stats(self) -> dict:
+        return {
+            "owner": self.owner,
+            "is_leader": self.holds_lease(),
+            "jobs": [job.stats() for job in self.jobs.values()]
+        }
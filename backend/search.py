@@ -0,0 +1,222 @@
+import bisect
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Searchable fields and their ranking weight per collection
+SEARCH_FIELDS = {
+    # translations is a {locale: text} map; every locale is searchable
+    "content_items": {"title": 3.0, "content": 1.0, "translations": 1.0, "description": 1.0, "key": 2.0},
+    "program_tabs": {"title": 3.0, "description": 1.0},
+}
+
+# Fields kept in memory to render a result without a database round trip
+RESULT_FIELDS = {
+    "content_items": ("id", "key", "title", "content", "content_type"),
+    "program_tabs": ("id", "title", "description", "type", "order"),
+}
+
+_ARABIC_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_ARABIC_LETTER_MAP = str.maketrans({
+    "أ": "ا",  # alef with hamza above -> alef
+    "إ": "ا",  # alef with hamza below -> alef
+    "آ": "ا",  # alef with madda -> alef
+    "ٱ": "ا",  # alef wasla -> alef
+    "ى": "ي",  # alef maqsura -> yeh
+    "ة": "ه",  # teh marbuta -> heh
+})
+_ARABIC_ARTICLES = ("وال", "بال", "كال", "فال", "ال", "لل")
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Minimum query token length before prefix expansion kicks in
+MIN_PREFIX_LENGTH = 2
+PREFIX_MATCH_WEIGHT = 0.6
+
+
+def normalize(text: str) -> str:
+    """Fold case, compatibility forms and Arabic orthographic variants"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _ARABIC_DIACRITICS.sub("", text)
+    return text.translate(_ARABIC_LETTER_MAP)
+
+
+def _strip_article(token: str) -> Optional[str]:
+    for article in _ARABIC_ARTICLES:
+        if token.startswith(article) and len(token) - len(article) >= 2:
+            return token[len(article):]
+    return None
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized Arabic/English tokens"""
+    tokens = []
+    for token in _TOKEN.findall(normalize(text or "")):
+        tokens.append(token)
+        stem = _strip_article(token)
+        if stem:
+            tokens.append(stem)
+    return tokens
+
+
+class SearchIndex:
+    """In-process inverted index over CMS content and program tabs.
+
+    Documents are added and removed as they are written, so the index is
+    kept current without rescanning the collections.
+    """
+
+    def __init__(self, fields: Dict[str, Dict[str, float]] = SEARCH_FIELDS):
+        self.fields = fields
+        self._postings: Dict[str, Dict[Tuple[str, str], float]] = defaultdict(dict)
+        self._doc_terms: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._docs: Dict[Tuple[str, str], dict] = {}
+        self._sorted_terms: List[str] = []
+        self._terms_dirty = False
+        # Writes seen while a rebuild is reading the database
+        self._pending: Optional[List[Tuple[str, Optional[str], Optional[dict]]]] = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    def upsert(self, collection: str, doc: dict):
+        """Index (or re-index) a single document"""
+        if self._pending is not None:
+            self._pending.append((collection, doc["id"] if doc.get("id") else None, doc))
+        self._upsert(collection, doc)
+
+    def remove(self, collection: str, doc_id: str):
+        """Drop a document from the index"""
+        if self._pending is not None:
+            self._pending.append((collection, doc_id, None))
+        self._remove(collection, doc_id)
+
+    def _upsert(self, collection: str, doc: dict):
+        if collection not in self.fields or not doc.get("id"):
+            return
+        ref = (collection, doc["id"])
+        self._remove(collection, doc["id"])
+
+        weights: Dict[str, float] = defaultdict(float)
+        for field, weight in self.fields[collection].items():
+            value = doc.get(field)
+            texts = value.values() if isinstance(value, dict) else [value]
+            for text in texts:
+                if isinstance(text, str):
+                    for token in tokenize(text):
+                        weights[token] += weight
+
+        for term, weight in weights.items():
+            if term not in self._postings:
+                self._terms_dirty = True
+            self._postings[term][ref] = weight
+        self._doc_terms[ref] = dict(weights)
+        self._docs[ref] = {f: doc.get(f) for f in RESULT_FIELDS[collection]}
+
+    def _remove(self, collection: str, doc_id: str):
+        ref = (collection, doc_id)
+        for term in self._doc_terms.pop(ref, {}):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(ref, None)
+            if not postings:
+                del self._postings[term]
+                self._terms_dirty = True
+        self._docs.pop(ref, None)
+
+    def clear(self):
+        self._postings.clear()
+        self._doc_terms.clear()
+        self._docs.clear()
+        self._sorted_terms = []
+        self._terms_dirty = False
+
+    async def rebuild(self, db):
+        """Rebuild the whole index from the database.
+
+        The new index is built on the side while searches keep using the
+        current one, then swapped in with a single assignment. Upserts and
+        removals that arrive while the collections are being read are
+        replayed onto the new index first, so none of them are lost.
+        """
+        if self._pending is not None:
+            # A rebuild is already running and will pick up the same writes
+            return
+        fresh = SearchIndex(self.fields)
+        self._pending = []
+        try:
+            for collection, fields in self.fields.items():
+                projection = {f: 1 for f in set(fields) | set(RESULT_FIELDS[collection])}
+                projection["_id"] = 0
+                async for doc in db[collection].find({}, projection):
+                    fresh._upsert(collection, doc)
+            for collection, doc_id, doc in self._pending:
+                if doc is None:
+                    fresh._remove(collection, doc_id)
+                else:
+                    fresh._upsert(collection, doc)
+        finally:
+            self._pending = None
+        self._postings, self._doc_terms, self._docs, self._sorted_terms, self._terms_dirty = (
+            fresh._postings, fresh._doc_terms, fresh._docs, fresh._sorted_terms, fresh._terms_dirty
+        )
+
+    def _expand(self, token: str) -> Dict[str, float]:
+        """Terms matching a query token: exact match plus prefix matches"""
+        matches = {}
+        if token in self._postings:
+            matches[token] = 1.0
+        if len(token) < MIN_PREFIX_LENGTH:
+            return matches
+        if self._terms_dirty:
+            self._sorted_terms = sorted(self._postings)
+            self._terms_dirty = False
+        terms = self._sorted_terms
+        for i in range(bisect.bisect_left(terms, token), len(terms)):
+            if not terms[i].startswith(token):
+                break
+            matches.setdefault(terms[i], PREFIX_MATCH_WEIGHT)
+        return matches
+
+    def search(
+        self,
+        query: str,
+        collections: Optional[Iterable[str]] = None,
+        skip: int = 0,
+        limit: int = 20,
+    ) -> Tuple[int, List[dict]]:
+        """Ranked search; every query token must match. Returns (total, page)"""
+        tokens = list(dict.fromkeys(_TOKEN.findall(normalize(query or ""))))
+        if not tokens:
+            return 0, []
+        allowed = set(collections) if collections else set(self.fields)
+        total_docs = max(len(self._docs), 1)
+
+        scores: Optional[Dict[Tuple[str, str], float]] = None
+        for token in tokens:
+            token_scores: Dict[Tuple[str, str], float] = defaultdict(float)
+            for term, match_weight in self._expand(token).items():
+                postings = self._postings[term]
+                idf = math.log(1 + total_docs / len(postings))
+                for ref, weight in postings.items():
+                    if ref[0] in allowed:
+                        token_scores[ref] += (1 + math.log(weight)) * idf * match_weight
+            if scores is None:
+                scores = dict(token_scores)
+            else:
+                scores = {ref: s + token_scores[ref] for ref, s in scores.items() if ref in token_scores}
+            if not scores:
+                return 0, []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        page = [
+            {"collection": ref[0], "score": round(score, 4), **self._docs[ref]}
+            for ref, score in ranked[skip:skip + limit]
+        ]
+        return len(ranked), page
+
+
+# Shared index used by the API
+search_index = SearchIndex()
@@ -1,48 +1,90 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
+import json
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import uuid
-from datetime import datetime, timezone
-from passlib.context import CryptContext
+from datetime import datetime, timedelta, timezone
 import asyncio
-import secrets
-import hashlib
-from models import User, UserRole, UserStatus, ContentItem, ContentType, Token, UserCreate, UserLogin, UserResponse, PasswordResetRequest, PasswordReset, ProgramTab, StatTab
+import time
+from contextlib import asynccontextmanager
+from models import AuthPrincipal, User, UserRole, UserStatus, ContentItem, ContentType, Token, UserCreate, UserLogin, UserResponse, PasswordResetRequest, PasswordReset, ProgramTab, StatTab, ContentTranslationUpdate, from_document, list_adapter
 from auth import create_access_token, verify_password, get_current_user, verify_token, get_password_hash
+from compression import CompressionMiddleware
+from logging_config import configure_logging, RequestContextMiddleware
+import profiling
+import tracing
+import transfer
+from search import search_index, SEARCH_FIELDS
+from cache import read_cache, compute_etag
+from resilience import CircuitBreaker, SnapshotStore
+import metrics
+import migrations
+import reset_tokens
+import users
+import email_queue
+import idempotency
+import analytics
+import audit
+import design_tokens
+import locales
+from scheduler import Scheduler
+import database
+from changefeed import change_feed, event_id, format_event, parse_event_id
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# MongoDB connection; the client is created on first use, not at import
+db = database.db
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Public reads fail fast and fall back to the last good snapshot while Mongo is unhealthy
+mongo_breaker = CircuitBreaker(
+    "mongo",
+    failure_threshold=int(os.environ.get('MONGO_BREAKER_THRESHOLD', '5')),
+    reset_timeout=float(os.environ.get('MONGO_BREAKER_RESET_SECONDS', '30')),
+    call_timeout=float(os.environ.get('MONGO_READ_TIMEOUT_SECONDS', '2'))
+)
+read_cache.breaker = mongo_breaker
+if os.environ.get('SNAPSHOT_FALLBACK_PATH'):
+    read_cache.store = SnapshotStore(os.environ['SNAPSHOT_FALLBACK_PATH'])
 
 # Security
 security = HTTPBearer()
 
+# The landing document may be reused briefly by browsers and CDNs
+LANDING_CACHE_CONTROL = "public, max-age=30"
+
+# Heartbeats older than this are removed by the maintenance scheduler
+STATUS_CHECK_RETENTION_DAYS = int(os.environ.get('STATUS_CHECK_RETENTION_DAYS', '30'))
+
+# Admin mutations are buffered and written in batches; see audit.py
+audit_log = audit.AuditLog(
+    flush_interval=float(os.environ.get('AUDIT_FLUSH_SECONDS', '2')),
+    spool_path=os.environ.get('AUDIT_SPOOL_PATH')
+)
+AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', '365'))
+
 async def create_super_admin():
     """Create super admin user if it doesn't exist"""
     try:
-        existing_admin = await db.users.find_one({"email": "zbazzi199@gmail.com"})
+        existing_admin = await users.find_by_email(db, "zbazzi199@gmail.com", users.ID_ONLY)
         if not existing_admin:
             super_admin = User(
                 email="zbazzi199@gmail.com",
                 name="Super Admin",
                 role=UserRole.SUPER_ADMIN,
                 status=UserStatus.APPROVED,
-                hashed_password=pwd_context.hash("SuperSecure2025!"),
+                hashed_password=get_password_hash("SuperSecure2025!"),
                 created_at=datetime.utcnow(),
                 updated_at=datetime.utcnow()
             )
@@ -51,7 +93,7 @@ async def create_super_admin():
         else:
             logger.info("Super admin already exists")
     except Exception as e:
-        logger.error(f"Error creating super admin: {e}")
+        logger.error("Error creating super admin: %s", e)
 
 async def create_default_content():
     """Create default content items if they don't exist"""
@@ -171,33 +213,174 @@ async def create_default_content():
             }
         ]
         
-        super_admin = await db.users.find_one({"email": "zbazzi199@gmail.com"})
+        super_admin = await users.find_by_email(db, "zbazzi199@gmail.com", users.ID_ONLY)
         if not super_admin:
             logger.error("Super admin not found for content creation")
             return
             
+        # One round trip for the keys already present
+        existing_keys = {
+            item["key"] async for item in db.content_items.find(
+                {"key": {"$in": [content["key"] for content in default_content]}}, {"_id": 0, "key": 1}
+            )
+        }
+        created = []
         for content_data in default_content:
-            existing_content = await db.content_items.find_one({"key": content_data["key"]})
-            if not existing_content:
+            if content_data["key"] not in existing_keys:
                 content_item = ContentItem(
                     **content_data,
                     updated_by=super_admin["id"]
                 )
                 await db.content_items.insert_one(content_item.dict())
-                logger.info(f"Created default content: {content_data['key']}")
-            else:
-                logger.info(f"Content already exists: {content_data['key']}")
+                created.append(content_data["key"])
+        
+        # One summary line instead of a line per key
+        logger.info(
+            "Default content: %d created, %d already present",
+            len(created),
+            len(default_content) - len(created),
+            extra={"created_keys": created}
+        )
                 
     except Exception as e:
-        logger.error(f"Error creating default content: {e}")
+        logger.error("Error creating default content: %s", e)
 
 async def init_database():
-    """Initialize database with required data"""
+    """Seed the data the first requests need; everything else waits for warm_up()"""
     await create_super_admin()
     await create_default_content()
+    read_cache.invalidate("content_items")
+
+async def warm_up():
+    """Index builds, theme seed and search index, run once the app is already serving.
+
+    Index builds are no-ops after the first deployment; counter reconcile
+    and data fixes run from the leader's scheduler jobs.
+    """
+    started = time.perf_counter()
+    try:
+        await users.ensure_indexes(db)
+        await metrics.ensure_indexes(db)
+        await reset_tokens.ensure_indexes(db)
+        await email_queue.ensure_indexes(db)
+        await idempotency.ensure_indexes(db)
+        await audit.ensure_indexes(db, AUDIT_RETENTION_DAYS)
+        await design_tokens.ensure_indexes(db)
+        await analytics.ensure_indexes(db)
+        await db.status_checks.create_index("timestamp")
+        await design_tokens.seed_defaults(db)
+        read_cache.invalidate("design_tokens")
+        await search_index.rebuild(db)
+        logger.info("Warm-up finished in %.0fms", (time.perf_counter() - started) * 1000)
+    except Exception as e:
+        logger.error("Warm-up failed: %s", e)
+
+async def purge_expired_reset_tokens():
+    """Remove expired reset tokens"""
+    await reset_tokens.purge_expired(db)
+
+async def refresh_read_caches():
+    """Repair drift in snapshots and the search index.
+
+    Change feed deltas keep both current; this only catches anything a
+    worker missed, so it runs rarely.
+    """
+    await search_index.rebuild(db)
+    await asyncio.gather(
+        read_cache.load("content_items", load_content_items),
+        read_cache.load("program_tabs", load_program_tabs),
+        read_cache.load("stat_tabs", load_stat_tabs)
+    )
+
+async def compact_status_checks():
+    """Drop heartbeats older than the retention window"""
+    cutoff = datetime.utcnow() - timedelta(days=STATUS_CHECK_RETENTION_DAYS)
+    await db.status_checks.delete_many({"timestamp": {"$lt": cutoff}})
+
+async def reconcile_metrics():
+    """Repair drift in the live metric counters"""
+    await metrics.reconcile(db)
+    read_cache.invalidate("metrics")
+
+async def refresh_analytics():
+    """Fold new documents into the analytics summary collections"""
+    await analytics.refresh_all(db)
+
+MIGRATIONS_INTERVAL = float(os.environ.get('MIGRATIONS_INTERVAL', '60'))
+
+async def run_migrations():
+    """Advance pending data migrations, leaving time for the next tick"""
+    runner = migrations.MigrationRunner(db, batch_size=int(os.environ.get('MIGRATION_BATCH_SIZE', '200')))
+    await runner.run(max_seconds=MIGRATIONS_INTERVAL * 0.75)
+    if not await users.email_index_enforced(db):
+        # Retry in case identical stored emails kept the index from being built
+        await users.ensure_indexes(db)
+
+def build_scheduler() -> Scheduler:
+    """Recurring maintenance jobs, kept off the request path"""
+    maintenance = Scheduler(db)
+    maintenance.add_job("purge_expired_reset_tokens", purge_expired_reset_tokens, interval=15 * 60)
+    maintenance.add_job(
+        "refresh_read_caches",
+        refresh_read_caches,
+        interval=float(os.environ.get('READ_CACHE_REPAIR_INTERVAL', str(30 * 60))),
+        leader_only=False
+    )
+    maintenance.add_job("compact_status_checks", compact_status_checks, interval=60 * 60)
+    maintenance.add_job(
+        "reconcile_metrics",
+        reconcile_metrics,
+        interval=float(os.environ.get('METRICS_RECONCILE_INTERVAL', '300')),
+        run_at_start=True
+    )
+    maintenance.add_job("run_migrations", run_migrations, interval=MIGRATIONS_INTERVAL, run_at_start=True)
+    maintenance.add_job(
+        "refresh_analytics",
+        refresh_analytics,
+        interval=float(os.environ.get('ANALYTICS_REFRESH_INTERVAL', '60'))
+    )
+    return maintenance
+
+# Background tasks started with the app
+background_tasks = []
+email_worker = None
+maintenance_scheduler = None
+warm_up_task = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect, initialize and start background work; undo it all on shutdown"""
+    global email_worker, maintenance_scheduler, warm_up_task
+    read_cache.restore()
+    try:
+        await init_database()
+    except Exception as e:
+        # Keep serving public content from the snapshot fallback
+        logger.error("Database initialization failed, starting in degraded mode: %s", e)
+    warm_up_task = asyncio.create_task(warm_up())
+    background_tasks.append(warm_up_task)
+    audit_log.db = db
+    audit_log.restore_spool()
+    background_tasks.append(asyncio.create_task(audit_log.run_forever()))
+    email_worker = email_queue.EmailWorker(db)
+    for _ in range(int(os.environ.get('EMAIL_WORKERS', '1'))):
+        background_tasks.append(asyncio.create_task(email_worker.run_forever()))
+    background_tasks.append(asyncio.create_task(change_feed.watch(db)))
+    maintenance_scheduler = build_scheduler()
+    await maintenance_scheduler.start()
+    try:
+        yield
+    finally:
+        await maintenance_scheduler.stop()
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        background_tasks.clear()
+        await audit_log.close()
+        database.close_client()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -217,11 +400,22 @@ class StatusCheckCreate(BaseModel):
 async def root():
     return {"message": "Hello World"}
 
+@api_router.get("/health")
+async def health():
+    """Database breaker state, snapshot cache and change feed statistics"""
+    return {
+        "status": "ok" if mongo_breaker.state == "closed" else "degraded",
+        "warmed_up": warm_up_task is not None and warm_up_task.done(),
+        "mongo": mongo_breaker.stats(),
+        "read_cache": read_cache.stats(),
+        "change_feed": change_feed.stats()
+    }
+
 @api_router.get("/check-super-admin")
 async def check_super_admin():
     """Check if super admin exists in database"""
     try:
-        admin = await db.users.find_one({"email": "zbazzi199@gmail.com"})
+        admin = await users.find_by_email(db, "zbazzi199@gmail.com", users.LISTING_ROW)
         if admin:
             return {
                 "exists": True,
@@ -236,15 +430,66 @@ async def check_super_admin():
     except Exception as e:
         return {"exists": False, "error": str(e)}
 
+def serialize_tab(tab: dict) -> dict:
+    """Strip the Mongo ObjectId and render datetimes as ISO strings"""
+    # Remove MongoDB ObjectId if present
+    if "_id" in tab:
+        del tab["_id"]
+    # Convert datetime objects to strings if they exist
+    if "created_at" in tab and hasattr(tab["created_at"], "isoformat"):
+        tab["created_at"] = tab["created_at"].isoformat()
+    if "updated_at" in tab and hasattr(tab["updated_at"], "isoformat"):
+        tab["updated_at"] = tab["updated_at"].isoformat()
+    return tab
+
+async def load_content_items():
+    """Load all content items keyed by content key"""
+    items = await db.content_items.find(
+        {}, {"_id": 0, "key": 1, "content": 1, "translations": 1, "title": 1, "content_type": 1}
+    ).to_list(length=None)
+    return {item["key"]: item for item in items}
+
+async def load_program_tabs():
+    """Load all program tabs in display order"""
+    tabs = await db.program_tabs.find().sort("order", 1).to_list(length=None)
+    return [serialize_tab(tab) for tab in tabs]
+
+async def load_stat_tabs():
+    """Load all stat tabs in display order"""
+    tabs = await db.stat_tabs.find().sort("order", 1).to_list(length=None)
+    return [serialize_tab(tab) for tab in tabs]
+
+async def load_metric_values():
+    """Load the live metric counters"""
+    return await metrics.get_values(db)
+
+def validate_metric(metric: Optional[str]):
+    """Reject stat tab bindings to unknown metrics"""
+    if metric is not None and metric not in metrics.METRICS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown metric '{metric}'. Available: {', '.join(metrics.METRICS)}"
+        )
+
+async def content_bundles():
+    """Current content snapshot and its per-locale bundles (rebuilt only after a write)"""
+    snapshot = await read_cache.get("content_items", load_content_items)
+    return snapshot, locales.bundles.for_snapshot(snapshot)
+
+def request_locale(request: Request, locale: Optional[str] = None) -> str:
+    """?locale= if given, otherwise negotiated from Accept-Language"""
+    return locales.negotiate(locale, request.headers.get("accept-language"))
+
 @api_router.get("/content/{key}")
-async def get_content_by_key(key: str):
+async def get_content_by_key(key: str, request: Request, locale: Optional[str] = None):
     """Get content item by key"""
     try:
-        content = await db.content_items.find_one({"key": key})
+        snapshot = await read_cache.get("content_items", load_content_items)
+        content = snapshot.value.get(key)
         if content:
             return {
                 "key": content["key"],
-                "content": content["content"],
+                "content": locales.resolve(content, request_locale(request, locale)),
                 "title": content["title"],
                 "content_type": content["content_type"]
             }
@@ -257,7 +502,7 @@ async def get_content_by_key(key: str):
 async def test_jwt_creation():
     """Test JWT token creation using super admin"""
     try:
-        admin = await db.users.find_one({"email": "zbazzi199@gmail.com"})
+        admin = await users.find_by_email(db, "zbazzi199@gmail.com", users.ID_ONLY)
         if admin:
             # Create token using MongoDB _id as string (critical requirement)
             token_data = {"sub": admin["id"]}  # Using 'id' field (UUID string) not '_id' (ObjectId)
@@ -278,7 +523,7 @@ async def test_jwt_verification(credentials: HTTPAuthorizationCredentials = Depe
     """Test JWT token verification"""
     try:
         token_data = verify_token(credentials)
-        user = await db.users.find_one({"id": token_data.user_id})
+        user = await users.find_by_id(db, token_data.user_id, users.LISTING_ROW)
         if user:
             return {
                 "token_valid": True,
@@ -295,14 +540,6 @@ async def test_jwt_verification(credentials: HTTPAuthorizationCredentials = Depe
 async def register_user(user_data: UserCreate):
     """Register a new user (admin or student)"""
     try:
-        # Check if user already exists
-        existing_user = await db.users.find_one({"email": user_data.email})
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-        
         # Validate admin registration code if user is registering as admin
         if user_data.role == UserRole.ADMIN:
             if not user_data.admin_code or user_data.admin_code != os.environ.get("ADMIN_REGISTRATION_CODE"):
@@ -332,9 +569,28 @@ async def register_user(user_data: UserCreate):
             updated_at=datetime.utcnow()
         )
         
-        # Insert user into database
+        # Insert user into database; the unique email index rejects duplicates,
+        # including concurrent sign-ups with the same address
         user_dict = new_user.dict()
-        await db.users.insert_one(user_dict)
+        if not await users.email_index_enforced(db):
+            # Index missing, or older mixed-case emails not yet normalized
+            if await users.find_by_email_any_case(db, user_dict["email"], users.ID_ONLY):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Email already registered"
+                )
+        try:
+            await metrics.write_with_counters(
+                db,
+                lambda session: db.users.insert_one(user_dict, session=session),
+                metrics.deltas_for("users", user_dict)
+            )
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
+        read_cache.invalidate("metrics")
         
         # Create JWT token for the new user (using UUID string as required)
         token_data = {"sub": new_user.id}
@@ -364,7 +620,7 @@ async def login_user(user_credentials: UserLogin):
     """Login user and return JWT token"""
     try:
         # Find user by email
-        user = await db.users.find_one({"email": user_credentials.email})
+        user = await users.find_by_email(db, user_credentials.email, users.CREDENTIALS)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -390,7 +646,8 @@ async def login_user(user_credentials: UserLogin):
         access_token = create_access_token(data=token_data)
         
         # Return user info and token
-        user_response = UserResponse(**user)
+        with tracing.span("model.UserResponse"):
+            user_response = from_document(UserResponse, user)
         
         return {
             "message": "Login successful",
@@ -409,10 +666,10 @@ async def login_user(user_credentials: UserLogin):
 
 @api_router.post("/request-password-reset", response_model=dict)
 async def request_password_reset(reset_request: PasswordResetRequest):
-    """Request password reset - generates and stores reset token"""
+    """Request password reset - queues the reset email; its token is issued when the mail is sent"""
     try:
         # Find user by email
-        user = await db.users.find_one({"email": reset_request.email})
+        user = await users.find_by_email(db, reset_request.email, users.CONTACT)
         if not user:
             # For security, don't reveal if email exists or not
             return {
@@ -420,32 +677,20 @@ async def request_password_reset(reset_request: PasswordResetRequest):
                 "success": True
             }
         
-        # Generate secure reset token
-        reset_token = secrets.token_urlsafe(32)
-        token_hash = hashlib.sha256(reset_token.encode()).hexdigest()
-        
-        # Set expiration time (1 hour from now)
-        from datetime import timedelta
-        expires_at = datetime.utcnow() + timedelta(hours=1)
-        
-        # Store hashed token in database
-        await db.users.update_one(
-            {"id": user["id"]},
-            {
-                "$set": {
-                    "password_reset_token": token_hash,
-                    "password_reset_expires": expires_at,
-                    "updated_at": datetime.utcnow()
-                }
-            }
+        # Queue the email; the background worker issues the token (only its hash is stored) at send time
+        await email_queue.enqueue(
+            db,
+            "password_reset",
+            user["email"],
+            name=user["name"],
+            user_id=user["id"]
         )
+        if email_worker is not None:
+            email_worker.notify()
         
-        # In a real app, you would send an email with the reset_token
-        # For MVP testing, we'll return the token (remove this in production)
         return {
             "message": "If an account with that email exists, a password reset link has been sent.",
-            "success": True,
-            "reset_token": reset_token  # REMOVE THIS IN PRODUCTION
+            "success": True
         }
         
     except Exception as e:
@@ -458,16 +703,10 @@ async def request_password_reset(reset_request: PasswordResetRequest):
 async def reset_password(reset_data: PasswordReset):
     """Reset password using valid reset token"""
     try:
-        # Hash the provided token to match stored hash
-        token_hash = hashlib.sha256(reset_data.token.encode()).hexdigest()
-        
-        # Find user with matching token that hasn't expired
-        user = await db.users.find_one({
-            "password_reset_token": token_hash,
-            "password_reset_expires": {"$gt": datetime.utcnow()}
-        })
+        # Redeem the token; it is deleted atomically so it can only be used once
+        user_id = await reset_tokens.consume(db, reset_data.token)
         
-        if not user:
+        if not user_id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid or expired reset token"
@@ -476,17 +715,13 @@ async def reset_password(reset_data: PasswordReset):
         # Hash the new password
         new_hashed_password = get_password_hash(reset_data.new_password)
         
-        # Update password and clear reset token
+        # Update password
         await db.users.update_one(
-            {"id": user["id"]},
+            {"id": user_id},
             {
                 "$set": {
                     "hashed_password": new_hashed_password,
                     "updated_at": datetime.utcnow()
-                },
-                "$unset": {
-                    "password_reset_token": "",
-                    "password_reset_expires": ""
                 }
             }
         )
@@ -508,9 +743,9 @@ async def reset_password(reset_data: PasswordReset):
 async def get_user_by_id(user_id: str):
     """Get user by ID (for testing purposes)"""
     try:
-        user = await db.users.find_one({"id": user_id})
+        user = await users.find_by_id(db, user_id, users.PUBLIC_PROFILE)
         if user:
-            user_response = UserResponse(**user)
+            user_response = from_document(UserResponse, user)
             return user_response.dict()
         else:
             raise HTTPException(
@@ -529,7 +764,7 @@ async def get_user_by_id(user_id: str):
 async def get_pending_users():
     """Get list of pending users (for admin approval testing)"""
     try:
-        pending_users = await db.users.find({"status": "pending"}).to_list(100)
+        pending_users = await users.find_many(db, {"status": "pending"}, users.LISTING_ROW, 100)
         return {
             "pending_users": [
                 {
@@ -590,45 +825,213 @@ async def theme_test():
     except Exception as e:
         return {"error": str(e)}
 
+async def load_theme():
+    """Manifest of the current design token bundle"""
+    doc = await design_tokens.latest(db)
+    return design_tokens.manifest(doc) if doc else None
+
+@api_router.get("/theme")
+async def get_theme(request: Request):
+    """Where to load the current design token stylesheet from"""
+    try:
+        snapshot = await read_cache.get("design_tokens", load_theme)
+        if snapshot.value is None:
+            raise HTTPException(status_code=404, detail="No design tokens stored")
+        etag = f'"{snapshot.value["hash"]}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(snapshot.value, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching theme: {str(e)}"
+        )
+
+@api_router.get("/theme/{bundle_hash}.css")
+async def get_theme_bundle(bundle_hash: str, request: Request):
+    """Compiled CSS variables; the URL changes whenever the tokens do"""
+    etag = f'"{bundle_hash}"'
+    headers = {"ETag": etag, "Cache-Control": design_tokens.IMMUTABLE_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    try:
+        bundle = design_tokens.bundle_cache.get(bundle_hash)
+        if bundle is None:
+            doc = await design_tokens.find_by_hash(db, bundle_hash)
+            if doc is None:
+                raise HTTPException(status_code=404, detail="Theme bundle not found")
+            bundle = design_tokens.bundle_for(doc)
+        return Response(content=bundle["css"], media_type="text/css", headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching theme bundle: {str(e)}"
+        )
+
+@api_router.get("/search")
+async def search_content(
+    q: str = Query(..., min_length=1, max_length=200),
+    scope: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Ranked full-text search over CMS content and program tabs"""
+    collections = None
+    if scope:
+        collections = [c.strip() for c in scope.split(",") if c.strip()]
+        unknown = [c for c in collections if c not in SEARCH_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown search scope: {', '.join(unknown)}"
+            )
+    total, results = search_index.search(q, collections=collections, skip=skip, limit=limit)
+    return {
+        "query": q,
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "results": results
+    }
+
 # Admin Tab Management Endpoints
 
+@api_router.get("/landing")
+async def get_landing(request: Request, locale: Optional[str] = None):
+    """Everything the welcome page needs in one versioned document"""
+    try:
+        (content, bundles), program_tabs, stat_tabs, metric_values = await asyncio.gather(
+            content_bundles(),
+            read_cache.get("program_tabs", load_program_tabs),
+            read_cache.get("stat_tabs", load_stat_tabs),
+            read_cache.get("metrics", load_metric_values)
+        )
+        bundle = bundles[request_locale(request, locale)]
+        version = compute_etag([bundle["hash"], program_tabs.etag, stat_tabs.etag, metric_values.etag])
+        headers = {
+            "ETag": f'"{version}"',
+            "Cache-Control": LANDING_CACHE_CONTROL,
+            "Content-Language": bundle["locale"],
+            "Vary": "Accept-Language"
+        }
+        if any(part.degraded for part in (content, program_tabs, stat_tabs, metric_values)):
+            headers["X-Served-Stale"] = "true"
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return JSONResponse(
+            {
+                "version": version,
+                "locale": bundle["locale"],
+                "direction": bundle["direction"],
+                "content": bundle["strings"],
+                "program_tabs": program_tabs.value,
+                "stat_tabs": metrics.bind_stat_tabs(stat_tabs.value, metric_values.value)
+            },
+            headers=headers
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error building landing page: {str(e)}"
+        )
+
+@api_router.get("/i18n")
+async def get_locale_manifest(request: Request, locale: Optional[str] = None):
+    """Which content bundle to load for the requested or negotiated locale"""
+    try:
+        _, bundles = await content_bundles()
+        bundle = bundles[request_locale(request, locale)]
+        etag = f'"{bundle["hash"]}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Content-Language": bundle["locale"],
+            "Vary": "Accept-Language"
+        }
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return JSONResponse(locales.manifest(bundle), headers=headers)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching locale manifest: {str(e)}"
+        )
+
+@api_router.get("/i18n/{locale}/{bundle_hash}.json")
+async def get_locale_bundle(locale: str, bundle_hash: str, request: Request):
+    """All content strings for one locale; the URL changes whenever they do"""
+    etag = f'"{bundle_hash}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": locales.IMMUTABLE_CACHE_CONTROL,
+        "Content-Language": locale
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    try:
+        # Build the current bundles first; this worker may not have seen the write yet
+        await content_bundles()
+        bundle = locales.bundles.find(locale, bundle_hash)
+        if bundle is None:
+            raise HTTPException(status_code=404, detail="Content bundle not found")
+        return Response(content=bundle["body"], media_type="application/json", headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching content bundle: {str(e)}"
+        )
+
 @api_router.get("/admin/program-tabs")
 async def get_program_tabs():
     """Get all program tabs"""
     try:
-        tabs = await db.program_tabs.find().sort("order", 1).to_list(length=None)
-        result = []
-        for tab in tabs:
-            # Remove MongoDB ObjectId if present
-            if "_id" in tab:
-                del tab["_id"]
-            # Convert datetime objects to strings if they exist
-            if "created_at" in tab and hasattr(tab["created_at"], "isoformat"):
-                tab["created_at"] = tab["created_at"].isoformat()
-            if "updated_at" in tab and hasattr(tab["updated_at"], "isoformat"):
-                tab["updated_at"] = tab["updated_at"].isoformat()
-            result.append(tab)
-        return result
+        snapshot = await read_cache.get("program_tabs", load_program_tabs)
+        return snapshot.value
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching program tabs: {str(e)}"
         )
 
+async def run_idempotent(key: Optional[str], scope: str, payload, create):
+    """Run create() once per Idempotency-Key; requests without a key just run it"""
+    if key is None:
+        return await create()
+    try:
+        outcome = await idempotency.run(db, scope, key, payload, create)
+    except idempotency.IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if outcome.replayed:
+        return JSONResponse(content=outcome.body, headers={"Idempotent-Replayed": "true"})
+    return outcome.body
+
 # Dependency function for current user
+@tracing.traced("auth.current_user")
 async def get_current_user_dep(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current user dependency"""
     token_data = verify_token(credentials)
-    user = await db.users.find_one({"id": token_data.user_id})
+    user = await users.find_by_id(db, token_data.user_id, users.AUTH_PRINCIPAL)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    return User(**user)
+    with tracing.span("model.AuthPrincipal"):
+        return from_document(AuthPrincipal, user)
 
 @api_router.post("/admin/program-tabs")
-async def create_program_tab(tab_data: dict, current_user: User = Depends(get_current_user_dep)):
+async def create_program_tab(
+    tab_data: dict,
+    current_user: AuthPrincipal = Depends(get_current_user_dep),
+    idempotency_key: Optional[str] = Header(None)
+):
     """Create a new program tab (admin only)"""
     try:
         if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
@@ -637,41 +1040,53 @@ async def create_program_tab(tab_data: dict, current_user: User = Depends(get_cu
                 detail="Admin access required"
             )
         
-        # Get highest order value
-        highest_order_doc = await db.program_tabs.find().sort("order", -1).limit(1).to_list(length=1)
-        highest_order = highest_order_doc[0]["order"] + 1 if highest_order_doc else 1
-        
-        # Create new tab with UUID
-        new_tab = {
-            "id": str(uuid.uuid4()),
-            "title": tab_data.get("title", ""),
-            "description": tab_data.get("description", ""),
-            "image": tab_data.get("image", ""),
-            "border_color_light": tab_data.get("border_color_light", "#E0F7FA"),
-            "border_color_dark": tab_data.get("border_color_dark", "#4A90A4"),
-            "type": tab_data.get("type", "informational"),
-            "order": highest_order,
-            "created_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc)
-        }
+        async def insert_tab():
+            started = time.perf_counter()
+            
+            # Get highest order value
+            highest_order_doc = await db.program_tabs.find().sort("order", -1).limit(1).to_list(length=1)
+            highest_order = highest_order_doc[0]["order"] + 1 if highest_order_doc else 1
         
-        result = await db.program_tabs.insert_one(new_tab)
-        
-        # Create response data without ObjectId
-        response_tab = {
-            "id": new_tab["id"],
-            "title": new_tab["title"],
-            "description": new_tab["description"],
-            "image": new_tab["image"],
-            "border_color_light": new_tab["border_color_light"],
-            "border_color_dark": new_tab["border_color_dark"],
-            "type": new_tab["type"],
-            "order": new_tab["order"],
-            "created_at": new_tab["created_at"].isoformat(),
-            "updated_at": new_tab["updated_at"].isoformat()
-        }
+            # Built through the model so every insert stores the same fields
+            new_tab = ProgramTab(
+                title=tab_data.get("title", ""),
+                description=tab_data.get("description", ""),
+                image=tab_data.get("image") or None,
+                border_color_light=tab_data.get("border_color_light", "#E0F7FA"),
+                border_color_dark=tab_data.get("border_color_dark", "#4A90A4"),
+                type=tab_data.get("type", "informational"),
+                order=highest_order
+            ).dict()
+        
+            result = await metrics.write_with_counters(
+                db,
+                lambda session: db.program_tabs.insert_one(new_tab, session=session),
+                metrics.deltas_for("program_tabs", new_tab)
+            )
+            search_index.upsert("program_tabs", new_tab)
+            read_cache.invalidate("program_tabs")
+            read_cache.invalidate("metrics")
+            change_feed.publish("program_tabs", "upsert", new_tab)
+            audit_log.record(current_user, "program_tab.create", "program_tab", new_tab["id"], after=new_tab, started=started)
+        
+            # Create response data without ObjectId
+            response_tab = {
+                "id": new_tab["id"],
+                "title": new_tab["title"],
+                "description": new_tab["description"],
+                "image": new_tab["image"],
+                "border_color_light": new_tab["border_color_light"],
+                "border_color_dark": new_tab["border_color_dark"],
+                "type": new_tab["type"],
+                "order": new_tab["order"],
+                "created_at": new_tab["created_at"].isoformat(),
+                "updated_at": new_tab["updated_at"].isoformat()
+            }
+        
+            return {"message": "Program tab created successfully", "tab": response_tab}
         
-        return {"message": "Program tab created successfully", "tab": response_tab}
+        # Retries carrying the same Idempotency-Key get the first response back
+        return await run_idempotent(idempotency_key, f"program_tabs:{current_user.id}", tab_data, insert_tab)
     except HTTPException:
         raise
     except Exception as e:
@@ -681,7 +1096,7 @@ async def create_program_tab(tab_data: dict, current_user: User = Depends(get_cu
         )
 
 @api_router.put("/admin/program-tabs/{tab_id}")
-async def update_program_tab(tab_id: str, tab_data: dict, current_user: User = Depends(get_current_user_dep)):
+async def update_program_tab(tab_id: str, tab_data: dict, current_user: AuthPrincipal = Depends(get_current_user_dep)):
     """Update a program tab (admin only)"""
     try:
         if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
@@ -690,17 +1105,24 @@ async def update_program_tab(tab_id: str, tab_data: dict, current_user: User = D
                 detail="Admin access required"
             )
         
+        started = time.perf_counter()
         tab_data["updated_at"] = datetime.now(timezone.utc)
         
-        result = await db.program_tabs.update_one(
+        # One round trip: the previous version comes back for the audit diff
+        previous_tab = await db.program_tabs.find_one_and_update(
             {"id": tab_id},
-            {"$set": tab_data}
+            {"$set": tab_data},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
+        if previous_tab is None:
             raise HTTPException(status_code=404, detail="Program tab not found")
         
-        updated_tab = await db.program_tabs.find_one({"id": tab_id})
+        updated_tab = {**previous_tab, **tab_data}
+        search_index.upsert("program_tabs", updated_tab)
+        read_cache.invalidate("program_tabs")
+        change_feed.publish("program_tabs", "upsert", updated_tab)
+        audit_log.record(current_user, "program_tab.update", "program_tab", tab_id, previous_tab, updated_tab, started)
         return ProgramTab(**updated_tab)
     except HTTPException:
         raise
@@ -711,7 +1133,7 @@ async def update_program_tab(tab_id: str, tab_data: dict, current_user: User = D
         )
 
 @api_router.delete("/admin/program-tabs/{tab_id}")
-async def delete_program_tab(tab_id: str, current_user: User = Depends(get_current_user_dep)):
+async def delete_program_tab(tab_id: str, current_user: AuthPrincipal = Depends(get_current_user_dep)):
     """Delete a program tab (admin only)"""
     try:
         if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
@@ -720,11 +1142,21 @@ async def delete_program_tab(tab_id: str, current_user: User = Depends(get_curre
                 detail="Admin access required"
             )
         
-        result = await db.program_tabs.delete_one({"id": tab_id})
+        started = time.perf_counter()
+        deleted_tab = await metrics.write_with_counters(
+            db,
+            lambda session: db.program_tabs.find_one_and_delete({"id": tab_id}, session=session),
+            lambda deleted: metrics.deltas_for("program_tabs", {}, -1) if deleted else {}
+        )
         
-        if result.deleted_count == 0:
+        if deleted_tab is None:
             raise HTTPException(status_code=404, detail="Program tab not found")
         
+        search_index.remove("program_tabs", tab_id)
+        read_cache.invalidate("program_tabs")
+        read_cache.invalidate("metrics")
+        change_feed.publish("program_tabs", "delete", key=tab_id)
+        audit_log.record(current_user, "program_tab.delete", "program_tab", tab_id, before=deleted_tab, started=started)
         return {"message": "Program tab deleted successfully"}
     except HTTPException:
         raise
@@ -738,19 +1170,11 @@ async def delete_program_tab(tab_id: str, current_user: User = Depends(get_curre
 async def get_stat_tabs():
     """Get all stat tabs"""
     try:
-        tabs = await db.stat_tabs.find().sort("order", 1).to_list(length=None)
-        result = []
-        for tab in tabs:
-            # Remove MongoDB ObjectId if present
-            if "_id" in tab:
-                del tab["_id"]
-            # Convert datetime objects to strings if they exist
-            if "created_at" in tab and hasattr(tab["created_at"], "isoformat"):
-                tab["created_at"] = tab["created_at"].isoformat()
-            if "updated_at" in tab and hasattr(tab["updated_at"], "isoformat"):
-                tab["updated_at"] = tab["updated_at"].isoformat()
-            result.append(tab)
-        return result
+        stat_tabs, metric_values = await asyncio.gather(
+            read_cache.get("stat_tabs", load_stat_tabs),
+            read_cache.get("metrics", load_metric_values)
+        )
+        return metrics.bind_stat_tabs(stat_tabs.value, metric_values.value)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -758,7 +1182,11 @@ async def get_stat_tabs():
         )
 
 @api_router.post("/admin/stat-tabs")
-async def create_stat_tab(tab_data: StatTab, current_user: User = Depends(get_current_user_dep)):
+async def create_stat_tab(
+    tab_data: StatTab,
+    current_user: AuthPrincipal = Depends(get_current_user_dep),
+    idempotency_key: Optional[str] = Header(None)
+):
     """Create a new stat tab (admin only)"""
     try:
         if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
@@ -767,18 +1195,29 @@ async def create_stat_tab(tab_data: StatTab, current_user: User = Depends(get_cu
                 detail="Admin access required"
             )
         
-        # Get highest order value
-        highest_order_doc = await db.stat_tabs.find().sort("order", -1).limit(1).to_list(length=1)
-        highest_order = highest_order_doc[0]["order"] + 1 if highest_order_doc else 1
+        validate_metric(tab_data.metric)
+        
+        async def insert_tab():
+            started = time.perf_counter()
+            
+            # Get highest order value
+            highest_order_doc = await db.stat_tabs.find().sort("order", -1).limit(1).to_list(length=1)
+            highest_order = highest_order_doc[0]["order"] + 1 if highest_order_doc else 1
+        
+            tab_dict = tab_data.dict()
+            tab_dict["order"] = highest_order
+            tab_dict["updated_at"] = datetime.now(timezone.utc)
         
-        tab_dict = tab_data.dict()
-        tab_dict["order"] = highest_order
-        tab_dict["updated_at"] = datetime.now(timezone.utc)
+            await db.stat_tabs.insert_one(tab_dict)
+            tab_dict.pop("_id", None)
+            read_cache.invalidate("stat_tabs")
+            change_feed.publish("stat_tabs", "upsert", tab_dict)
+            audit_log.record(current_user, "stat_tab.create", "stat_tab", tab_dict["id"], after=tab_dict, started=started)
         
-        result = await db.stat_tabs.insert_one(tab_dict)
-        tab_dict["_id"] = str(result.inserted_id)
+            return StatTab(**tab_dict)
         
-        return StatTab(**tab_dict)
+        # Retries carrying the same Idempotency-Key get the first response back
+        return await run_idempotent(idempotency_key, f"stat_tabs:{current_user.id}", tab_data.dict(exclude_unset=True), insert_tab)
     except HTTPException:
         raise
     except Exception as e:
@@ -788,7 +1227,7 @@ async def create_stat_tab(tab_data: StatTab, current_user: User = Depends(get_cu
         )
 
 @api_router.put("/admin/stat-tabs/{tab_id}")
-async def update_stat_tab(tab_id: str, tab_data: dict, current_user: User = Depends(get_current_user_dep)):
+async def update_stat_tab(tab_id: str, tab_data: dict, current_user: AuthPrincipal = Depends(get_current_user_dep)):
     """Update a stat tab (admin only)"""
     try:
         if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
@@ -797,17 +1236,24 @@ async def update_stat_tab(tab_id: str, tab_data: dict, current_user: User = Depe
                 detail="Admin access required"
             )
         
+        started = time.perf_counter()
+        validate_metric(tab_data.get("metric"))
         tab_data["updated_at"] = datetime.now(timezone.utc)
         
-        result = await db.stat_tabs.update_one(
+        # One round trip: the previous version comes back for the audit diff
+        previous_tab = await db.stat_tabs.find_one_and_update(
             {"id": tab_id},
-            {"$set": tab_data}
+            {"$set": tab_data},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
+        if previous_tab is None:
             raise HTTPException(status_code=404, detail="Stat tab not found")
         
-        updated_tab = await db.stat_tabs.find_one({"id": tab_id})
+        updated_tab = {**previous_tab, **tab_data}
+        read_cache.invalidate("stat_tabs")
+        change_feed.publish("stat_tabs", "upsert", updated_tab)
+        audit_log.record(current_user, "stat_tab.update", "stat_tab", tab_id, previous_tab, updated_tab, started)
         return StatTab(**updated_tab)
     except HTTPException:
         raise
@@ -818,7 +1264,7 @@ async def update_stat_tab(tab_id: str, tab_data: dict, current_user: User = Depe
         )
 
 @api_router.delete("/admin/stat-tabs/{tab_id}")
-async def delete_stat_tab(tab_id: str, current_user: User = Depends(get_current_user_dep)):
+async def delete_stat_tab(tab_id: str, current_user: AuthPrincipal = Depends(get_current_user_dep)):
     """Delete a stat tab (admin only)"""
     try:
         if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
@@ -827,11 +1273,15 @@ async def delete_stat_tab(tab_id: str, current_user: User = Depends(get_current_
                 detail="Admin access required"
             )
         
-        result = await db.stat_tabs.delete_one({"id": tab_id})
+        started = time.perf_counter()
+        deleted_tab = await db.stat_tabs.find_one_and_delete({"id": tab_id})
         
-        if result.deleted_count == 0:
+        if deleted_tab is None:
             raise HTTPException(status_code=404, detail="Stat tab not found")
         
+        read_cache.invalidate("stat_tabs")
+        change_feed.publish("stat_tabs", "delete", key=tab_id)
+        audit_log.record(current_user, "stat_tab.delete", "stat_tab", tab_id, before=deleted_tab, started=started)
         return {"message": "Stat tab deleted successfully"}
     except HTTPException:
         raise
@@ -841,6 +1291,400 @@ async def delete_stat_tab(tab_id: str, current_user: User = Depends(get_current_
             detail=f"Error deleting stat tab: {str(e)}"
         )
 
+@api_router.put("/admin/content/{key}/{locale}")
+async def update_content_text(
+    key: str,
+    locale: str,
+    update: ContentTranslationUpdate,
+    current_user: AuthPrincipal = Depends(get_current_user_dep)
+):
+    """Set a content item's text in one locale and rebuild the locale bundles (admin only)"""
+    try:
+        if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin access required"
+            )
+        locale = locales.normalize_locale(locale)
+        if locale not in locales.SUPPORTED_LOCALES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported locale '{locale}'. Available: {', '.join(locales.SUPPORTED_LOCALES)}"
+            )
+        
+        started = time.perf_counter()
+        field = "content" if locale == locales.DEFAULT_LOCALE else f"translations.{locale}"
+        changes = {field: update.content, "updated_at": datetime.now(timezone.utc), "updated_by": current_user.id}
+        previous_item = await db.content_items.find_one_and_update(
+            {"key": key},
+            {"$set": changes},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+        
+        if previous_item is None:
+            raise HTTPException(status_code=404, detail="Content item not found")
+        
+        updated_item = {**previous_item, "updated_at": changes["updated_at"], "updated_by": current_user.id}
+        if locale == locales.DEFAULT_LOCALE:
+            updated_item["content"] = update.content
+        else:
+            updated_item["translations"] = {**previous_item.get("translations", {}), locale: update.content}
+        
+        search_index.upsert("content_items", updated_item)
+        read_cache.invalidate("content_items")
+        _, bundles = await content_bundles()
+        change_feed.publish("content_items", "upsert", updated_item)
+        audit_log.record(current_user, "content.update", "content_item", key, previous_item, updated_item, started)
+        return locales.manifest(bundles[locale])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error updating content: {str(e)}"
+        )
+
+@api_router.put("/admin/theme")
+async def update_theme(body: dict, current_user: AuthPrincipal = Depends(get_current_user_dep)):
+    """Store a new version of the design tokens and compile its bundle (admin only)"""
+    try:
+        if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin access required"
+            )
+        
+        started = time.perf_counter()
+        previous = await design_tokens.latest(db)
+        try:
+            doc = await design_tokens.save(db, body.get("tokens"), updated_by=current_user.id)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        
+        read_cache.invalidate("design_tokens")
+        change_feed.publish("design_tokens", "upsert", design_tokens.manifest(doc))
+        audit_log.record(
+            current_user, "theme.update", "theme", str(doc["version"]),
+            previous["tokens"] if previous else None, doc["tokens"], started
+        )
+        return design_tokens.manifest(doc)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error updating theme: {str(e)}"
+        )
+
+# Idle connections get a comment line this often so proxies keep them open
+CHANGE_FEED_HEARTBEAT_SECONDS = 15
+
+def apply_remote_change(delta: dict):
+    """Keep this worker's caches and search index current with edits made on other workers"""
+    if change_feed.source != "change_stream":
+        return
+    collection = delta["collection"]
+    read_cache.invalidate(collection)
+    if delta["op"] == "delete":
+        search_index.remove(collection, delta["key"])
+    elif delta["doc"]:
+        search_index.upsert(collection, delta["doc"])
+
+change_feed.add_listener(apply_remote_change)
+
+async def render_delta(delta: dict) -> str:
+    """Stat tab deltas carry the same live metric value as /api/admin/stat-tabs"""
+    if delta.get("collection") == "stat_tabs" and delta.get("doc"):
+        metric_values = await read_cache.get("metrics", load_metric_values)
+        delta = {**delta, "doc": metrics.bind_stat_tabs([delta["doc"]], metric_values.value)[0]}
+    return format_event(delta)
+
+@api_router.get("/changes")
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0),
+    epoch: Optional[str] = Query(None)
+):
+    """Server-Sent Events feed of content, program tab and stat tab deltas.
+
+    Clients resume with ?since=<version>&epoch=<epoch> or the Last-Event-ID
+    header; if the missed deltas are no longer available, or the version
+    was issued by another worker or before a restart, a "resync" event asks
+    them to refetch /api/landing.
+    """
+    resume = parse_event_id(request.headers.get("last-event-id"))
+    if since is None and resume is not None:
+        epoch, since = resume
+
+    async def events():
+        queue = change_feed.subscribe()
+        try:
+            sent = change_feed.version
+            if since is None:
+                ready = {"epoch": change_feed.epoch, "version": sent}
+                yield f"id: {event_id(change_feed.epoch, sent)}\nevent: ready\ndata: {json.dumps(ready)}\n\n"
+            else:
+                backlog = change_feed.since(since, epoch)
+                if backlog is None:
+                    yield format_event({"epoch": change_feed.epoch, "version": sent, "op": "resync"})
+                else:
+                    for delta in backlog:
+                        yield await render_delta(delta)
+            while not await request.is_disconnected():
+                try:
+                    delta = await asyncio.wait_for(queue.get(), timeout=CHANGE_FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                # Deltas already sent from the backlog may also be queued
+                if delta.get("op") != "resync" and delta["version"] <= sent:
+                    continue
+                sent = delta["version"]
+                yield await render_delta(delta)
+        finally:
+            change_feed.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/admin/audit")
+async def get_audit_log(
+    actor: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: AuthPrincipal = Depends(get_current_user_dep)
+):
+    """Audit entries newest first, filtered by actor id, entity and time range (admin only)"""
+    if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    try:
+        # Include entries still waiting in the buffer
+        await audit_log.flush()
+        entries = await audit.query(db, actor, entity_type, entity_id, since, until, limit)
+        return {"entries": entries, "count": len(entries), **audit_log.stats()}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching audit log: {str(e)}"
+        )
+
+@api_router.get("/admin/analytics")
+async def get_analytics_views(current_user: AuthPrincipal = Depends(get_current_user_dep)):
+    """Available analytics views and how fresh each one is (admin only)"""
+    if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    try:
+        return {"views": await analytics.status(db)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching analytics status: {str(e)}"
+        )
+
+@api_router.post("/admin/analytics/refresh")
+async def refresh_analytics_views(current_user: AuthPrincipal = Depends(get_current_user_dep)):
+    """Refresh every analytics view now instead of waiting for the scheduler (admin only).
+
+    A view already being refreshed elsewhere is reported as busy and left alone.
+    """
+    if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    try:
+        return {"results": await analytics.refresh_all(db)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error refreshing analytics: {str(e)}"
+        )
+
+@api_router.get("/admin/analytics/{view_name}")
+async def get_analytics_view(
+    view_name: str,
+    request: Request,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: AuthPrincipal = Depends(get_current_user_dep)
+):
+    """Rows of one analytics view; since/until are bucket labels and other
+    query parameters filter on the view's dimensions (admin only)"""
+    if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    view = analytics.VIEWS.get(view_name)
+    if view is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown analytics view '{view_name}'. Available: {', '.join(analytics.VIEWS)}"
+        )
+    try:
+        rows = await analytics.read(db, view, since, until, dict(request.query_params), limit)
+        return {"view": view_name, "rows": rows, "count": len(rows)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching analytics view: {str(e)}"
+        )
+
+def check_transfer_access(current_user: AuthPrincipal, collection: str, fmt: str, secrets: bool):
+    """Admins may export and import CMS collections; user accounts and password hashes need a super admin"""
+    if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    if collection not in transfer.COLLECTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown collection '{collection}'. Available: {', '.join(transfer.COLLECTIONS)}"
+        )
+    if fmt not in transfer.FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown format '{fmt}'. Available: {', '.join(transfer.FORMATS)}"
+        )
+    if secrets and current_user.role != UserRole.SUPER_ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Super admin access required"
+        )
+
+@api_router.get("/admin/export/{collection}")
+async def export_collection(
+    collection: str,
+    format: str = "ndjson",
+    include_password_hashes: bool = False,
+    current_user: AuthPrincipal = Depends(get_current_user_dep)
+):
+    """Stream every document of a collection as NDJSON or BSON (admin only)"""
+    check_transfer_access(current_user, collection, format, include_password_hashes)
+    media_type, extension = transfer.FORMATS[format]
+    audit_log.record(
+        current_user, "bulk.export", "collection", collection,
+        None, {"format": format, "include_password_hashes": include_password_hashes}
+    )
+    return StreamingResponse(
+        transfer.export_stream(db, collection, format, include_password_hashes),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{collection}.{extension}"'}
+    )
+
+async def refresh_after_import(collection: str):
+    """Rebuild everything derived from an imported collection once.
+
+    Failures are logged rather than raised so they never replace the
+    import's own outcome; refresh_read_caches and reconcile_metrics
+    repair what was missed.
+    """
+    read_cache.invalidate(collection)
+    read_cache.invalidate("metrics")
+    for name, refresh in (("search index", search_index.rebuild), ("metrics", metrics.reconcile)):
+        try:
+            await refresh(db)
+        except Exception as e:
+            logger.error("Refreshing the %s after importing %s failed: %s", name, collection, e)
+    change_feed.resync()
+
+@api_router.post("/admin/import/{collection}")
+async def import_collection(
+    collection: str,
+    request: Request,
+    format: str = "ndjson",
+    current_user: AuthPrincipal = Depends(get_current_user_dep)
+):
+    """Upsert a streamed NDJSON or BSON export into a collection (admin only; users need a super admin)"""
+    check_transfer_access(current_user, collection, format, collection == "users")
+    try:
+        started = time.perf_counter()
+        try:
+            counts = await transfer.import_documents(db, collection, transfer.decode_stream(request.stream(), format))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid {format} input: {str(e)}")
+        finally:
+            # Including after a parse error, since earlier chunks are already written
+            await refresh_after_import(collection)
+        
+        audit_log.record(current_user, "bulk.import", "collection", collection, None, {"format": format, **counts}, started)
+        return {"collection": collection, **counts}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error importing {collection}: {str(e)}"
+        )
+
+@api_router.get("/admin/migrations")
+async def get_migrations(current_user: AuthPrincipal = Depends(get_current_user_dep)):
+    """Progress of the online data migrations (admin only)"""
+    if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    try:
+        return {"migrations": await migrations.progress(db)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching migrations: {str(e)}"
+        )
+
+@api_router.get("/admin/scheduler")
+async def get_scheduler_stats(current_user: AuthPrincipal = Depends(get_current_user_dep)):
+    """Maintenance job timings and leadership (admin only)"""
+    if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    if maintenance_scheduler is None:
+        return {"running": False}
+    return {"running": True, **maintenance_scheduler.stats()}
+
+@api_router.get("/admin/profiles")
+async def list_profiles(current_user: AuthPrincipal = Depends(get_current_user_dep)):
+    """Recent request profiles (admin only)"""
+    if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return {"profiles": profiling.profile_store.summaries()}
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "json", current_user: AuthPrincipal = Depends(get_current_user_dep)):
+    """One request profile; format=folded returns flamegraph-compatible collapsed stacks (admin only)"""
+    if current_user.role not in [UserRole.SUPER_ADMIN, UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    profile = profiling.profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse(profile.folded())
+    return {**profile.summary(), "folded": profile.folded()}
+
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
@@ -851,7 +1695,10 @@ async def create_status_check(input: StatusCheckCreate):
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
     status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+    # One validate/serialize pass for the whole list; returning a Response
+    # skips FastAPI re-validating every row against response_model
+    adapter = list_adapter(StatusCheck)
+    return Response(content=adapter.dump_json(adapter.validate_python(status_checks)), media_type="application/json")
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -864,17 +1711,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Negotiate gzip/brotli; complete bodies are compressed once per content version
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get('COMPRESSION_MIN_SIZE', '500')),
 )
-logger = logging.getLogger(__name__)
 
-@app.on_event("startup")
-async def startup_db():
-    await init_database()
+async def can_profile(authorization: str) -> bool:
+    """Whether the bearer token resolves, via get_current_user_dep, to an admin"""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        user = await get_current_user_dep(HTTPAuthorizationCredentials(scheme=scheme, credentials=token))
+    except HTTPException:
+        return False
+    except Exception as e:
+        # The request itself still runs; only profiling is skipped
+        logger.warning("Could not check profiling access: %s", e)
+        return False
+    return user.role in [UserRole.SUPER_ADMIN, UserRole.ADMIN]
+
+# Opt-in per-request profiling for admins (X-Profile: 1 or ?__profile=1)
+app.add_middleware(profiling.ProfilerMiddleware, authorize=can_profile, **profiling.profiler_settings())
+
+# Server span per request; Mongo commands and password hashing become child spans
+tracing.configure_from_env()
+app.add_middleware(tracing.TracingMiddleware)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+# Request ids and access logs; outermost so latency covers the whole stack
+app.add_middleware(
+    RequestContextMiddleware,
+    slow_request_ms=float(os.environ.get('SLOW_REQUEST_MS', '1000'))
+)
+
+# Configure logging: records are queued and written by a background thread
+configure_logging()
+logger = logging.getLogger(__name__)
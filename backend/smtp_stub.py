@@ -0,0 +1,113 @@
+"""Minimal local SMTP server that captures mail in memory.
+
+Stand-in for a real mail relay during development and tests:
+
+    python smtp_stub.py --port 1025
+
+Point SMTP_HOST/SMTP_PORT at it and every message the email worker
+sends is printed to stdout.
+"""
+import argparse
+import asyncio
+from email import message_from_bytes
+from email.message import Message
+from typing import List, Optional
+
+
+class LocalSMTPServer:
+    """Speaks just enough SMTP (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) for smtplib"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 1025, echo: bool = False):
+        self.host = host
+        self.port = port
+        self.echo = echo
+        self.messages: List[Message] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._received = asyncio.Condition()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Port 0 picks a free port; report the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def wait_for(self, count: int, timeout: float = 5.0) -> List[Message]:
+        """Block until at least count messages have arrived"""
+        async with self._received:
+            await asyncio.wait_for(self._received.wait_for(lambda: len(self.messages) >= count), timeout)
+        return self.messages
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        await reply("220 localhost LocalSMTPServer ready")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb == "EHLO":
+                    await reply("250-localhost")
+                    await reply("250 8BITMIME")
+                elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    chunks = []
+                    while True:
+                        data_line = await reader.readline()
+                        if not data_line or data_line in (b".\r\n", b".\n"):
+                            break
+                        if data_line.startswith(b".."):
+                            data_line = data_line[1:]
+                        chunks.append(data_line)
+                    await self._store(message_from_bytes(b"".join(chunks)))
+                    await reply("250 OK: queued")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+    async def _store(self, message: Message):
+        async with self._received:
+            self.messages.append(message)
+            self._received.notify_all()
+        if self.echo:
+            print(f"--- mail to {message['To']}: {message['Subject']}")
+            print(message.get_payload(decode=True).decode(errors="replace"))
+
+
+async def _serve(host: str, port: int):
+    server = await LocalSMTPServer(host, port, echo=True).start()
+    print(f"Local SMTP server listening on {server.host}:{server.port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,375 @@
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "status", "sampled")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int = KIND_INTERNAL, sampled: bool = True):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, object] = {}
+        self.status = STATUS_OK
+        self.sampled = sampled
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.attributes["error.type"] = type(error).__name__
+        self.attributes["error.message"] = str(error)
+
+    def end(self, end_ns: Optional[int] = None):
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+            if self.sampled:
+                tracer.processor.on_end(self)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def parse_traceparent(header: str) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent_span_id, sampled) from a W3C traceparent header"""
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    trace_id, span_id, flags = parts[1], parts[2], parts[3]
+    if len(trace_id) != 32 or len(span_id) != 16 or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    try:
+        int(trace_id, 16), int(span_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    return trace_id, span_id, sampled
+
+
+class FileSpanExporter:
+    """Appends OTLP/JSON export requests to a local file, one per line"""
+
+    def __init__(self, path: str, service_name: str):
+        self.path = path
+        self.service_name = service_name
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(_otlp_request(spans, self.service_name)) + "\n")
+
+
+class OTLPHttpExporter:
+    """Posts OTLP/JSON to a collector's /v1/traces endpoint"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def export(self, spans: List[Span]):
+        body = json.dumps(_otlp_request(spans, self.service_name)).encode()
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def _otlp_request(spans: List[Span], service_name: str) -> dict:
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+            "scopeSpans": [{"scope": {"name": "ahlulbayt.tracing"}, "spans": [s.to_otlp() for s in spans]}]
+        }]
+    }
+
+
+class BatchSpanProcessor:
+    """Buffers finished spans and exports them from a background thread"""
+
+    def __init__(self, exporter=None, max_batch: int = 256, flush_interval: float = 2.0, max_queue: int = 10000):
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.dropped = 0
+
+    def start(self):
+        if self.exporter is None or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True, name="span-exporter")
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def on_end(self, span: Span):
+        if self.exporter is None:
+            return
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, batch: List[Span]):
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            logger.warning("Span export failed, dropped %d spans: %s", len(batch), e)
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            batch = self._drain()
+            while batch:
+                self._export(batch)
+                batch = self._drain()
+
+    def shutdown(self):
+        """Export what is left and stop the background thread"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+        batch = self._drain()
+        while batch:
+            self._export(batch)
+            batch = self._drain()
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.processor = BatchSpanProcessor()
+
+    def configure(self, exporter):
+        self.processor = BatchSpanProcessor(exporter)
+        self.enabled = exporter is not None
+        self.processor.start()
+
+    def start_span(self, name: str, kind: int = KIND_INTERNAL, parent: Optional[Span] = None,
+                   remote_parent: Optional[Tuple[str, str, bool]] = None) -> Span:
+        parent = parent if parent is not None else _current_span.get()
+        if remote_parent is not None:
+            trace_id, parent_id, sampled = remote_parent
+        elif parent is not None:
+            trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+        else:
+            trace_id, parent_id, sampled = f"{random.getrandbits(128):032x}", None, True
+        return Span(name, trace_id, parent_id, kind=kind, sampled=sampled)
+
+
+tracer = Tracer()
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """Run a block inside a child span of the current span"""
+    if not tracer.enabled:
+        yield None
+        return
+    current = tracer.start_span(name, kind=kind)
+    current.attributes.update(attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def traced(name: Optional[str] = None):
+    """Decorator wrapping a sync or async function in a span"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_traceparent() -> Optional[str]:
+    """traceparent header value for propagating the current trace downstream"""
+    current = _current_span.get()
+    return current.traceparent() if current is not None else None
+
+
+class TracingCommandListener(monitoring.CommandListener):
+    """A client span per Mongo command, parented to the active request span.
+
+    Motor copies the caller's context into its executor threads, so the
+    current span is visible here.
+    """
+
+    def __init__(self):
+        self._open: Dict[Tuple[int, object], Span] = {}
+
+    def started(self, event):
+        if not tracer.enabled:
+            return
+        command_span = tracer.start_span(f"mongo.{event.command_name}", kind=KIND_CLIENT)
+        command_span.attributes.update({
+            "db.system": "mongodb",
+            "db.name": event.database_name,
+            "db.operation": event.command_name,
+            "db.mongodb.collection": str(event.command.get(event.command_name, "")),
+        })
+        self._open[(event.request_id, event.connection_id)] = command_span
+
+    def _finish(self, event, error: Optional[str] = None):
+        command_span = self._open.pop((event.request_id, event.connection_id), None)
+        if command_span is None:
+            return
+        if error is not None:
+            command_span.status = STATUS_ERROR
+            command_span.attributes["error.message"] = error
+        command_span.end(command_span.start_ns + event.duration_micros * 1000)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, str(event.failure))
+
+
+command_listener = TracingCommandListener()
+
+
+class TracingMiddleware:
+    """Server span per request, continuing any incoming W3C trace context"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        remote_parent = parse_traceparent(Headers(scope=scope).get("traceparent", ""))
+        server_span = tracer.start_span(f"{scope['method']} {scope['path']}", kind=KIND_SERVER, remote_parent=remote_parent)
+        server_span.attributes.update({"http.method": scope["method"], "http.target": scope["path"]})
+        token = _current_span.set(server_span)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                server_span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    server_span.status = STATUS_ERROR
+                MutableHeaders(scope=message).append("traceresponse", server_span.traceparent())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            server_span.record_error(e)
+            raise
+        finally:
+            route = _route_template(scope)
+            if route:
+                server_span.name = f"{scope['method']} {route}"
+                server_span.set_attribute("http.route", route)
+            _current_span.reset(token)
+            server_span.end()
+
+
+def _route_template(scope: Scope) -> Optional[str]:
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is None or app is None:
+        return None
+    for route in getattr(app, "routes", []):
+        if getattr(route, "endpoint", None) is endpoint:
+            return route.path
+    return None
+
+
+def configure_from_env():
+    """TRACING_EXPORTER=file|otlp enables tracing; default is off"""
+    exporter_name = os.environ.get("TRACING_EXPORTER", "none").lower()
+    service_name = os.environ.get("OTEL_SERVICE_NAME", "ahlulbayt-backend")
+    if exporter_name == "file":
+        tracer.configure(FileSpanExporter(os.environ.get("TRACING_FILE", "traces.jsonl"), service_name))
+    elif exporter_name == "otlp":
+        endpoint = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+        tracer.configure(OTLPHttpExporter(endpoint, service_name))
@@ -0,0 +1,212 @@
+"""Stream CMS, tab and user collections out of and into MongoDB.
+
+Export writes one file per collection, as NDJSON (Extended JSON, so dates
+survive the round trip) or as concatenated BSON like mongodump:
+
+    python transfer.py export --out dump/ [--format bson] [--include-password-hashes]
+    python transfer.py import dump/ [--collections content_items,program_tabs]
+
+MONGO_URL and DB_NAME select the database. The same functions back the
+/api/admin/export and /api/admin/import endpoints.
+"""
+import argparse
+import asyncio
+import os
+import struct
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+import bson
+from bson import json_util
+from bson.errors import InvalidBSON
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+import users
+from models import normalize_email
+
+# Exportable collections and the field that identifies a document across environments
+COLLECTIONS = {
+    "content_items": "key",
+    "program_tabs": "id",
+    "stat_tabs": "id",
+    "users": "id",
+}
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "bson": ("application/bson", "bson"),
+}
+
+# Documents fetched per cursor batch and written per bulk_write
+BATCH_SIZE = 500
+
+_JSON_OPTIONS = json_util.JSONOptions(json_mode=json_util.JSONMode.RELAXED, tz_aware=True)
+
+
+def projection_for(collection: str, include_secrets: bool = False) -> dict:
+    if collection == "users" and not include_secrets:
+        return users.EXPORT_WITHOUT_SECRETS
+    return {"_id": 0}
+
+
+async def export_documents(db, collection: str, include_secrets: bool = False) -> AsyncIterator[dict]:
+    """Every document, in _id order, one cursor batch in memory at a time"""
+    cursor = db[collection].find({}, projection_for(collection, include_secrets), batch_size=BATCH_SIZE).sort("_id", 1)
+    async for doc in cursor:
+        yield doc
+
+
+def encode(doc: dict, fmt: str) -> bytes:
+    if fmt == "bson":
+        return bson.encode(doc)
+    return (json_util.dumps(doc, json_options=_JSON_OPTIONS) + "\n").encode()
+
+
+async def export_stream(db, collection: str, fmt: str, include_secrets: bool = False) -> AsyncIterator[bytes]:
+    """Encoded documents, grouped so each yielded chunk holds about one batch"""
+    chunk: List[bytes] = []
+    async for doc in export_documents(db, collection, include_secrets):
+        chunk.append(encode(doc, fmt))
+        if len(chunk) >= BATCH_SIZE:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
+
+
+async def decode_stream(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[dict]:
+    """Documents from a byte stream that may split them anywhere"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        if fmt == "bson":
+            offset = 0
+            while len(buffer) - offset >= 4:
+                (length,) = struct.unpack_from("<i", buffer, offset)
+                if len(buffer) - offset < length:
+                    break
+                try:
+                    doc = bson.decode(buffer[offset:offset + length])
+                except InvalidBSON as e:
+                    raise ValueError(f"Invalid BSON document: {e}")
+                yield doc
+                offset += length
+            buffer = buffer[offset:]
+        else:
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield json_util.loads(line, json_options=_JSON_OPTIONS)
+    if fmt == "bson" and buffer:
+        raise ValueError("Truncated BSON document at end of input")
+    if buffer.strip():
+        yield json_util.loads(buffer, json_options=_JSON_OPTIONS)
+
+
+def _write_for(collection: str, doc: dict):
+    key_field = COLLECTIONS[collection]
+    doc.pop("_id", None)
+    if collection == "users":
+        if "email" in doc:
+            # Same normalization as registration, so the unique index and lookups match
+            doc["email"] = normalize_email(doc["email"])
+        # $set keeps the target's password hash when the export left it out
+        return UpdateOne({key_field: doc[key_field]}, {"$set": doc}, upsert=True)
+    return ReplaceOne({key_field: doc[key_field]}, doc, upsert=True)
+
+
+async def _flush(db, collection: str, writes: list, counts: Dict[str, int]):
+    try:
+        result = await db[collection].bulk_write(writes, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        counts["errors"] += len(details.get("writeErrors", []))
+    counts["inserted"] += details.get("nUpserted", 0)
+    counts["updated"] += details.get("nModified", 0)
+    counts["unchanged"] += details.get("nMatched", 0) - details.get("nModified", 0)
+
+
+async def import_documents(db, collection: str, docs: AsyncIterator[dict], chunk_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """Upsert documents by their key field in unordered chunks"""
+    key_field = COLLECTIONS[collection]
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0, "errors": 0}
+    writes = []
+    async for doc in docs:
+        if not isinstance(doc, dict) or doc.get(key_field) is None:
+            counts["skipped"] += 1
+            continue
+        writes.append(_write_for(collection, doc))
+        if len(writes) >= chunk_size:
+            await _flush(db, collection, writes, counts)
+            writes = []
+    if writes:
+        await _flush(db, collection, writes, counts)
+    return counts
+
+
+async def _read_file(path: str, size: int = 1 << 20) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, size)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def export_to_directory(db, out: str, collections: Iterable[str], fmt: str, include_secrets: bool):
+    os.makedirs(out, exist_ok=True)
+    for collection in collections:
+        path = os.path.join(out, f"{collection}.{FORMATS[fmt][1]}")
+        with open(path, "wb") as f:
+            async for chunk in export_stream(db, collection, fmt, include_secrets):
+                await asyncio.to_thread(f.write, chunk)
+        print(f"{collection}: exported to {path}")
+
+
+async def import_from_directory(db, source: str, collections: Iterable[str]):
+    for collection in collections:
+        for fmt, (_, extension) in FORMATS.items():
+            path = os.path.join(source, f"{collection}.{extension}")
+            if os.path.exists(path):
+                counts = await import_documents(db, collection, decode_stream(_read_file(path), fmt))
+                print(f"{collection}: {counts}")
+                break
+
+
+def _collections(value: Optional[str]) -> List[str]:
+    names = value.split(",") if value else list(COLLECTIONS)
+    unknown = [name for name in names if name not in COLLECTIONS]
+    if unknown:
+        raise SystemExit(f"Unknown collections: {', '.join(unknown)}")
+    return names
+
+
+async def _main(args):
+    from dotenv import load_dotenv
+
+    load_dotenv(Path(__file__).parent / '.env')
+    from database import close_client, db
+
+    try:
+        if args.command == "export":
+            await export_to_directory(db, args.out, _collections(args.collections), args.format, args.include_password_hashes)
+        else:
+            await import_from_directory(db, args.source, _collections(args.collections))
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("--out", required=True)
+    export_parser.add_argument("--format", choices=list(FORMATS), default="ndjson")
+    export_parser.add_argument("--collections")
+    export_parser.add_argument("--include-password-hashes", action="store_true")
+    import_parser = commands.add_parser("import")
+    import_parser.add_argument("source")
+    import_parser.add_argument("--collections")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,102 @@
+import logging
+import re
+from typing import List, Optional
+
+from pymongo.errors import OperationFailure
+
+import migrations
+
+logger = logging.getLogger(__name__)
+
+# Named projections: each lookup fetches and decodes only the fields its caller uses.
+# hashed_password is only ever loaded by CREDENTIALS.
+
+# Authenticated user behind a bearer token (the fields of models.AuthPrincipal)
+AUTH_PRINCIPAL = {"_id": 0, "id": 1, "email": 1, "name": 1, "age": 1, "phone": 1, "role": 1, "status": 1, "created_at": 1, "updated_at": 1}
+
+# Login: the hash to verify plus what goes back in the response
+CREDENTIALS = {"_id": 0, "id": 1, "email": 1, "name": 1, "age": 1, "phone": 1, "role": 1, "status": 1, "created_at": 1, "hashed_password": 1}
+
+# Fields of UserResponse
+PUBLIC_PROFILE = {"_id": 0, "id": 1, "email": 1, "name": 1, "age": 1, "phone": 1, "role": 1, "status": 1, "created_at": 1}
+
+# One row of an admin user listing
+LISTING_ROW = {"_id": 0, "id": 1, "email": 1, "name": 1, "role": 1, "status": 1, "created_at": 1}
+
+# Just enough to address an email to the user
+CONTACT = {"_id": 0, "id": 1, "email": 1, "name": 1}
+
+# Bulk export for regular admins: every field but the hash
+EXPORT_WITHOUT_SECRETS = {"_id": 0, "hashed_password": 0}
+
+# Existence checks and id lookups
+ID_ONLY = {"_id": 0, "id": 1}
+
+
+async def find_by_id(db, user_id: str, projection: dict) -> Optional[dict]:
+    return await db.users.find_one({"id": user_id}, projection)
+
+
+async def find_by_email(db, email: str, projection: dict) -> Optional[dict]:
+    return await db.users.find_one({"email": email}, projection)
+
+
+async def find_by_email_any_case(db, email: str, projection: dict) -> Optional[dict]:
+    """find_by_email that also matches stored emails never normalized.
+
+    A case-insensitive regex scan; only for the window before
+    EMAILS_NORMALIZED_MIGRATION is done.
+    """
+    pattern = f"^\\s*{re.escape(email)}\\s*$"
+    return await db.users.find_one({"email": {"$regex": pattern, "$options": "i"}}, projection)
+
+
+async def find_many(db, query: dict, projection: dict, limit: int) -> List[dict]:
+    return await db.users.find(query, projection).to_list(limit)
+
+
+# Migration that lowercases emails stored before registration normalized them
+EMAILS_NORMALIZED_MIGRATION = "users_normalized_emails"
+
+# Set once this worker has seen both the unique email index and that
+# migration done; neither is undone at runtime
+_email_index_ready = False
+
+
+async def ensure_indexes(db):
+    """Unique index on the stored email.
+
+    The index compares stored values, so until EMAILS_NORMALIZED_MIGRATION
+    has run it does not stop "John@Example.com" and "john@example.com"
+    from coexisting (see email_index_enforced). Only emails that are
+    already identical keep it from being built; that is logged and the
+    migration job retries the index.
+    """
+    try:
+        await db.users.create_index("email", unique=True)
+    except OperationFailure as e:
+        logger.error("Could not create unique email index: %s", e)
+
+
+async def has_unique_email_index(db) -> bool:
+    indexes = await db.users.index_information()
+    return any(
+        index.get("unique") and [field for field, _ in index["key"]] == ["email"]
+        for index in indexes.values()
+    )
+
+
+async def email_index_enforced(db) -> bool:
+    """Whether registration can rely on the index alone to reject duplicate emails.
+
+    That takes the index and every stored email normalized; until then
+    registration also checks for an existing account, so the migration is
+    not left with a duplicate it cannot normalize.
+    """
+    global _email_index_ready
+    if not _email_index_ready:
+        _email_index_ready = (
+            await has_unique_email_index(db)
+            and await migrations.is_done(db, EMAILS_NORMALIZED_MIGRATION)
+        )
+    return _email_index_ready
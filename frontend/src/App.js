@@ -1,4 +1,4 @@
-import { useState, useEffect, useMemo } from "react";
+import { useState, useEffect, useMemo, useRef } from "react";
 import "./App.css";
 import { BrowserRouter, Routes, Route } from "react-router-dom";
 import axios from "axios";
@@ -13,6 +13,18 @@ import AdminControls from "./components/AdminControls";
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Point the design token stylesheet at a compiled bundle; bundle URLs are immutable
+const linkThemeBundle = (bundleHash) => {
+  let link = document.getElementById("design-tokens");
+  if (!link) {
+    link = document.createElement("link");
+    link.id = "design-tokens";
+    link.rel = "stylesheet";
+    document.head.appendChild(link);
+  }
+  link.href = `${API}/theme/${bundleHash}.css`;
+};
+
 const LandingPage = () => {
   const [content, setContent] = useState({
     landing_hero_title: "Welcome to Ahlulbayt Studies",
@@ -400,11 +412,19 @@ const LandingPage = () => {
   };
 
 
+  // Raw backend tabs, kept so live change-feed deltas can be applied to them
+  const backendTabs = useRef({ program_tabs: [], stat_tabs: [] });
+  // Locale the server negotiated for the content bundle (from Accept-Language)
+  const contentLocale = useRef("en");
+
   // Function to fetch program tabs from backend and merge with default programs
-  const fetchProgramTabs = async () => {
+  // (tabs already delivered by /api/landing can be passed in to skip the request)
+  const fetchProgramTabs = async (preloadedTabs) => {
     try {
-      const response = await axios.get(`${API}/admin/program-tabs`);
-      const programTabs = response.data;
+      const programTabs = Array.isArray(preloadedTabs)
+        ? preloadedTabs
+        : (await axios.get(`${API}/admin/program-tabs`)).data;
+      backendTabs.current.program_tabs = programTabs;
       
       // Convert backend program tabs to frontend format
       const backendPrograms = programTabs.map((tab, index) => {
@@ -535,10 +555,12 @@ const LandingPage = () => {
   ]);
 
   // Function to fetch stat tabs from backend and merge with default stats
-  const fetchStatTabs = async () => {
+  const fetchStatTabs = async (preloadedTabs) => {
     try {
-      const response = await axios.get(`${API}/admin/stat-tabs`);
-      const statTabs = response.data;
+      const statTabs = Array.isArray(preloadedTabs)
+        ? preloadedTabs
+        : (await axios.get(`${API}/admin/stat-tabs`)).data;
+      backendTabs.current.stat_tabs = statTabs;
       
       // Convert backend stat tabs to frontend format
       const backendStats = statTabs.map((tab, index) => ({
@@ -752,29 +774,82 @@ const LandingPage = () => {
     return () => observer.disconnect();
   }, [programs, statsData]); // Re-run when data changes
 
+  // Content, program tabs and stat tabs arrive in a single landing document
+  const fetchLanding = async () => {
+    try {
+      const response = await axios.get(`${API}/landing`);
+      const landing = response.data;
+      contentLocale.current = landing.locale || "en";
+      document.documentElement.lang = contentLocale.current;
+      
+      setContent(prevContent => ({
+        landing_hero_title: landing.content.landing_hero_title || prevContent.landing_hero_title,
+        landing_hero_subtitle: landing.content.landing_hero_subtitle || prevContent.landing_hero_subtitle,
+        enroll_button: landing.content.enroll_button || prevContent.enroll_button,
+        overview_button: landing.content.overview_button || prevContent.overview_button
+      }));
+      fetchProgramTabs(landing.program_tabs);
+      fetchStatTabs(landing.stat_tabs);
+    } catch (error) {
+      console.error("Error fetching landing page:", error);
+      // Fall back to the individual tab endpoints
+      fetchProgramTabs();
+      fetchStatTabs();
+    }
+  };
+
   useEffect(() => {
-    const fetchContent = async () => {
-      try {
-        const titleResponse = await axios.get(`${API}/content/landing_hero_title`);
-        const subtitleResponse = await axios.get(`${API}/content/landing_hero_subtitle`);
-        const enrollBtnResponse = await axios.get(`${API}/content/enroll_button`);
-        const overviewBtnResponse = await axios.get(`${API}/content/overview_button`);
-        
-        setContent({
-          landing_hero_title: titleResponse.data.content,
-          landing_hero_subtitle: subtitleResponse.data.content,
-          enroll_button: enrollBtnResponse.data.content,
-          overview_button: overviewBtnResponse.data.content
-        });
-      } catch (error) {
-        console.error("Error fetching content:", error);
-      }
-    };
+    fetchLanding();
+  }, []);
+
+  // Design tokens: one cacheable stylesheet per token version
+  const fetchTheme = () => {
+    axios.get(`${API}/theme`)
+      .then(response => linkThemeBundle(response.data.hash))
+      .catch(error => console.error('Error fetching theme:', error));
+  };
 
-    // Fetch both content, program tabs, and stat tabs
-    fetchContent();
-    fetchProgramTabs();
-    fetchStatTabs();
+  useEffect(() => {
+    fetchTheme();
+  }, []);
+
+  // Live updates: apply content and tab deltas pushed by /api/changes instead of polling
+  useEffect(() => {
+    if (typeof EventSource === "undefined") return;
+    const source = new EventSource(`${API}/changes`);
+    
+    const applyDelta = (tabs, delta) => {
+      if (delta.op === "delete") return tabs.filter(tab => tab.id !== delta.key);
+      const exists = tabs.some(tab => tab.id === delta.key);
+      const updated = exists
+        ? tabs.map(tab => (tab.id === delta.key ? delta.doc : tab))
+        : [...tabs, delta.doc];
+      return updated.sort((a, b) => (a.order || 0) - (b.order || 0));
+    };
+    
+    source.addEventListener("delta", (event) => {
+      const delta = JSON.parse(event.data);
+      if (delta.collection === "program_tabs") {
+        fetchProgramTabs(applyDelta(backendTabs.current.program_tabs, delta));
+      } else if (delta.collection === "stat_tabs") {
+        fetchStatTabs(applyDelta(backendTabs.current.stat_tabs, delta));
+      } else if (delta.collection === "design_tokens" && delta.doc) {
+        linkThemeBundle(delta.doc.hash);
+      } else if (delta.collection === "content_items" && delta.doc) {
+        const text = (delta.doc.translations || {})[contentLocale.current] || delta.doc.content;
+        setContent(prevContent => (
+          delta.key in prevContent ? { ...prevContent, [delta.key]: text } : prevContent
+        ));
+      }
+    });
+    
+    // Missed too many deltas (e.g. after a long disconnect or a bulk import): refetch everything
+    source.addEventListener("resync", () => {
+      fetchLanding();
+      fetchTheme();
+    });
+    
+    return () => source.close();
   }, []);
 
   // Update CSS custom properties when background color changes - FIXED WITH AUTO BORDER COLOR
@@ -0,0 +1,142 @@
+"""Hermetic backend fixtures: the FastAPI app runs in-process against a throwaway database.
+
+TEST_DATABASE selects what stands behind the app's db handle:
+
+    memory (default)   in-memory Motor stand-in, no services needed
+    mongod             an ephemeral mongod started for the session (mongod on PATH)
+    mongodb://...      an existing server
+
+Every test gets its own uniquely named database, so the suites can run in
+parallel with pytest-xdist (pytest -n auto); under xdist each worker
+starts its own mongod.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Set before the app is imported; the URL is only used for TEST_DATABASE=mongod or a server URL
+os.environ.setdefault("MONGO_URL", "mongodb://127.0.0.1:1")
+os.environ.setdefault("DB_NAME", "hermetic")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import database  # noqa: E402
+import server  # noqa: E402
+import users  # noqa: E402
+from tests.memory_mongo import memory_database  # noqa: E402
+
+MONGOD_START_TIMEOUT_SECONDS = 30
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, process: subprocess.Popen):
+    deadline = time.monotonic() + MONGOD_START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"mongod exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"mongod did not accept connections within {MONGOD_START_TIMEOUT_SECONDS}s")
+
+
+@pytest.fixture(scope="session")
+def mongo_url(tmp_path_factory):
+    """None for the in-memory database, otherwise the server URL for this session"""
+    backend = os.environ.get("TEST_DATABASE", "memory")
+    if backend == "memory":
+        yield None
+        return
+    if backend != "mongod":
+        yield backend
+        return
+
+    binary = shutil.which("mongod")
+    if binary is None:
+        pytest.exit("TEST_DATABASE=mongod needs the mongod binary on PATH", returncode=4)
+    port = _free_port()
+    process = subprocess.Popen(
+        [binary, "--dbpath", str(tmp_path_factory.mktemp("mongod")), "--port", str(port),
+         "--bind_ip", "127.0.0.1", "--nounixsocket", "--quiet"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        _wait_for_port(port, process)
+        yield f"mongodb://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db(database_name):
+    """A bare in-memory database for tests of modules that take db as an argument"""
+    return memory_database(database_name)
+
+
+@pytest.fixture
+def database_name() -> str:
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "main")
+    return f"test_{worker}_{uuid.uuid4().hex[:12]}"
+
+
+def reset_process_state():
+    """Caches live at module level and would otherwise carry data between tests"""
+    server.read_cache.clear()
+    server.change_feed.history.clear()
+    server.change_feed._keys.clear()
+    users._email_index_ready = False
+
+
+async def wait_for_warm_up():
+    await server.warm_up_task
+
+
+@pytest.fixture
+def client(mongo_url, database_name, monkeypatch):
+    """The app with its lifespan running against a fresh database"""
+    if mongo_url is None:
+        database.use_database(memory_database(database_name))
+    else:
+        monkeypatch.setenv("MONGO_URL", mongo_url)
+        monkeypatch.setenv("DB_NAME", database_name)
+    reset_process_state()
+    try:
+        with TestClient(server.app) as test_client:
+            # Tests expect indexes and the search index in place
+            test_client.portal.call(wait_for_warm_up)
+            yield test_client
+            if mongo_url is not None:
+                test_client.portal.call(database.get_client().drop_database, database_name)
+    finally:
+        database.use_database(None)
+
+
+@pytest.fixture
+def admin_headers(client) -> dict:
+    token = client.post("/api/test-jwt").json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
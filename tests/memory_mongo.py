@@ -0,0 +1,88 @@
+"""In-memory Motor stand-in for the hermetic test mode.
+
+mongomock-motor covers the Motor API the backend uses. This module adds
+the one aggregation stage it lacks, $merge (the analytics views end in
+one), for the forms the backend writes.
+"""
+from mongomock import OperationFailure, aggregate
+from mongomock_motor import AsyncMongoMockClient
+
+
+def _path(doc: dict, path: str):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _evaluate(expression, current: dict, new: dict):
+    """Field paths, $$new paths, literals and $add/$max/$min over them"""
+    if isinstance(expression, str):
+        if expression.startswith("$$new."):
+            return _path(new, expression[len("$$new."):])
+        if expression.startswith("$"):
+            return _path(current, expression[1:])
+        return expression
+    if isinstance(expression, dict) and len(expression) == 1:
+        operator, arguments = next(iter(expression.items()))
+        if operator == "$literal":
+            return arguments
+        values = [value for value in (_evaluate(a, current, new) for a in arguments) if value is not None]
+        if operator == "$add":
+            return sum(values) if values else None
+        if operator == "$max":
+            return max(values, default=None)
+        if operator == "$min":
+            return min(values, default=None)
+    if not isinstance(expression, (dict, list)):
+        return expression
+    raise NotImplementedError(f"$merge expression {expression!r} is not supported by the in-memory database")
+
+
+def _apply_pipeline(stages: list, current: dict, new: dict) -> dict:
+    updated = dict(current)
+    for stage in stages:
+        name, fields = next(iter(stage.items()))
+        if name not in ("$set", "$addFields"):
+            raise NotImplementedError(f"$merge whenMatched stage {name} is not supported by the in-memory database")
+        updated.update({field: _evaluate(expression, updated, new) for field, expression in fields.items()})
+    return updated
+
+
+def _merge_stage(documents, database, options):
+    if isinstance(options, str):
+        options = {"into": options}
+    into = options["into"]
+    target = database.get_collection(into if isinstance(into, str) else into["coll"])
+    on = options.get("on", "_id")
+    on = [on] if isinstance(on, str) else on
+    when_matched = options.get("whenMatched", "merge")
+    when_not_matched = options.get("whenNotMatched", "insert")
+
+    for doc in documents:
+        existing = target.find_one({field: doc.get(field) for field in on})
+        if existing is None:
+            if when_not_matched == "insert":
+                target.insert_one(dict(doc))
+            elif when_not_matched == "fail":
+                raise OperationFailure("$merge found no matching document")
+            continue
+        if when_matched == "replace":
+            target.replace_one({"_id": existing["_id"]}, {**doc, "_id": existing["_id"]})
+        elif when_matched == "merge":
+            target.update_one({"_id": existing["_id"]}, {"$set": {k: v for k, v in doc.items() if k != "_id"}})
+        elif when_matched == "fail":
+            raise OperationFailure("$merge found an existing document")
+        elif when_matched != "keepExisting":
+            target.replace_one({"_id": existing["_id"]}, _apply_pipeline(when_matched, existing, doc))
+    # Like the server, $merge outputs no documents
+    return []
+
+
+aggregate._PIPELINE_HANDLERS["$merge"] = _merge_stage
+
+
+def memory_database(name: str):
+    """A fresh, empty database; each client keeps its own data"""
+    return AsyncMongoMockClient()[name]
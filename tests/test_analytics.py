@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import analytics
+
+pytestmark = pytest.mark.anyio
+
+REGISTRATIONS = analytics.VIEWS["registrations_daily"]
+BACKLOG = analytics.VIEWS["approval_backlog"]
+
+
+def student(i, created_at, **fields):
+    return {"id": f"student-{i}", "role": "student", "status": "pending",
+            "created_at": created_at, "updated_at": created_at, **fields}
+
+
+async def rows(db, view):
+    return await db[view.collection].find({}, {"_id": 0}).sort("bucket", 1).to_list(None)
+
+
+async def test_incremental_refresh_adds_only_new_documents(db):
+    day = datetime(2026, 1, 5, tzinfo=timezone.utc)
+    await db.users.insert_many([student(i, day) for i in range(2)])
+    assert (await analytics.refresh(db, REGISTRATIONS, lag=timedelta(minutes=1)))["mode"] == "rebuild"
+
+    await db.users.insert_one(student(2, datetime.now(timezone.utc) - timedelta(seconds=30)))
+    assert (await analytics.refresh(db, REGISTRATIONS, lag=timedelta(0)))["mode"] == "incremental"
+    assert (await analytics.refresh(db, REGISTRATIONS, lag=timedelta(0)))["mode"] in ("incremental", "noop")
+    assert sum(row["count"] for row in await rows(db, REGISTRATIONS)) == 3
+
+
+async def test_refresh_skips_a_view_claimed_by_another_worker(db):
+    await db[analytics.WATERMARKS_COLLECTION].insert_one({
+        "_id": REGISTRATIONS.name,
+        "owner": "other-worker",
+        "lease_until": datetime.now(timezone.utc) + timedelta(minutes=5)
+    })
+    assert (await analytics.refresh(db, REGISTRATIONS))["mode"] == "busy"
+
+
+async def test_expired_claim_is_taken_over_and_rebuilt(db):
+    await db[analytics.WATERMARKS_COLLECTION].insert_one({
+        "_id": REGISTRATIONS.name,
+        "owner": "dead-worker",
+        "lease_until": datetime.now(timezone.utc) - timedelta(minutes=1),
+        "watermark": datetime.now(timezone.utc) - timedelta(hours=1),
+        "pending_upto": datetime.now(timezone.utc) - timedelta(minutes=30)
+    })
+    assert (await analytics.refresh(db, REGISTRATIONS))["mode"] == "rebuild"
+    state = await db[analytics.WATERMARKS_COLLECTION].find_one({"_id": REGISTRATIONS.name})
+    assert state["owner"] is None and "pending_upto" not in state
+
+
+async def test_rebuild_swaps_in_a_complete_view(db):
+    day = datetime(2026, 1, 5, tzinfo=timezone.utc)
+    await db.users.insert_many([student(i, day) for i in range(4)])
+    await db[REGISTRATIONS.collection].insert_one({"bucket": "2025-12-31", "role": "student", "count": 99})
+
+    await analytics.refresh(db, REGISTRATIONS, lag=timedelta(0))
+    assert [(row["bucket"], row["count"]) for row in await rows(db, REGISTRATIONS)] == [("2026-01-05", 4)]
+    assert f"{REGISTRATIONS.collection}_rebuild" not in await db.list_collection_names()
+
+
+async def test_recompute_removes_buckets_that_became_empty(db):
+    day = datetime(2026, 1, 5, tzinfo=timezone.utc)
+    await db.users.insert_one(student(0, day))
+    await analytics.refresh(db, BACKLOG, lag=timedelta(minutes=1))
+    assert [row["pending"] for row in await rows(db, BACKLOG)] == [1]
+
+    await db.users.update_one(
+        {"id": "student-0"},
+        {"$set": {"role": "admin", "updated_at": datetime.now(timezone.utc) - timedelta(seconds=30)}}
+    )
+    assert (await analytics.refresh(db, BACKLOG, lag=timedelta(0)))["mode"] == "incremental"
+    assert await rows(db, BACKLOG) == []
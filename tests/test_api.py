@@ -0,0 +1,170 @@
+"""Functional checks from backend_test.py, run in-process against a fresh database"""
+import json
+from datetime import datetime, timezone
+
+import server
+
+PROGRAM_TAB = {
+    "title": "Advanced Islamic Studies",
+    "description": "Deep dive into advanced Islamic scholarship topics",
+    "image": "https://images.unsplash.com/photo-1694758375810-2d7c7bc3e84e",
+    "border_color_light": "#E0F7FA",
+    "border_color_dark": "#4A90A4",
+    "type": "informational"
+}
+
+STAT_TAB = {
+    "title": "Active Students",
+    "value": "1,250+",
+    "border_color_light": "#4A90A4",
+    "border_color_dark": "#B8739B",
+    "type": "informational"
+}
+
+
+def test_super_admin_exists(client):
+    response = client.get("/api/check-super-admin")
+    assert response.status_code == 200
+    assert response.json()["exists"]
+
+
+def test_jwt_verification(client, admin_headers):
+    response = client.post("/api/test-jwt-verify", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["token_valid"]
+
+
+def test_login_with_super_admin_credentials(client):
+    response = client.post("/api/login", json={"email": "ZBazzi199@gmail.com ", "password": "SuperSecure2025!"})
+    assert response.status_code == 200
+    assert response.json()["access_token"]
+
+
+def test_unauthorized_access_is_rejected(client):
+    response = client.post("/api/admin/program-tabs", json={"title": "Test", "description": "Test"})
+    assert response.status_code in (401, 403)
+
+
+def test_each_test_starts_with_an_empty_database(client):
+    assert client.get("/api/admin/program-tabs").json() == []
+    assert client.get("/api/admin/stat-tabs").json() == []
+
+
+def test_program_tab_crud(client, admin_headers):
+    created = client.post("/api/admin/program-tabs", json=PROGRAM_TAB, headers=admin_headers)
+    assert created.status_code == 200
+    tab_id = created.json()["tab"]["id"]
+    assert [tab["id"] for tab in client.get("/api/admin/program-tabs").json()] == [tab_id]
+
+    update = {"title": "Advanced Islamic Studies - Updated", "description": "Updated description"}
+    updated = client.put(f"/api/admin/program-tabs/{tab_id}", json=update, headers=admin_headers)
+    assert updated.status_code == 200
+    assert updated.json()["title"] == update["title"]
+
+    deleted = client.delete(f"/api/admin/program-tabs/{tab_id}", headers=admin_headers)
+    assert deleted.status_code == 200
+    assert "deleted successfully" in deleted.json()["message"].lower()
+    assert client.get("/api/admin/program-tabs").json() == []
+
+
+def test_stat_tab_crud(client, admin_headers):
+    created = client.post("/api/admin/stat-tabs", json=STAT_TAB, headers=admin_headers)
+    assert created.status_code == 200
+    tab_id = created.json()["id"]
+
+    update = {"title": "Active Students - Updated", "value": "1,500+"}
+    updated = client.put(f"/api/admin/stat-tabs/{tab_id}", json=update, headers=admin_headers)
+    assert updated.status_code == 200
+    assert updated.json()["title"] == update["title"]
+
+    deleted = client.delete(f"/api/admin/stat-tabs/{tab_id}", headers=admin_headers)
+    assert deleted.status_code == 200
+    assert client.get("/api/admin/stat-tabs").json() == []
+
+
+def test_stat_tab_validation(client, admin_headers):
+    assert client.post("/api/admin/stat-tabs", json={}, headers=admin_headers).status_code == 422
+    unknown_metric = {**STAT_TAB, "metric": "no_such_metric"}
+    assert client.post("/api/admin/stat-tabs", json=unknown_metric, headers=admin_headers).status_code == 400
+
+
+def test_landing_reflects_writes(client, admin_headers):
+    client.post("/api/admin/program-tabs", json=PROGRAM_TAB, headers=admin_headers)
+    landing = client.get("/api/landing").json()
+    assert [tab["title"] for tab in landing["program_tabs"]] == [PROGRAM_TAB["title"]]
+    assert landing["content"]["landing_hero_title"]
+
+
+def test_analytics_views_refresh(client, admin_headers):
+    # Old enough to be past the refresh lag; the seeded super admin is not
+    registered = datetime(2026, 1, 5, 12, tzinfo=timezone.utc)
+    students = [
+        {"id": f"student-{i}", "email": f"student{i}@example.com", "role": "student", "status": "pending",
+         "created_at": registered, "updated_at": registered}
+        for i in range(3)
+    ]
+    client.portal.call(server.db.users.insert_many, students)
+
+    # $merge pipelines run against whichever database backs the test
+    results = client.post("/api/admin/analytics/refresh", headers=admin_headers).json()["results"]
+    assert {result["mode"] for result in results} == {"rebuild"}
+    rows = client.get("/api/admin/analytics/registrations_daily", headers=admin_headers).json()["rows"]
+    assert [(row["bucket"], row["role"], row["count"]) for row in rows] == [("2026-01-05", "student", 3)]
+
+    results = client.post("/api/admin/analytics/refresh", headers=admin_headers).json()["results"]
+    assert {result["mode"] for result in results} == {"incremental"}
+    rows = client.get("/api/admin/analytics/registrations_daily", headers=admin_headers).json()["rows"]
+    assert [row["count"] for row in rows] == [3]
+
+
+def test_export_import_round_trip(client, admin_headers):
+    client.post("/api/admin/program-tabs", json=PROGRAM_TAB, headers=admin_headers)
+    exported = client.get("/api/admin/export/program_tabs", headers=admin_headers)
+    assert exported.status_code == 200
+    tab = json.loads(exported.text.splitlines()[0])
+    tab["title"] = "Imported title"
+
+    imported = client.post(
+        "/api/admin/import/program_tabs",
+        content=json.dumps(tab).encode(),
+        headers=admin_headers
+    ).json()
+    assert imported["updated"] == 1
+    assert client.get("/api/admin/program-tabs").json()[0]["title"] == "Imported title"
+
+
+def test_imported_user_emails_are_normalized(client, admin_headers):
+    user = {"id": "imported-1", "email": " Imported@Example.com", "name": "Imported", "role": "student", "status": "approved"}
+    imported = client.post("/api/admin/import/users", content=json.dumps(user).encode(), headers=admin_headers)
+    assert imported.json()["inserted"] == 1
+    stored = client.portal.call(server.db.users.find_one, {"id": "imported-1"})
+    assert stored["email"] == "imported@example.com"
+
+
+def test_import_parse_error_is_reported_even_if_the_refresh_fails(client, admin_headers, monkeypatch):
+    async def failing_rebuild(db):
+        raise RuntimeError("search index rebuild failed")
+
+    monkeypatch.setattr(server.search_index, "rebuild", failing_rebuild)
+    response = client.post("/api/admin/import/program_tabs", content=b'{"id": "tab-1"}\n{not json', headers=admin_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid ndjson input")
+
+
+def test_landing_is_compressed_per_locale(client):
+    english = client.get("/api/landing", headers={"Accept-Encoding": "gzip", "Accept-Language": "en"})
+    arabic = client.get("/api/landing", headers={"Accept-Encoding": "gzip", "Accept-Language": "ar"})
+    by_query = client.get("/api/landing?locale=ar", headers={"Accept-Encoding": "gzip"})
+
+    assert arabic.headers["Content-Encoding"] == "gzip"
+    assert (english.json()["locale"], english.json()["direction"]) == ("en", "ltr")
+    assert (arabic.json()["locale"], arabic.json()["direction"]) == ("ar", "rtl")
+    assert (by_query.json()["locale"], by_query.json()["direction"]) == ("ar", "rtl")
+    assert english.headers["ETag"] != arabic.headers["ETag"]
+
+    # An English validator must not revalidate the Arabic representation
+    revalidated = client.get(
+        "/api/landing",
+        headers={"Accept-Language": "ar", "If-None-Match": english.headers["ETag"]}
+    )
+    assert revalidated.status_code == 200
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import audit
+
+pytestmark = pytest.mark.anyio
+
+ADMIN = SimpleNamespace(id="admin-1", email="admin@example.com")
+
+
+class SlowCollection:
+    """insert_many that yields mid-write, so record() can run meanwhile"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.inserted = []
+        self.writing = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def insert_many(self, entries, ordered=True):
+        self.writing.set()
+        await self.release.wait()
+        if self.fail:
+            raise ConnectionError("database unreachable")
+        self.inserted.extend(entry["entity_id"] for entry in entries)
+
+
+def record(log, count, prefix):
+    for i in range(count):
+        log.record(ADMIN, "tab.update", "program_tab", f"{prefix}{i}")
+
+
+async def test_entries_recorded_during_a_flush_are_not_lost():
+    collection = SlowCollection()
+    log = audit.AuditLog(db={audit.COLLECTION: collection}, max_buffer=3)
+    record(log, 3, "a")
+
+    flush = asyncio.create_task(log.flush())
+    await collection.writing.wait()
+    # Fills the cap while the first batch is being written
+    record(log, 4, "b")
+    collection.release.set()
+    assert await flush == 3
+
+    assert collection.inserted == ["a0", "a1", "a2"]
+    assert [entry["entity_id"] for entry in log._buffer] == ["b1", "b2", "b3"]
+    assert log.stats() == {"buffered": 3, "written": 3, "dropped": 1}
+
+
+async def test_a_failed_flush_keeps_entries_in_order():
+    collection = SlowCollection(fail=True)
+    log = audit.AuditLog(db={audit.COLLECTION: collection}, max_buffer=4)
+    record(log, 2, "a")
+
+    flush = asyncio.create_task(log.flush())
+    await collection.writing.wait()
+    record(log, 3, "b")
+    collection.release.set()
+    with pytest.raises(ConnectionError):
+        await flush
+
+    # Oldest entry overflowed once the unwritten batch was put back
+    assert [entry["entity_id"] for entry in log._buffer] == ["a1", "b0", "b1", "b2"]
+    assert log.stats()["dropped"] == 1
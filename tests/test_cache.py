@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from cache import SingleFlight, SnapshotCache
+
+pytestmark = pytest.mark.anyio
+
+
+class Loader:
+    """Counts calls; each call blocks until released"""
+
+    def __init__(self):
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        return {"call": self.calls}
+
+
+async def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    loader = Loader()
+    callers = [asyncio.create_task(flights.do("key", loader)) for _ in range(5)]
+    await loader.started.wait()
+    loader.release.set()
+    assert await asyncio.gather(*callers) == [{"call": 1}] * 5
+    assert loader.calls == 1
+    assert flights.coalesced == 4
+
+
+async def test_cancelled_leader_hands_over_to_a_waiter():
+    flights = SingleFlight()
+    loader = Loader()
+    leader = asyncio.create_task(flights.do("key", loader))
+    await loader.started.wait()
+    waiters = [asyncio.create_task(flights.do("key", loader)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    # One waiter takes over the call; the others join it
+    while loader.calls < 2:
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    loader.release.set()
+    assert await asyncio.gather(*waiters) == [{"call": 2}] * 3
+    assert loader.calls == 2
+
+
+async def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+    started = asyncio.Event()
+
+    async def failing():
+        started.set()
+        await asyncio.sleep(0)
+        raise ValueError("query failed")
+
+    leader = asyncio.create_task(flights.do("key", failing))
+    await started.wait()
+    waiter = asyncio.create_task(flights.do("key", failing))
+    results = await asyncio.gather(leader, waiter, return_exceptions=True)
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+
+async def test_stale_snapshot_is_served_while_one_refresh_runs():
+    cache = SnapshotCache(ttl=0.0, stale_ttl=60.0)
+    loader = Loader()
+    loader.release.set()
+    first = await cache.get("tabs", loader)
+
+    loader.release.clear()
+    stale = await cache.get("tabs", loader)
+    again = await cache.get("tabs", loader)
+    assert stale is first and again is first
+    assert cache.stats()["stale_served"] == 2
+
+    loader.release.set()
+    await asyncio.gather(*cache._background)
+    assert loader.calls == 2
+    assert cache.peek("tabs").value == {"call": 2}
+
+
+async def test_expired_snapshot_past_stale_ttl_is_reloaded():
+    cache = SnapshotCache(ttl=0.0, stale_ttl=0.0)
+    loader = Loader()
+    loader.release.set()
+    await cache.get("tabs", loader)
+    assert (await cache.get("tabs", loader)).value == {"call": 2}
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+from changefeed import CHANGE_STREAM_EPOCH, ChangeFeed, format_event, parse_event_id
+
+
+def change(op, collection, object_id, doc=None, inc=1):
+    return {
+        "operationType": op,
+        "ns": {"coll": collection},
+        "documentKey": {"_id": object_id},
+        "fullDocument": doc,
+        "clusterTime": SimpleNamespace(time=1_700_000_000, inc=inc),
+    }
+
+
+def test_moving_a_document_to_a_new_id_is_not_published_as_a_delete():
+    feed = ChangeFeed()
+    feed._keys[("stat_tabs", "legacy-1")] = "tab-1"
+    new_id = ObjectId()
+
+    feed._apply_change(change("insert", "stat_tabs", new_id, {"_id": new_id, "id": "tab-1", "title": "Stat"}, inc=1))
+    feed._apply_change(change("delete", "stat_tabs", "legacy-1", inc=2))
+    assert [(delta["op"], delta["key"]) for delta in feed.history] == [("upsert", "tab-1")]
+
+    feed._apply_change(change("delete", "stat_tabs", new_id, inc=3))
+    assert [(delta["op"], delta["key"]) for delta in feed.history][-1] == ("delete", "tab-1")
+
+
+def test_versions_from_another_epoch_force_a_resync():
+    feed = ChangeFeed()
+    feed.publish("program_tabs", "upsert", {"id": "tab-1"})
+    feed.publish("program_tabs", "upsert", {"id": "tab-2"})
+
+    assert [delta["key"] for delta in feed.since(1, feed.epoch)] == ["tab-2"]
+    # Same version number, issued by another worker's in-process feed
+    assert ChangeFeed().since(1, feed.epoch) is None
+    assert feed.since(1, None) is None
+
+
+def test_change_stream_versions_share_one_epoch_across_workers():
+    first, second = ChangeFeed(), ChangeFeed()
+    assert first.epoch != second.epoch
+    first._set_source("change_stream")
+    second._set_source("change_stream")
+    assert first.epoch == second.epoch == CHANGE_STREAM_EPOCH
+
+    first._set_source("in_process")
+    assert first.epoch != CHANGE_STREAM_EPOCH
+
+
+def test_event_ids_round_trip():
+    feed = ChangeFeed()
+    feed.publish("stat_tabs", "delete", key="tab-1")
+    delta = feed.history[-1]
+    event_line = format_event(delta).splitlines()[0]
+    assert parse_event_id(event_line[len("id: "):]) == (feed.epoch, delta["version"])
+    assert parse_event_id("42") is None
+    assert parse_event_id(None) is None
@@ -0,0 +1,62 @@
+import gzip
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import compression
+
+STUDENT = {"email": "student@example.com", "name": "Student", "role": "student", "password": "password123"}
+
+
+def test_snapshot_responses_are_compressed_once_per_version(client):
+    compression.precompressed_cache.clear()
+    first = client.get("/api/landing", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/api/landing", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.json() == second.json()
+    assert compression.precompressed_cache.stats()["entries"] == 1
+    assert compression.precompressed_cache.stats()["hits"] >= 1
+
+
+def test_per_user_responses_are_compressed_but_not_kept(client):
+    compression.precompressed_cache.clear()
+    # The response holds a JWT and the user's profile
+    response = client.post(
+        "/api/register",
+        json={**STUDENT, "name": "Student " + "x" * 600},
+        headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert compression.precompressed_cache.stats()["entries"] == 0
+
+
+def test_cache_key_is_the_variant_not_the_body():
+    cache = compression.PrecompressedCache()
+    body = b"{}" * 400
+    first = cache.get_or_compress(("/api/landing", '"v1"'), body, "gzip", 6, 5)
+    cache.get_or_compress(("/api/landing", '"v1"'), body, "gzip", 6, 5)
+    assert gzip.decompress(first) == body
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_variants_sharing_an_etag_are_cached_separately():
+    async def greeting(request):
+        language = request.headers.get("accept-language", "en")
+        body = {"language": language, "repeat": request.query_params.get("repeat"), "padding": "x" * 600}
+        # Deliberately the same ETag for every variant
+        return JSONResponse(body, headers={"ETag": '"same"', "Vary": "Accept-Language"})
+
+    app = compression.CompressionMiddleware(Starlette(routes=[Route("/greeting", greeting)]), cache=compression.PrecompressedCache())
+    client = TestClient(app)
+    english = client.get("/greeting", headers={"Accept-Encoding": "gzip", "Accept-Language": "en"})
+    arabic = client.get("/greeting", headers={"Accept-Encoding": "gzip", "Accept-Language": "ar"})
+    query = client.get("/greeting?repeat=1", headers={"Accept-Encoding": "gzip", "Accept-Language": "ar"})
+
+    assert english.headers["Content-Encoding"] == "gzip"
+    assert [r.json()["language"] for r in (english, arabic, query)] == ["en", "ar", "ar"]
+    assert query.json()["repeat"] == "1"
+    assert app.cache.stats()["entries"] == 3
+
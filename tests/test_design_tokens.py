@@ -0,0 +1,50 @@
+import pytest
+
+import design_tokens
+
+
+@pytest.mark.parametrize("tokens, problem", [
+    ({"print": {"text-primary": "#000"}}, "Unknown token scope"),
+    ({"light": ["text-primary"]}, "must be an object"),
+    ({"light": {"Text_Primary": "#000"}}, "Invalid token name"),
+    ({"light": {"text-primary": "red; } body { display: none"}}, "Invalid value"),
+    ({"light": {"text-primary": "red /* comment */"}}, "Invalid value"),
+    ({"light": {"text-primary": "</style><script>"}}, "Invalid value"),
+    ({"light": {"text-primary": None}}, "Invalid value"),
+])
+def test_validate_rejects_unsafe_tokens(tokens, problem):
+    with pytest.raises(ValueError, match=problem):
+        design_tokens.validate(tokens)
+
+
+def test_validate_stringifies_and_trims_values():
+    assert design_tokens.validate({"base": {"radius": 4, "gap": " 8px "}}) == {"base": {"radius": "4", "gap": "8px"}}
+
+
+def test_compile_is_stable_regardless_of_key_order():
+    tokens = {"dark": {"b": "2px", "a": "1px"}, "base": {"gap": "8px"}, "light": {}}
+    reordered = {"light": {}, "base": {"gap": "8px"}, "dark": {"a": "1px", "b": "2px"}}
+
+    css = design_tokens.compile_css(tokens)
+    assert css == design_tokens.compile_css(reordered)
+    assert css == ':root {\n  --gap: 8px;\n}\n\n[data-theme="dark"] {\n  --a: 1px;\n  --b: 2px;\n}\n'
+    assert design_tokens.content_hash(css) == design_tokens.content_hash(design_tokens.compile_css(reordered))
+
+
+def test_default_tokens_are_valid():
+    tokens = design_tokens.validate(design_tokens.DEFAULT_TOKENS)
+    css = design_tokens.compile_css(tokens)
+    assert css.startswith(":root {") and "--text-primary: #2C3E50;" in css
+
+
+@pytest.mark.anyio
+async def test_saving_takes_the_next_version(db):
+    await design_tokens.ensure_indexes(db)
+    await design_tokens.seed_defaults(db)
+    await design_tokens.seed_defaults(db)
+
+    saved = await design_tokens.save(db, {"base": {"gap": "8px"}}, updated_by="admin")
+    assert saved["version"] == 2
+    assert (await design_tokens.latest(db))["hash"] == saved["hash"]
+    assert design_tokens.bundle_for(saved)["css"] == ":root {\n  --gap: 8px;\n}\n"
+    assert design_tokens.manifest(saved)["href"] == f"/api/theme/{saved['hash']}.css"
@@ -0,0 +1,66 @@
+import smtplib
+
+import pytest
+
+import email_queue
+import reset_tokens
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSMTP:
+    """Accepts messages until fail_after have been sent, then drops the connection"""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.sent = []
+
+    def send_message(self, message):
+        if self.fail_after is not None and len(self.sent) >= self.fail_after:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.sent.append(message)
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    connection = FakeSMTP()
+    monkeypatch.setattr(email_queue, "_connect", lambda settings: connection)
+    return connection
+
+
+async def test_reset_token_is_never_stored_in_the_job(db, smtp):
+    await email_queue.enqueue(db, "password_reset", "a@example.com", name="A", user_id="user-1")
+    job = await db[email_queue.COLLECTION].find_one({})
+    assert "body" not in job and "reset_url" not in str(job)
+
+    assert await email_queue.EmailWorker(db).run_once() == 1
+    body = smtp.sent[0].get_content()
+    token = body.split("token=")[1].split()[0]
+    assert await reset_tokens.consume(db, token) == "user-1"
+
+    job = await db[email_queue.COLLECTION].find_one({})
+    assert job["status"] == "sent"
+    assert token not in str(job)
+
+
+async def test_dropped_connection_only_retries_unsent_messages(db, smtp):
+    smtp.fail_after = 1
+    for i in range(3):
+        await email_queue.enqueue(db, "account_approved", f"user{i}@example.com", name=f"User {i}")
+
+    assert await email_queue.EmailWorker(db).run_once() == 3
+    assert len(smtp.sent) == 1
+    statuses = {job["to"]: job["status"] async for job in db[email_queue.COLLECTION].find({})}
+    assert statuses[smtp.sent[0]["To"]] == "sent"
+    assert sorted(statuses.values()) == ["pending", "pending", "sent"]
+
+
+async def test_lost_lease_is_not_sent(db, smtp):
+    await email_queue.enqueue(db, "account_approved", "a@example.com", name="A")
+    worker = email_queue.EmailWorker(db)
+    job = await worker.claim()
+    await db[email_queue.COLLECTION].update_one({"id": job["id"]}, {"$set": {"lease_owner": "another-worker"}})
+    assert not await worker.renew(job)
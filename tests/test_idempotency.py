@@ -0,0 +1,80 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+import idempotency
+
+pytestmark = pytest.mark.anyio
+
+
+class Create:
+    """Counts calls and returns a new resource each time"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return {"id": f"tab-{self.calls}"}
+
+
+async def test_retry_with_the_same_key_replays_the_stored_response(db):
+    create = Create()
+    first = await idempotency.run(db, "program_tabs", "key-1", {"title": "A"}, create)
+    retry = await idempotency.run(db, "program_tabs", "key-1", {"title": "A"}, create)
+
+    assert first == idempotency.Outcome({"id": "tab-1"}, False)
+    assert retry == idempotency.Outcome({"id": "tab-1"}, True)
+    assert create.calls == 1
+
+
+async def test_reusing_a_key_for_a_different_body_is_rejected(db):
+    create = Create()
+    await idempotency.run(db, "program_tabs", "key-1", {"title": "A"}, create)
+    with pytest.raises(idempotency.IdempotencyError) as error:
+        await idempotency.run(db, "program_tabs", "key-1", {"title": "B"}, create)
+    assert error.value.status_code == 422
+    assert create.calls == 1
+
+
+async def test_failed_request_releases_the_key(db):
+    async def failing():
+        raise RuntimeError("insert failed")
+
+    with pytest.raises(RuntimeError):
+        await idempotency.run(db, "program_tabs", "key-1", {"title": "A"}, failing)
+    outcome = await idempotency.run(db, "program_tabs", "key-1", {"title": "A"}, Create())
+    assert outcome == idempotency.Outcome({"id": "tab-1"}, False)
+
+
+async def test_slow_request_keeps_its_claim_past_the_timeout(db, monkeypatch):
+    monkeypatch.setattr(idempotency, "IN_PROGRESS_TIMEOUT", timedelta(milliseconds=100))
+    monkeypatch.setattr(idempotency, "RENEW_INTERVAL", timedelta(milliseconds=20))
+    release = asyncio.Event()
+    create = Create()
+
+    async def slow():
+        await release.wait()
+        return await create()
+
+    running = asyncio.create_task(idempotency.run(db, "program_tabs", "key-1", {}, slow))
+    await asyncio.sleep(0.3)
+    with pytest.raises(idempotency.IdempotencyError) as error:
+        await idempotency.run(db, "program_tabs", "key-1", {}, create)
+    assert error.value.status_code == 409
+
+    release.set()
+    assert (await running).body == {"id": "tab-1"}
+    assert create.calls == 1
+
+
+async def test_abandoned_claim_is_taken_over_after_the_timeout(db, monkeypatch):
+    monkeypatch.setattr(idempotency, "IN_PROGRESS_TIMEOUT", timedelta(0))
+    await idempotency._claim(db, "program_tabs:key-1", idempotency.request_hash({}), "dead-worker")
+    await asyncio.sleep(0.01)
+
+    outcome = await idempotency.run(db, "program_tabs", "key-1", {}, Create())
+    assert outcome == idempotency.Outcome({"id": "tab-1"}, False)
+    record = await db[idempotency.COLLECTION].find_one({"_id": "program_tabs:key-1"})
+    assert record["state"] == "done" and record["owner"] != "dead-worker"
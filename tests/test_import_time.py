@@ -0,0 +1,55 @@
+"""Worker boot budget: importing the backend app must stay cheap.
+
+Runs `import server` in a fresh interpreter so nothing is already cached
+in sys.modules. The budget can be tuned with IMPORT_TIME_BUDGET_SECONDS.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+IMPORT_TIME_BUDGET_SECONDS = float(os.environ.get("IMPORT_TIME_BUDGET_SECONDS", "1.5"))
+
+# Packages that must never be pulled in by importing the app
+HEAVY_MODULES = ["pandas", "numpy", "boto3"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import server
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "heavy": [m for m in %r if m in sys.modules],
+    "motor_client_created": __import__("database")._client is not None,
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_probe() -> dict:
+    # Deliberately unreachable database: importing must not connect or even read the URL eagerly
+    env = dict(os.environ, MONGO_URL="mongodb://127.0.0.1:1", DB_NAME="import_time_probe")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_within_budget():
+    # Best of three to keep a noisy CI machine from failing the build
+    best = min(run_probe()["seconds"] for _ in range(3))
+    assert best <= IMPORT_TIME_BUDGET_SECONDS, f"import server took {best:.2f}s (budget {IMPORT_TIME_BUDGET_SECONDS}s)"
+
+
+def test_import_is_side_effect_free():
+    probe = run_probe()
+    assert probe["heavy"] == [], f"heavy modules imported at startup: {probe['heavy']}"
+    assert not probe["motor_client_created"], "Motor client must be created lazily"
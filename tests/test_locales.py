@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+import pytest
+
+import locales
+
+ITEM = {"key": "hero", "content": "Welcome", "translations": {"ar": "أهلا", "ar-EG": ""}}
+
+
+@pytest.mark.parametrize("tag, expected", [
+    ("ar_sa", "ar-SA"),
+    ("EN-us", "en-US"),
+    ("zh-Hant-TW", "zh-Hant-TW"),
+])
+def test_normalize_locale(tag, expected):
+    assert locales.normalize_locale(tag) == expected
+
+
+def test_fallback_chain_ends_at_the_default_locale():
+    assert locales.fallback_chain("ar-SA") == ["ar-SA", "ar", "en"]
+    assert locales.fallback_chain("en-GB") == ["en-GB", "en"]
+    assert locales.fallback_chain("en") == ["en"]
+
+
+def test_resolve_follows_the_chain_and_skips_empty_translations():
+    assert locales.resolve(ITEM, "ar-SA") == "أهلا"
+    assert locales.resolve(ITEM, "ar-EG") == "أهلا"
+    assert locales.resolve(ITEM, "fr") == "Welcome"
+    assert locales.resolve({"content": "Welcome"}, "ar") == "Welcome"
+
+
+def test_accept_language_is_ordered_by_q_then_position():
+    header = "fr;q=0.5, ar-SA, en;q=0.9, de;q=0.9, es;q=0"
+    assert locales.parse_accept_language(header) == [("ar-SA", 1.0), ("en", 0.9), ("de", 0.9), ("fr", 0.5)]
+
+
+def test_malformed_q_values_are_ignored():
+    assert locales.parse_accept_language("ar;q=high, en") == [("en", 1.0)]
+    assert locales.parse_accept_language("") == []
+    assert locales.parse_accept_language(None) == []
+
+
+@pytest.mark.parametrize("explicit, header, expected", [
+    (None, "ar-SA,en;q=0.8", "ar"),
+    (None, "fr, en-US;q=0.7, ar;q=0.9", "ar"),
+    (None, "fr, de", "en"),
+    (None, "*", "en"),
+    (None, None, "en"),
+    ("en", "ar", "en"),
+    ("AR_eg", None, "ar"),
+])
+def test_negotiate(explicit, header, expected):
+    assert locales.negotiate(explicit, header) == expected
+
+
+def test_bundles_are_rebuilt_only_when_content_changes():
+    bundles = locales.BundleSet(keep_previous=1)
+    first = bundles.for_snapshot(SimpleNamespace(etag="v1", value={"hero": ITEM}))
+    assert bundles.for_snapshot(SimpleNamespace(etag="v1", value={})) is first
+    assert first["ar"]["direction"] == "rtl" and first["ar"]["strings"] == {"hero": "أهلا"}
+
+    changed = {"hero": {**ITEM, "translations": {"ar": "مرحبا"}}}
+    second = bundles.for_snapshot(SimpleNamespace(etag="v2", value=changed))
+    assert second["ar"]["hash"] != first["ar"]["hash"]
+    # A client holding the previous manifest can still fetch its bundle
+    assert bundles.find("ar", first["ar"]["hash"]) is first["ar"]
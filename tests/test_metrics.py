@@ -0,0 +1,67 @@
+import pytest
+
+import metrics
+
+pytestmark = pytest.mark.anyio
+
+STUDENT = {"role": "student", "status": "approved"}
+
+
+class RegisterAfterCount:
+    """Users collection where a registration commits right after each student count"""
+
+    def __init__(self, db, registrations):
+        self.db = db
+        self.registrations = registrations
+
+    async def count_documents(self, query):
+        count = await self.db.users.count_documents(query)
+        if self.registrations and query == metrics.METRICS["students"][1]:
+            self.registrations -= 1
+            await self.db.users.insert_one(dict(STUDENT))
+            await metrics.apply_deltas(self.db, metrics.deltas_for("users", STUDENT))
+        return count
+
+    def __getattr__(self, name):
+        return getattr(self.db.users, name)
+
+
+class RacingDatabase:
+    def __init__(self, db, registrations):
+        self.db = db
+        self.users = RegisterAfterCount(db, registrations)
+
+    def __getitem__(self, name):
+        return self.users if name == "users" else self.db[name]
+
+
+async def counter(db, name):
+    return (await db[metrics.COUNTERS_COLLECTION].find_one({"name": name}))["value"]
+
+
+async def test_reconcile_repairs_drift(db):
+    await metrics.ensure_indexes(db)
+    await db.users.insert_many([dict(STUDENT), dict(STUDENT)])
+    await metrics.apply_deltas(db, {"students": 5})
+
+    values = await metrics.reconcile(db)
+    assert values["students"] == 2
+    assert await counter(db, "students") == 2
+
+
+async def test_increment_during_reconcile_is_not_lost(db):
+    await metrics.ensure_indexes(db)
+    await metrics.apply_deltas(db, {"students": 1})
+    await db.users.insert_one(dict(STUDENT))
+
+    await metrics.reconcile(RacingDatabase(db, registrations=1))
+    assert await counter(db, "students") == await db.users.count_documents({"role": "student"}) == 2
+
+
+async def test_metric_that_never_settles_is_left_for_the_next_run(db):
+    await metrics.ensure_indexes(db)
+    await metrics.apply_deltas(db, {"students": 7})
+
+    values = await metrics.reconcile(RacingDatabase(db, registrations=metrics.RECONCILE_ATTEMPTS * 10))
+    assert "students" not in values
+    assert await counter(db, "students") == 7 + metrics.RECONCILE_ATTEMPTS
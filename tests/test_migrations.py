@@ -0,0 +1,92 @@
+import pytest
+from bson import ObjectId
+
+import migrations
+
+pytestmark = pytest.mark.anyio
+
+OBJECT_IDS = next(m for m in migrations.MIGRATIONS if m.name == "stat_tabs_object_ids")
+
+
+def stat_tab(i):
+    return {"_id": f"legacy-{i:02d}", "id": f"tab-{i:02d}", "title": f"Stat {i}", "value": str(i)}
+
+
+def runner(db, migration, **options):
+    return migrations.MigrationRunner(db, [migration], batch_size=options.pop("batch_size", 3), duty_cycle=1.0, **options)
+
+
+class CrashAfterFirstWrite:
+    """Applies the first write of a bulk_write, then fails as if the process died"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def bulk_write(self, writes, **kwargs):
+        await self.collection.bulk_write(writes[:1], **kwargs)
+        raise RuntimeError("worker died mid-batch")
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+class CrashingDatabase:
+    def __init__(self, db, collection):
+        self.db = db
+        self.collection = collection
+
+    def __getitem__(self, name):
+        if name == self.collection:
+            return CrashAfterFirstWrite(self.db[name])
+        return self.db[name]
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+
+async def test_interrupted_object_id_move_is_finished_by_a_rerun(db):
+    await db.stat_tabs.insert_many([stat_tab(i) for i in range(2)])
+
+    results = await runner(CrashingDatabase(db, "stat_tabs"), OBJECT_IDS).run()
+    assert results[0]["status"] == "failed"
+    # The copy exists next to the original: the state the rerun has to repair
+    assert await db.stat_tabs.count_documents({"id": "tab-00"}) == 2
+
+    results = await runner(db, OBJECT_IDS).run()
+    assert results[0]["status"] == "done"
+    tabs = await db.stat_tabs.find({}).sort("id", 1).to_list(None)
+    assert [tab["id"] for tab in tabs] == ["tab-00", "tab-01"]
+    assert all(isinstance(tab["_id"], ObjectId) for tab in tabs)
+    assert tabs[0]["_id"] == migrations.derived_object_id("legacy-00")
+
+
+async def test_resumes_from_the_checkpoint(db):
+    await db.stat_tabs.insert_many([stat_tab(i) for i in range(7)])
+    first = runner(db, OBJECT_IDS)
+
+    state = await first._claim(OBJECT_IDS)
+    assert await first._run_batch(OBJECT_IDS, state)
+    await first._release(OBJECT_IDS, "running")
+    stored = await db[migrations.STATE_COLLECTION].find_one({"_id": OBJECT_IDS.version})
+    assert stored["checkpoint"] == "legacy-02" and stored["scanned"] == 3
+
+    results = await runner(db, OBJECT_IDS).run()
+    assert results[0]["status"] == "done"
+    stored = await db[migrations.STATE_COLLECTION].find_one({"_id": OBJECT_IDS.version})
+    assert stored["scanned"] == 7
+    assert await db.stat_tabs.count_documents({"_id": {"$type": "string"}}) == 0
+
+
+async def test_done_migrations_are_not_run_again(db):
+    await db.stat_tabs.insert_one(stat_tab(0))
+    await runner(db, OBJECT_IDS).run()
+    await db.stat_tabs.insert_one(stat_tab(1))
+    assert await runner(db, OBJECT_IDS).run() == []
+    assert await db.stat_tabs.count_documents({"_id": "legacy-01"}) == 1
+
+
+def test_after_checkpoint_includes_later_id_types():
+    query = migrations.after_checkpoint("legacy-05")
+    assert {"_id": {"$gt": "legacy-05"}} in query["$or"]
+    assert {"_id": {"$type": "objectId"}} in query["$or"]
+    assert {"_id": {"$type": "number"}} not in query["$or"]
@@ -0,0 +1,68 @@
+"""Latency budgets for the hot read paths, measured in-process.
+
+Budgets are deliberately loose so a shared CI machine passes; tighten them
+locally with PERF_P95_BUDGET_MS and PERF_BURST_BUDGET_SECONDS.
+"""
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+import server
+
+P95_BUDGET_MS = float(os.environ.get("PERF_P95_BUDGET_MS", "50"))
+BURST_BUDGET_SECONDS = float(os.environ.get("PERF_BURST_BUDGET_SECONDS", "5"))
+SAMPLES = 200
+
+pytestmark = pytest.mark.performance
+
+
+def p95(samples):
+    ordered = sorted(samples)
+    return ordered[int(len(ordered) * 0.95) - 1]
+
+
+@pytest.fixture
+def seeded_client(client, admin_headers):
+    for i in range(20):
+        client.post(
+            "/api/admin/program-tabs",
+            json={"title": f"Program {i}", "description": "Seeded for latency checks"},
+            headers=admin_headers
+        )
+        client.post("/api/admin/stat-tabs", json={"title": f"Stat {i}", "value": str(i)}, headers=admin_headers)
+    return client
+
+
+@pytest.mark.parametrize("path", [
+    "/api/landing",
+    "/api/admin/program-tabs",
+    "/api/admin/stat-tabs",
+    "/api/content/landing_hero_title",
+    "/api/search?q=program",
+])
+def test_read_path_p95(seeded_client, path):
+    assert seeded_client.get(path).status_code == 200  # warm the read cache
+    samples = []
+    for _ in range(SAMPLES):
+        started = time.perf_counter()
+        response = seeded_client.get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+    assert p95(samples) <= P95_BUDGET_MS, f"{path} p95 {p95(samples):.1f}ms (budget {P95_BUDGET_MS}ms)"
+
+
+def test_concurrent_landing_burst(seeded_client):
+    async def burst():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(http.get("/api/landing") for _ in range(200)))
+            return time.perf_counter() - started, responses
+
+    # Runs on the app's event loop, next to its background tasks
+    elapsed, responses = seeded_client.portal.call(burst)
+    assert all(response.status_code == 200 for response in responses)
+    assert elapsed <= BURST_BUDGET_SECONDS, f"200 concurrent requests took {elapsed:.2f}s"
@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import profiling
+import server
+
+
+def command(name, micros):
+    return SimpleNamespace(command_name=name, duration_micros=micros)
+
+
+@pytest.mark.anyio
+async def test_mongo_timings_only_reach_the_issuing_requests_profile():
+    timer = profiling.MongoCommandTimer()
+    profiled = profiling.RequestProfile("GET", "/api/landing", 0.001)
+
+    async def profiled_request():
+        profiling._active_profile.set(profiled)
+        # Motor runs commands in executor threads with a copy of the context
+        await asyncio.to_thread(timer.succeeded, command("find", 1500))
+
+    async def other_request():
+        await asyncio.to_thread(timer.succeeded, command("insert", 9000))
+
+    await asyncio.gather(asyncio.create_task(profiled_request()), asyncio.create_task(other_request()))
+    assert dict(profiled.mongo_commands) == {"find": 1}
+    assert profiled.mongo_micros == 1500
+
+
+def test_profiling_check_failure_does_not_fail_the_request(client, admin_headers, monkeypatch):
+    async def unavailable(credentials):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(server, "get_current_user_dep", unavailable)
+    response = client.get("/api/landing", headers={**admin_headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    assert response.headers["X-Profile-Status"] == "forbidden"
+
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import reset_tokens
+import server
+from auth import verify_password
+
+STUDENT = {"email": "student@example.com", "name": "Student", "role": "student", "password": "password123"}
+
+
+async def expire(db, token):
+    await db[reset_tokens.COLLECTION].update_one(
+        {"token_hash": reset_tokens.hash_token(token)},
+        {"$set": {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+    )
+
+
+@pytest.mark.anyio
+async def test_token_can_only_be_consumed_once(db):
+    token = await reset_tokens.issue(db, "user-1")
+    assert await reset_tokens.consume(db, token) == "user-1"
+    assert await reset_tokens.consume(db, token) is None
+
+
+@pytest.mark.anyio
+async def test_expired_token_is_rejected(db):
+    token = await reset_tokens.issue(db, "user-1")
+    await expire(db, token)
+    assert await reset_tokens.consume(db, token) is None
+    assert await reset_tokens.purge_expired(db) == 1
+
+
+@pytest.mark.anyio
+async def test_new_token_replaces_the_outstanding_one(db):
+    first = await reset_tokens.issue(db, "user-1")
+    second = await reset_tokens.issue(db, "user-1")
+    assert await reset_tokens.consume(db, first) is None
+    assert await reset_tokens.consume(db, second) == "user-1"
+
+
+def stored_hash(client, user_id):
+    return client.portal.call(server.db.users.find_one, {"id": user_id})["hashed_password"]
+
+
+def test_reset_changes_the_password_once(client):
+    user_id = client.post("/api/register", json=STUDENT).json()["user"]["id"]
+    token = client.portal.call(reset_tokens.issue, server.db, user_id)
+    previous = stored_hash(client, user_id)
+
+    reset = client.post("/api/reset-password", json={"token": token, "new_password": "new-password-456"})
+    assert reset.status_code == 200
+    assert stored_hash(client, user_id) != previous
+    assert verify_password("new-password-456", stored_hash(client, user_id))
+
+    again = client.post("/api/reset-password", json={"token": token, "new_password": "another-password"})
+    assert again.status_code == 400
+    assert verify_password("new-password-456", stored_hash(client, user_id))
+
+
+def test_reset_with_an_expired_token_is_rejected(client):
+    user_id = client.post("/api/register", json=STUDENT).json()["user"]["id"]
+    token = client.portal.call(reset_tokens.issue, server.db, user_id)
+    client.portal.call(expire, server.db, token)
+    previous = stored_hash(client, user_id)
+
+    response = client.post("/api/reset-password", json={"token": token, "new_password": "new-password-456"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid or expired reset token"
+    assert stored_hash(client, user_id) == previous
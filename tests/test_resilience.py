@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, SnapshotStore
+
+pytestmark = pytest.mark.anyio
+
+
+async def ok():
+    return "ok"
+
+
+async def failing():
+    raise ConnectionError("database unreachable")
+
+
+async def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ConnectionError):
+            await breaker.call(failing)
+
+
+def expire(breaker):
+    """Move the breaker past its reset timeout without sleeping"""
+    breaker.opened_at -= breaker.reset_timeout
+
+
+async def test_consecutive_failures_open_the_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=3)
+    await trip(breaker)
+    assert breaker.state == "open"
+    assert breaker.times_opened == 1
+
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(ok)
+    assert breaker.rejected == 1
+
+
+async def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=3)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await breaker.call(failing)
+    assert await breaker.call(ok) == "ok"
+    with pytest.raises(ConnectionError):
+        await breaker.call(failing)
+    assert breaker.state == "closed"
+
+
+async def test_timeouts_count_as_failures():
+    breaker = CircuitBreaker("test", failure_threshold=1, call_timeout=0.01)
+    with pytest.raises(asyncio.TimeoutError):
+        await breaker.call(lambda: asyncio.sleep(1))
+    assert breaker.state == "open"
+
+
+async def test_successful_trial_closes_the_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    await trip(breaker)
+    expire(breaker)
+    assert breaker.state == "half_open"
+
+    assert await breaker.call(ok) == "ok"
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+async def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    await trip(breaker)
+    expire(breaker)
+
+    with pytest.raises(ConnectionError):
+        await breaker.call(failing)
+    assert breaker.state == "open"
+    assert breaker.times_opened == 1
+
+
+async def test_half_open_breaker_allows_one_trial_at_a_time():
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    await trip(breaker)
+    expire(breaker)
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return "ok"
+
+    trial = asyncio.create_task(breaker.call(slow))
+    await asyncio.sleep(0)
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(ok)
+
+    release.set()
+    assert await trial == "ok"
+    assert breaker.state == "closed"
+
+
+async def test_snapshot_store_round_trips_and_skips_unchanged_writes(tmp_path):
+    path = tmp_path / "snapshots.json"
+    store = SnapshotStore(str(path))
+    await store.save("program_tabs", [{"id": "tab-1"}], "etag-1", 1)
+    written = path.stat().st_mtime_ns
+
+    await store.save("program_tabs", [{"id": "tab-1"}], "etag-1", 1)
+    assert path.stat().st_mtime_ns == written
+    assert SnapshotStore(str(path)).load() == {
+        "program_tabs": {"value": [{"id": "tab-1"}], "etag": "etag-1", "version": 1}
+    }
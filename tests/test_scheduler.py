@@ -0,0 +1,33 @@
+import time
+
+import pytest
+
+from scheduler import Scheduler
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_leader_only_jobs_stop_once_the_lease_runs_out(db):
+    runs = []
+
+    async def job():
+        runs.append(True)
+
+    scheduler = Scheduler(db, lease_seconds=30)
+    scheduler.add_job("job", job, interval=60)
+    assert await scheduler.try_acquire_leadership()
+    await scheduler.run_job(scheduler.jobs["job"])
+    assert len(runs) == 1
+
+    # Renewals stalled; is_leader is stale but the lease has passed to someone else
+    scheduler._leader_until = time.monotonic() - 1
+    assert scheduler.is_leader
+    await scheduler.run_job(scheduler.jobs["job"])
+    assert len(runs) == 1
+    assert scheduler.jobs["job"].skipped == 1
+
+
+async def test_only_one_scheduler_leads(db):
+    first, second = Scheduler(db), Scheduler(db)
+    assert await first.try_acquire_leadership()
+    assert not await second.try_acquire_leadership()
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from search import SearchIndex
+
+pytestmark = pytest.mark.anyio
+
+
+class SlowCollection:
+    """Yields to the event loop between documents, like a real cursor between batches"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            await asyncio.sleep(0)
+            yield doc
+
+
+def tab(tab_id, title):
+    return {"id": tab_id, "title": title, "description": ""}
+
+
+async def test_searches_during_a_rebuild_see_the_previous_index():
+    index = SearchIndex()
+    index.upsert("program_tabs", tab("1", "Quran recitation"))
+    db = {
+        "program_tabs": SlowCollection([tab("1", "Quran recitation"), tab("2", "Quranic Arabic")]),
+        "content_items": SlowCollection([]),
+    }
+
+    rebuild = asyncio.create_task(index.rebuild(db))
+    await asyncio.sleep(0)
+    assert index.search("quran")[0] == 1
+    await rebuild
+    assert index.search("quran")[0] == 2
+
+
+async def test_writes_during_a_rebuild_are_kept():
+    index = SearchIndex()
+    db = {
+        "program_tabs": SlowCollection([tab("1", "Fiqh basics"), tab("2", "Fiqh advanced")]),
+        "content_items": SlowCollection([]),
+    }
+
+    rebuild = asyncio.create_task(index.rebuild(db))
+    await asyncio.sleep(0)
+    index.upsert("program_tabs", tab("3", "Fiqh of prayer"))
+    index.remove("program_tabs", "2")
+    await rebuild
+    assert sorted(result["id"] for result in index.search("fiqh")[1]) == ["1", "3"]
+
+
+def test_prefix_matches_stop_at_the_first_non_matching_term():
+    index = SearchIndex()
+    for i, title in enumerate(["history", "hist", "histology", "zoology"]):
+        index.upsert("program_tabs", tab(str(i), title))
+    assert sorted(result["title"] for result in index.search("hist")[1]) == ["hist", "histology", "history"]
+
+
+def test_content_translations_are_searchable():
+    index = SearchIndex()
+    index.upsert("content_items", {
+        "id": "c1", "key": "hero_title", "title": "Hero", "content": "Welcome",
+        "translations": {"ar": "أهلاً بكم في الدراسات الإسلامية"}
+    })
+
+    total, results = index.search("الدراسات")
+    assert total == 1 and results[0]["key"] == "hero_title"
+    # The article-stripped stem matches too
+    assert index.search("دراسات")[0] == 1
+    assert index.search("welcome")[0] == 1
+
+    index.upsert("content_items", {"id": "c1", "key": "hero_title", "content": "Welcome", "translations": {}})
+    assert index.search("الدراسات")[0] == 0
@@ -0,0 +1,64 @@
+import pytest
+from fastapi.security import HTTPAuthorizationCredentials
+
+import migrations
+import server
+import users
+from models import AuthPrincipal
+
+STUDENT = {"email": "student@example.com", "name": "Student", "role": "student", "password": "password123"}
+
+
+def test_registration_rejects_duplicates_while_the_email_index_is_missing(client):
+    client.portal.call(server.db.users.drop_index, "email_1")
+    users._email_index_ready = False
+
+    assert client.post("/api/register", json=STUDENT).status_code == 200
+    duplicate = client.post("/api/register", json={**STUDENT, "email": " Student@Example.com"})
+    assert duplicate.status_code == 400
+    assert duplicate.json()["detail"] == "Email already registered"
+
+
+def test_registration_checks_for_mixed_case_duplicates_until_emails_are_normalized(client):
+    client.portal.call(server.db[migrations.STATE_COLLECTION].delete_many, {})
+    users._email_index_ready = False
+    # Stored before registration normalized emails; the index allows both spellings
+    client.portal.call(server.db.users.insert_one, {"id": "legacy", "email": "Student@Example.com", "role": "student"})
+    assert client.portal.call(users.has_unique_email_index, server.db)
+    assert not client.portal.call(users.email_index_enforced, server.db)
+
+    duplicate = client.post("/api/register", json=STUDENT)
+    assert duplicate.status_code == 400
+    assert duplicate.json()["detail"] == "Email already registered"
+
+
+def test_registration_relies_on_the_index_once_emails_are_normalized(client):
+    client.portal.call(server.run_migrations)
+    assert client.portal.call(users.email_index_enforced, server.db)
+    assert client.post("/api/register", json=STUDENT).status_code == 200
+    assert client.post("/api/register", json=STUDENT).status_code == 400
+
+
+@pytest.mark.anyio
+async def test_email_migration_normalizes_non_ascii_capitals(db):
+    await db.users.insert_many([
+        {"id": "1", "email": "ÉLODIE@Example.com"},
+        {"id": "2", "email": " ali@example.com "},
+        {"id": "3", "email": "already@example.com"},
+    ])
+    migration = next(m for m in migrations.MIGRATIONS if m.name == "users_normalized_emails")
+    await migrations.MigrationRunner(db, [migration], duty_cycle=1.0).run()
+    emails = sorted([user["email"] async for user in db.users.find({})])
+    assert emails == ["ali@example.com", "already@example.com", "élodie@example.com"]
+
+
+def test_authenticated_user_is_loaded_without_the_password_hash(client, admin_headers):
+    token = admin_headers["Authorization"].split()[1]
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    principal = client.portal.call(server.get_current_user_dep, credentials)
+
+    assert isinstance(principal, AuthPrincipal)
+    assert principal.role == "super_admin"
+    assert "hashed_password" not in principal.model_dump()
+    with pytest.raises(AttributeError):
+        principal.hashed_password